@@ -0,0 +1,132 @@
+"""
+JWT authentication with a per-process cache of user principals.
+
+simplejwt's JWTAuthentication loads the full User row on every request.
+CachedJWTAuthentication keeps a bounded LRU of the few columns requests
+actually need (id, email, names, role, flags) for JWT_USER_CACHE['TTL']
+seconds and builds the request user from them with every other field
+deferred. Saving or deleting a user drops its entry in this process; other
+processes pick the change up when the TTL expires.
+
+With JWT_USER_CACHE['MODE'] = 'stateless' the principal comes straight
+from the claims embedded at login (accounts.tokens), so no lookup happens
+at all; role changes and deactivation then only apply to tokens issued
+afterwards.
+
+Revoked tokens are rejected before the user is resolved (see
+accounts.revocation).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .revocation import revocation_store
+from .tokens import PRINCIPAL_CLAIMS
+
+# Kept in model field order, as Model.from_db expects
+PRINCIPAL_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in ('id', 'is_superuser', 'is_staff') + PRINCIPAL_CLAIMS
+)
+
+
+class PrincipalCache:
+    """Bounded LRU of principal rows keyed by user id, with a TTL"""
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            values, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, values):
+        with self._lock:
+            self._entries[user_id] = (values, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.JWT_USER_CACHE['MAX_ENTRIES'],
+    ttl=settings.JWT_USER_CACHE['TTL'],
+)
+
+
+def build_principal(values):
+    """A User instance holding only the principal fields; the rest load on access"""
+    return User.from_db(DEFAULT_DB_ALIAS, PRINCIPAL_FIELDS, values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation_store.is_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = None
+        if settings.JWT_USER_CACHE['MODE'] == 'stateless':
+            values = self.principal_from_claims(user_id, validated_token)
+        if values is None:
+            values = self.cached_principal(user_id)
+
+        user = build_principal(values)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+    def cached_principal(self, user_id):
+        values = principal_cache.get(user_id)
+        if values is None:
+            values = User.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*PRINCIPAL_FIELDS).first()
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            principal_cache.set(user_id, values)
+        return values
+
+    @staticmethod
+    def principal_from_claims(user_id, validated_token):
+        """Principal values from the token claims, or None for tokens issued without them"""
+        if not all(claim in validated_token for claim in PRINCIPAL_CLAIMS):
+            return None
+        claims = dict(validated_token.payload, id=user_id, is_superuser=False, is_staff=False)
+        return tuple(claims[field] for field in PRINCIPAL_FIELDS)
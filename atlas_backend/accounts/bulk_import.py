@@ -0,0 +1,208 @@
+"""
+Bulk user import.
+
+Rows are validated up front (email syntax, required fields, role, and
+duplicates both within the upload and against existing users), then the
+valid rows are hashed on a process pool and inserted with bulk_create in
+batches. Hashing results come back in order while the pool keeps working,
+so inserts of one batch overlap with hashing of the next. Progress is
+reported as one JSON line per row.
+
+PBKDF2 cost is paid per user: throughput scales with BULK_USER_IMPORT
+['WORKERS']. Rows without a password are created with an unusable password
+(the user sets one through a reset) and skip hashing entirely.
+"""
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ParseError
+
+from .models import User
+from .signals import users_imported
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ('email', 'password', 'first_name', 'last_name', 'role', 'department', 'phone')
+REQUIRED_FIELDS = ('email', 'first_name', 'last_name')
+ROLES = {role for role, _ in User.ROLE_CHOICES}
+
+
+def parse_upload(request):
+    """
+    Rows from a multipart `file` (CSV with a header row, or a JSON array),
+    or from a JSON body holding an array or {"users": [...]}
+    """
+    upload = request.FILES.get('file')
+    if upload is not None:
+        try:
+            content = upload.read().decode('utf-8-sig')
+            if upload.name.lower().endswith('.json') or upload.content_type == 'application/json':
+                rows = json.loads(content)
+            else:
+                rows = list(csv.DictReader(io.StringIO(content)))
+        except UnicodeDecodeError:
+            raise ParseError('The file must be UTF-8 encoded.')
+        except (ValueError, csv.Error) as exc:
+            raise ParseError(f'The file could not be parsed: {exc}')
+    else:
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('users')
+
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ParseError('Upload a CSV or JSON file, or send a JSON list of users.')
+    if len(rows) > settings.BULK_USER_IMPORT['MAX_ROWS']:
+        raise ParseError(f"At most {settings.BULK_USER_IMPORT['MAX_ROWS']} users can be imported at once.")
+    return rows
+
+
+def clean_row(row):
+    """Normalized field values and a list of errors for one row"""
+    values = {
+        field: str(row.get(field) or '').strip()
+        for field in IMPORT_FIELDS
+    }
+    values['email'] = User.objects.normalize_email(values['email'])
+    values['role'] = values['role'] or 'general'
+
+    errors = [f'{field} is required' for field in REQUIRED_FIELDS if not values[field]]
+    if values['email']:
+        try:
+            validate_email(values['email'])
+        except ValidationError:
+            errors.append('email is invalid')
+    if values['role'] not in ROLES:
+        errors.append(f"role must be one of {', '.join(sorted(ROLES))}")
+    for field in ('first_name', 'last_name', 'department', 'phone'):
+        max_length = User._meta.get_field(field).max_length
+        if len(values[field]) > max_length:
+            errors.append(f'{field} must be at most {max_length} characters')
+    return values, errors
+
+
+def existing_emails(emails, batch_size):
+    """Emails that already belong to a user, checked in as few queries as the backend allows"""
+    emails = list(emails)
+    existing = set()
+    for offset in range(0, len(emails), batch_size):
+        existing.update(
+            User.objects.filter(email__in=emails[offset:offset + batch_size]).values_list('email', flat=True)
+        )
+    return existing
+
+
+class UserImport:
+    """One import run; iterate `results()` to perform it"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.batch_size = settings.BULK_USER_IMPORT['BATCH_SIZE']
+        self.workers = settings.BULK_USER_IMPORT['WORKERS'] or os.cpu_count() or 1
+        self.created = 0
+        self.failed = 0
+
+    def validate(self):
+        """Yields (row number, values, errors) for every row"""
+        cleaned = [clean_row(row) for row in self.rows]
+        existing = existing_emails(
+            {values['email'] for values, errors in cleaned if not errors},
+            self.batch_size
+        )
+        seen = set()
+        for number, (values, errors) in enumerate(cleaned, start=1):
+            email = values['email'].lower()
+            if not errors:
+                if values['email'] in existing:
+                    errors.append('a user with this email already exists')
+                elif email in seen:
+                    errors.append('duplicate email in upload')
+            seen.add(email)
+            yield number, values, errors
+
+    def results(self):
+        """Yield one result dict per row, then a summary"""
+        valid = []
+        for number, values, errors in self.validate():
+            if errors:
+                self.failed += 1
+                yield {'row': number, 'email': values['email'], 'status': 'error', 'errors': errors}
+            else:
+                valid.append((number, values))
+
+        if valid:
+            invalid = self.failed
+            try:
+                yield from self.create(valid)
+            except Exception:
+                # The response is already streaming: report the failure in
+                # the body and still end it with a summary
+                logger.exception('Bulk user import stopped after %d users', self.created)
+                unreported = len(valid) - self.created - (self.failed - invalid)
+                self.failed += unreported
+                yield {'status': 'error', 'errors': [
+                    f'the import stopped on a server error; the {unreported} rows without a result were not created'
+                ]}
+
+        if self.created:
+            users_imported.send(sender=User, count=self.created)
+        yield {'summary': True, 'created': self.created, 'failed': self.failed, 'total': len(self.rows)}
+
+    def create(self, valid):
+        context = multiprocessing.get_context(settings.BULK_USER_IMPORT['START_METHOD'])
+        # None hashes to an unusable password
+        passwords = [values['password'] or None for _, values in valid]
+        # Workers get the functions by reference, so they must be importable
+        # before the app registry is ready: no functions from this module
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=django.setup) as pool:
+            hashes = pool.map(make_password, passwords, chunksize=max(1, min(64, len(passwords) // (self.workers * 4))))
+            batch = []
+            for (number, values), password_hash in zip(valid, hashes):
+                batch.append((number, values, password_hash))
+                if len(batch) >= self.batch_size:
+                    yield from self.insert(batch)
+                    batch = []
+            if batch:
+                yield from self.insert(batch)
+
+    def insert(self, batch):
+        users = [
+            User(
+                email=values['email'],
+                password=password_hash,
+                first_name=values['first_name'],
+                last_name=values['last_name'],
+                role=values['role'],
+                department=values['department'] or None,
+                phone=values['phone'] or None,
+            )
+            for _, values, password_hash in batch
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            conflicts = set()
+        except IntegrityError:
+            # Someone registered one of these emails since validation
+            conflicts = existing_emails((user.email for user in users), self.batch_size)
+            with transaction.atomic():
+                User.objects.bulk_create([user for user in users if user.email not in conflicts])
+
+        for (number, values, _), user in zip(batch, users):
+            if user.email in conflicts:
+                self.failed += 1
+                yield {'row': number, 'email': user.email, 'status': 'error',
+                       'errors': ['a user with this email already exists']}
+            else:
+                self.created += 1
+                yield {'row': number, 'email': user.email, 'status': 'created', 'id': user.pk}
@@ -0,0 +1,105 @@
+"""
+Password hashing off the request worker.
+
+PBKDF2 dominates the cost of login and registration. Hashes run on a small
+bounded thread pool (hashlib releases the GIL while hashing), and admission
+control caps how many hashes may be running or queued: past that, requests
+fail fast with 503 and Retry-After instead of piling up and starving every
+other endpoint. Only the hashing runs on the pool; database access stays on
+the request thread.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import User
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in requests are being processed, try again shortly.'
+    default_code = 'hashing_overloaded'
+
+    def __init__(self, wait=1, **kwargs):
+        super().__init__(**kwargs)
+        # Surfaced as Retry-After by DRF's exception handler
+        self.wait = wait
+
+
+class HashingPool:
+    """Bounded worker pool with fail-fast admission control"""
+
+    def __init__(self, max_workers, max_pending, timeout):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='password-hashing'
+                    )
+        return self._executor
+
+    def run(self, fn, *args):
+        if not settings.PASSWORD_HASHING['OFFLOAD']:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingOverloaded()
+
+
+hashing_pool = HashingPool(
+    max_workers=settings.PASSWORD_HASHING['MAX_WORKERS'] or os.cpu_count() or 1,
+    max_pending=settings.PASSWORD_HASHING['MAX_PENDING'],
+    timeout=settings.PASSWORD_HASHING['TIMEOUT'],
+)
+
+
+def hash_password(password):
+    return hashing_pool.run(make_password, password)
+
+
+def authenticate_user(email, password):
+    """
+    Equivalent of django.contrib.auth.authenticate for the model backend,
+    with hashing on the pool. Passwords stored with outdated hasher
+    parameters are transparently rehashed on a successful login.
+    """
+    try:
+        user = User.objects.get_by_natural_key(email)
+    except User.DoesNotExist:
+        # Run the hasher anyway so unknown emails take as long as known ones
+        hash_password(password)
+        return None
+
+    if not hashing_pool.run(check_password, password, user.password):
+        return None
+
+    preferred = get_hasher('default')
+    hasher = identify_hasher(user.password)
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(user.password):
+        user.password = hash_password(password)
+        User.objects.filter(pk=user.pk).update(password=user.password)
+
+    return user if user.is_active else None
@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+BENCHMARK_EMAIL = 'login-benchmark@example.com'
+BENCHMARK_PASSWORD = 'login-benchmark-password'
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login throughput under concurrent load, with hashing on the '
+        'worker pool and inline, alongside the latency of a cheap endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200, help='Logins per mode')
+        parser.add_argument('--mode', choices=('pool', 'inline', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=BENCHMARK_EMAIL).first()
+        if user is None:
+            user = User.objects.create_user(BENCHMARK_EMAIL, BENCHMARK_PASSWORD)
+
+        modes = ('pool', 'inline') if options['mode'] == 'both' else (options['mode'],)
+        offload = settings.PASSWORD_HASHING['OFFLOAD']
+        rate_limit = settings.AUTH_RATE_LIMIT['ENABLED']
+        settings.AUTH_RATE_LIMIT['ENABLED'] = False
+        try:
+            self.stdout.write(f'{options["requests"]} logins per mode on {options["threads"]} threads')
+            self.stdout.write(
+                f'{"mode":<8}{"logins/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                f'{"503s":>7}{"probe p95 ms":>14}'
+            )
+            for mode in modes:
+                settings.PASSWORD_HASHING['OFFLOAD'] = mode == 'pool'
+                self.run_mode(mode, user, options['threads'], options['requests'])
+        finally:
+            settings.PASSWORD_HASHING['OFFLOAD'] = offload
+            settings.AUTH_RATE_LIMIT['ENABLED'] = rate_limit
+            user.delete()
+
+    def run_mode(self, mode, user, threads, total):
+        remaining = iter(range(total))
+        lock = threading.Lock()
+        latencies, statuses, probes = [], [], []
+        done = threading.Event()
+
+        def login_worker():
+            client = APIClient()
+            payload = {'email': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD}
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    response = client.post('/api/accounts/login/', payload, format='json')
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        def probe_worker():
+            # A cheap authenticated request competing with the logins for the worker
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    client.get('/api/accounts/profile/')
+                    probes.append(time.perf_counter() - started)
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        probe = threading.Thread(target=probe_worker)
+        workers = [threading.Thread(target=login_worker) for _ in range(threads)]
+        started = time.perf_counter()
+        probe.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        probe.join()
+
+        succeeded = statuses.count(200)
+        self.stdout.write(
+            f'{mode:<8}{succeeded / elapsed:>10.1f}'
+            f'{percentile(latencies, 0.5) * 1000:>10.1f}'
+            f'{percentile(latencies, 0.95) * 1000:>10.1f}'
+            f'{percentile(latencies, 0.99) * 1000:>10.1f}'
+            f'{statuses.count(503):>7}'
+            f'{percentile(probes, 0.95) * 1000:>14.1f}'
+        )
+        if succeeded + statuses.count(503) != len(statuses):
+            self.stderr.write(f'Unexpected statuses: {sorted(set(statuses) - {200, 503})}')
+        if latencies:
+            self.stdout.write(f'{"":<8}mean {statistics.mean(latencies) * 1000:.1f} ms over {len(latencies)} logins')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import prune_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete revocation records of tokens that have expired; run periodically'
+
+    def handle(self, *args, **options):
+        deleted = prune_expired()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} expired token revocations'))
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+DEFAULT_ROLES = {
+    'admin': {
+        'description': 'Full access to bookings, analytics, users, workspaces and roles',
+        'can_book_workspace': True,
+        'can_view_analytics': True,
+        'can_manage_users': True,
+        'can_manage_workspaces': True,
+        'can_manage_roles': True,
+    },
+    'employee': {'description': 'Employee', 'can_book_workspace': True},
+    'learner': {'description': 'Learner', 'can_book_workspace': True},
+    'general': {'description': 'General user', 'can_book_workspace': True},
+}
+
+
+def create_default_roles(apps, schema_editor):
+    Role = apps.get_model('accounts', 'Role')
+    for name, defaults in DEFAULT_ROLES.items():
+        Role.objects.get_or_create(name=name, defaults=defaults)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_roles, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,21 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.contrib.auth.models import AbstractUser
 
 
 class UserManager(BaseUserManager):
-    def create_user(self, email, password=None, **extra_fields):
+    def create_user(self, email, password=None, password_hash=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if password_hash is not None:
+            # Already hashed by the caller, e.g. on the hashing pool
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -57,6 +63,17 @@ class User(AbstractUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
     
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        # Case-insensitive prefix search (see accounts.search); Postgres
+        # adds pattern and trigram indexes in a migration
+        indexes = [
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+            models.Index(Lower('department'), name='user_department_lower_idx'),
+        ]
+    
     def __str__(self):
         return self.email
     
@@ -82,4 +99,24 @@ class Role(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, kept until it would have expired anyway. Rows with a
+    `user:<id>` jti revoke every token of that user issued before revoked_at.
+    """
+    TOKEN_TYPE_CHOICES = (
+        ('access', 'Access'),
+        ('refresh', 'Refresh'),
+        ('all', 'All tokens of the user'),
+    )
+    
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='revoked_tokens')
+    token_type = models.CharField(max_length=10, choices=TOKEN_TYPE_CHOICES)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.token_type} {self.jti}"
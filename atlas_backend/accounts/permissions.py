@@ -1,13 +1,137 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
 from rest_framework import permissions
 
-class IsAdmin(permissions.BasePermission):
+from .models import Role
+
+# Capability bits, one per Role permission flag
+CAN_BOOK_WORKSPACE = 1 << 0
+CAN_VIEW_ANALYTICS = 1 << 1
+CAN_MANAGE_USERS = 1 << 2
+CAN_MANAGE_WORKSPACES = 1 << 3
+CAN_MANAGE_ROLES = 1 << 4
+
+CAPABILITY_FIELDS = {
+    'can_book_workspace': CAN_BOOK_WORKSPACE,
+    'can_view_analytics': CAN_VIEW_ANALYTICS,
+    'can_manage_users': CAN_MANAGE_USERS,
+    'can_manage_workspaces': CAN_MANAGE_WORKSPACES,
+    'can_manage_roles': CAN_MANAGE_ROLES,
+}
+
+ALL_CAPABILITIES = sum(CAPABILITY_FIELDS.values())
+ADMIN_CAPABILITIES = CAN_VIEW_ANALYTICS | CAN_MANAGE_USERS | CAN_MANAGE_WORKSPACES | CAN_MANAGE_ROLES
+
+# Used for roles that have no Role row
+DEFAULT_ROLE_CAPABILITIES = {
+    'admin': ALL_CAPABILITIES,
+    'employee': CAN_BOOK_WORKSPACE,
+    'learner': CAN_BOOK_WORKSPACE,
+    'general': CAN_BOOK_WORKSPACE,
+}
+
+MATRIX_VERSION_KEY = 'accounts:permission-matrix-version'
+
+
+class PermissionMatrix:
+    """
+    Role name -> capability bitmask, compiled from the Role rows once per
+    process.
+    
+    Saving or deleting a Role invalidates the local matrix and moves the
+    version token in the shared cache; other processes compare against that
+    token at most every PERMISSION_MATRIX_CHECK_INTERVAL seconds, so
+    permission checks never query the database.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._version = None
+        self._checked_at = 0.0
+    
+    @staticmethod
+    def shared_cache():
+        return caches['shared']
+    
+    def compile(self):
+        matrix = dict(DEFAULT_ROLE_CAPABILITIES)
+        for role in Role.objects.values('name', *CAPABILITY_FIELDS):
+            matrix[role['name']] = sum(
+                bit for field, bit in CAPABILITY_FIELDS.items() if role[field]
+            )
+        return matrix
+    
+    def get_matrix(self):
+        now = time.monotonic()
+        if self._matrix is not None and now - self._checked_at < settings.PERMISSION_MATRIX_CHECK_INTERVAL:
+            return self._matrix
+        
+        with self._lock:
+            version = self.shared_cache().get(MATRIX_VERSION_KEY)
+            if self._matrix is None or version != self._version:
+                self._matrix = self.compile()
+                self._version = version
+            self._checked_at = now
+            return self._matrix
+    
+    def capabilities(self, role):
+        return self.get_matrix().get(role, 0)
+    
+    def invalidate(self):
+        self.shared_cache().set(MATRIX_VERSION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._matrix = None
+
+
+permission_matrix = PermissionMatrix()
+
+
+def has_capability(user, capability):
+    """Whether the user's role grants every bit of `capability`"""
+    return permission_matrix.capabilities(user.role) & capability == capability
+
+
+class HasCapability(permissions.BasePermission):
     """
-    Permission check for admin users
+    Permission check against the role's capability bitmask
     """
+    capability = ALL_CAPABILITIES
+    
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        return request.user.role == 'admin'
+        return has_capability(request.user, self.capability)
+
+
+class IsAdmin(HasCapability):
+    """
+    Permission check for admin users: roles holding every management capability
+    """
+    capability = ADMIN_CAPABILITIES
+
+
+class CanBookWorkspace(HasCapability):
+    capability = CAN_BOOK_WORKSPACE
+
+
+class CanViewAnalytics(HasCapability):
+    capability = CAN_VIEW_ANALYTICS
+
+
+class CanManageUsers(HasCapability):
+    capability = CAN_MANAGE_USERS
+
+
+class CanManageWorkspaces(HasCapability):
+    capability = CAN_MANAGE_WORKSPACES
+
+
+class CanManageRoles(HasCapability):
+    capability = CAN_MANAGE_ROLES
 
 
 class IsEmployee(permissions.BasePermission):
@@ -47,4 +171,4 @@ class IsAdminOrSelf(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if not request.user.is_authenticated:
             return False
-        return request.user.role == 'admin' or obj.id == request.user.id
\ No newline at end of file
+        return has_capability(request.user, CAN_MANAGE_USERS) or obj.id == request.user.id
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Rate limiting for login and registration.
+
+Attempts are limited per account (email) and per client IP with token
+buckets in process memory, so a check costs no I/O. Each worker process
+keeps its own buckets: with N workers the effective limit is up to N times
+the configured one, which is acceptable for brute-force protection.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets held in process memory.
+
+    Each key refills at `rate` tokens per second up to `capacity`. The least
+    recently used keys are dropped past `max_keys`, which is harmless since
+    a fresh bucket starts full.
+    """
+
+    def __init__(self, rate, capacity, max_keys=100000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, tokens=1):
+        """Take tokens from the key's bucket; returns (allowed, seconds until allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            available, updated = self._buckets.get(key, (self.capacity, now))
+            available = min(self.capacity, available + (now - updated) * self.rate)
+            allowed = available >= tokens
+            if allowed:
+                available -= tokens
+            self._buckets[key] = (available, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (tokens - available) / self.rate
+
+
+account_limiter = TokenBucketLimiter(
+    rate=settings.AUTH_RATE_LIMIT['ACCOUNT']['RATE'],
+    capacity=settings.AUTH_RATE_LIMIT['ACCOUNT']['BURST'],
+)
+ip_limiter = TokenBucketLimiter(
+    rate=settings.AUTH_RATE_LIMIT['IP']['RATE'],
+    capacity=settings.AUTH_RATE_LIMIT['IP']['BURST'],
+)
+
+
+def check_auth_rate(request, email=None):
+    """Raise Throttled (429 with Retry-After) when the client or account is over its limit"""
+    if not settings.AUTH_RATE_LIMIT['ENABLED']:
+        return
+    # The client address behind REST_FRAMEWORK['NUM_PROXIES'] proxies, as
+    # the API throttles see it
+    checks = [(ip_limiter, BaseThrottle().get_ident(request))]
+    if email:
+        checks.append((account_limiter, email.lower()))
+    for limiter, key in checks:
+        allowed, wait = limiter.consume(key)
+        if not allowed:
+            raise Throttled(wait=wait)
@@ -0,0 +1,204 @@
+"""
+JWT revocation.
+
+Revoked token ids (jti) are stored in RevokedToken until the token expires.
+Every authenticated request must prove its token is not revoked, so each
+process keeps a Bloom filter of the revoked ids: a miss means "not revoked"
+without touching the database, and only a hit (a revoked token, or a false
+positive at about TOKEN_REVOCATION['BLOOM_ERROR_RATE']) is confirmed with a
+query.
+
+Revoking every token of a user stores a `user:<id>` row whose revoked_at is
+the cutoff; tokens issued (iat) before it are rejected. Those rows are few
+and are held in a dict next to the filter, so they never cost a query and
+work in stateless principal mode too.
+
+Revocations made in this process apply immediately. Other processes see
+them within TOKEN_REVOCATION['CHECK_INTERVAL'] seconds, when they notice
+the version token in the shared cache has moved and load the new rows.
+Pruning moves a separate generation token, which makes every process
+rebuild its filter from the remaining rows.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+VERSION_KEY = 'accounts:revocation-version'
+GENERATION_KEY = 'accounts:revocation-generation'
+# Rows committed out of id/time order are picked up by re-reading this far back
+LOAD_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def token_expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+class RevocationStore:
+
+    def __init__(self, capacity, error_rate, check_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._filter = None
+        self._cutoffs = {}
+        self._version = None
+        self._generation = None
+        self._loaded_at = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def shared_cache():
+        return caches['shared']
+
+    def _load(self, since=None):
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        if since is not None:
+            rows = rows.filter(revoked_at__gte=since - LOAD_OVERLAP)
+        loaded_at = timezone.now()
+        return list(rows.values_list('jti', 'revoked_at')), loaded_at
+
+    def _add(self, jti, revoked_at):
+        if jti.startswith('user:'):
+            self._cutoffs[jti] = revoked_at.timestamp()
+        else:
+            self._filter.add(jti)
+
+    def _rebuild(self):
+        rows, self._loaded_at = self._load()
+        capacity = self.capacity
+        while capacity < 2 * len(rows):
+            capacity *= 2
+        self._filter = BloomFilter(capacity, self.error_rate)
+        self._cutoffs = {}
+        for jti, revoked_at in rows:
+            self._add(jti, revoked_at)
+
+    def get_filter(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._checked_at < self.check_interval:
+            return self._filter
+
+        with self._lock:
+            tokens = self.shared_cache().get_many([VERSION_KEY, GENERATION_KEY])
+            version, generation = tokens.get(VERSION_KEY), tokens.get(GENERATION_KEY)
+            if self._filter is None or generation != self._generation:
+                self._rebuild()
+            elif version != self._version:
+                rows, self._loaded_at = self._load(since=self._loaded_at)
+                for jti, revoked_at in rows:
+                    self._add(jti, revoked_at)
+                if self._filter.count > self._filter.capacity:
+                    self._rebuild()
+            self._version, self._generation = version, generation
+            self._checked_at = now
+            return self._filter
+
+    def is_revoked(self, token):
+        """Whether the token's jti, or every token of its user up to its iat, was revoked"""
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti in self.get_filter() and RevokedToken.objects.filter(jti=jti).exists():
+            return True
+
+        cutoff = self._cutoffs.get(user_key(token.get(api_settings.USER_ID_CLAIM)))
+        return cutoff is not None and token.get('iat', 0) < cutoff
+
+    def added(self, jti, revoked_at):
+        """Record a new revocation locally and announce it to other processes"""
+        with self._lock:
+            if self._filter is not None:
+                self._add(jti, revoked_at)
+        transaction.on_commit(
+            lambda: self.shared_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+        )
+
+    def pruned(self):
+        self.shared_cache().set(GENERATION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._filter = None
+            self._cutoffs = {}
+
+
+revocation_store = RevocationStore(
+    capacity=settings.TOKEN_REVOCATION['BLOOM_CAPACITY'],
+    error_rate=settings.TOKEN_REVOCATION['BLOOM_ERROR_RATE'],
+    check_interval=settings.TOKEN_REVOCATION['CHECK_INTERVAL'],
+)
+
+
+def revoke_token(token):
+    """Revoke a single access or refresh token"""
+    jti = token[api_settings.JTI_CLAIM]
+    revoked, _ = RevokedToken.objects.get_or_create(
+        jti=jti,
+        defaults={
+            'user_id': token.get(api_settings.USER_ID_CLAIM),
+            'token_type': token[api_settings.TOKEN_TYPE_CLAIM],
+            'expires_at': token_expiry(token),
+        }
+    )
+    revocation_store.added(jti, revoked.revoked_at)
+
+
+def revoke_all_for_user(user):
+    """Revoke every token issued to the user so far"""
+    key = user_key(getattr(user, api_settings.USER_ID_FIELD))
+    now = timezone.now()
+    # Nothing issued before now outlives the longest token lifetime
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    RevokedToken.objects.update_or_create(
+        jti=key,
+        defaults={
+            'user': user,
+            'token_type': 'all',
+            'revoked_at': now,
+            'expires_at': now + lifetime,
+        }
+    )
+    revocation_store.added(key, now)
+
+
+def prune_expired():
+    """Delete revocations of tokens that have expired; returns the number removed"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    if deleted:
+        revocation_store.pruned()
+    return deleted
@@ -0,0 +1,62 @@
+"""
+User directory search.
+
+Every whitespace-separated term of the query must match at least one of
+the search fields, case-insensitively. Terms shorter than three characters
+match as prefixes, longer terms as substrings, on every backend.
+
+On Postgres, prefixes use the text_pattern_ops indexes and substrings the
+pg_trgm GIN indexes. Other backends match prefixes as an index range over
+the lower() expression indexes and substrings with a scan.
+"""
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+
+SEARCH_FIELDS = ('email', 'first_name', 'last_name', 'department')
+TRIGRAM_MIN_LENGTH = 3
+FACET_LIMIT = 20
+
+
+def prefix_upper_bound(prefix):
+    """The smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def term_filter(term):
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        column = f'{field}_lower'
+        if len(term) >= TRIGRAM_MIN_LENGTH:
+            matches |= Q(**{f'{column}__contains': term})
+        elif connection.vendor == 'postgresql':
+            matches |= Q(**{f'{column}__startswith': term})
+        else:
+            # SQLite doesn't use indexes for LIKE ... ESCAPE; a range does
+            matches |= Q(**{
+                f'{column}__gte': term,
+                f'{column}__lt': prefix_upper_bound(term),
+                f'{column}__startswith': term,
+            })
+    return matches
+
+
+def search_users(queryset, query):
+    terms = query.lower().split()
+    if not terms:
+        return queryset
+    queryset = queryset.alias(**{f'{field}_lower': Lower(field) for field in SEARCH_FIELDS})
+    for term in terms:
+        queryset = queryset.filter(term_filter(term))
+    return queryset
+
+
+def facet_counts(queryset, field, limit=FACET_LIMIT):
+    """[{'value': ..., 'count': ...}] for the most common values of a field"""
+    rows = (
+        queryset.order_by()
+        .values(field)
+        .annotate(count=Count('id'))
+        .order_by('-count', field)[:limit]
+    )
+    return [{'value': row[field], 'count': row['count']} for row in rows]
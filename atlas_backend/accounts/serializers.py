@@ -1,9 +1,15 @@
 from rest_framework import serializers
+from atlas_config.serializers import FlexFieldsMixin
 from .models import User, Role
+from .hashing import hash_password
+from .revocation import revocation_store, revoke_token
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'first_name', 'last_name', 'role', 'date_joined', 
@@ -12,7 +18,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'date_joined')
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'first_name', 'last_name', 'phone', 'department', 
@@ -35,7 +41,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirmation')
-        user = User.objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        user = User.objects.create_user(password_hash=hash_password(password), **validated_data)
         return user
 
 
@@ -44,7 +51,7 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(required=True, write_only=True)
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = '__all__'
@@ -55,4 +62,25 @@ class UserRoleUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'role')
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',)
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """simplejwt's refresh, rejecting revoked refresh tokens and revoking rotated ones"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocation_store.is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revoke_token(refresh)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .authentication import principal_cache
+from .models import User, Role
+from .permissions import permission_matrix
+
+# Sent after a bulk import, which bypasses the per-row save signals
+users_imported = Signal()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_permission_matrix(sender, **kwargs):
+    transaction.on_commit(permission_matrix.invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    """Drop the cached principal on any profile, role or activation change"""
+    principal_cache.invalidate(instance.pk)
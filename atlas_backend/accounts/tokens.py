@@ -0,0 +1,13 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# User fields embedded as claims so stateless authentication can build the
+# request user without a lookup (see accounts.authentication)
+PRINCIPAL_CLAIMS = ('email', 'first_name', 'last_name', 'role', 'is_active')
+
+
+def tokens_for_user(user):
+    """Issue a refresh token (and its access token) carrying the principal claims"""
+    refresh = RefreshToken.for_user(user)
+    for claim in PRINCIPAL_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
@@ -1,6 +1,5 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, 
     LoginView, 
@@ -9,7 +8,11 @@ from .views import (
     UserListView, 
     UserDetailView,
     RoleViewSet,
-    UserRoleUpdateView
+    UserRoleUpdateView,
+    UserBulkImportView,
+    LogoutAllView,
+    UserTokenRevokeView,
+    TokenRefreshView
 )
 
 router = DefaultRouter()
@@ -20,12 +23,15 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('logout/all/', LogoutAllView.as_view(), name='logout-all'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     # User profile endpoints
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('users/', UserListView.as_view(), name='user-list'),
+    path('users/bulk-import/', UserBulkImportView.as_view(), name='user-bulk-import'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
+    path('users/<int:pk>/revoke-tokens/', UserTokenRevokeView.as_view(), name='user-revoke-tokens'),
     path('users/<int:pk>/role/', UserRoleUpdateView.as_view(), name='user-role-update'),
     
     # Role management
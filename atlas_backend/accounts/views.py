@@ -1,14 +1,27 @@
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, viewsets, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
+from atlas_config.renderers import FastJSONParser, json_dumps
+from atlas_config.serializers import FlexFieldsViewMixin
+from idempotency.keys import idempotent
+from .tokens import tokens_for_user
+from .bulk_import import UserImport, parse_upload
+from .hashing import authenticate_user
+from .ratelimit import check_auth_rate
+from .search import search_users, facet_counts
+from .revocation import revoke_token, revoke_all_for_user
 from .models import User, Role
 from .serializers import (
     UserSerializer, UserProfileSerializer, UserRegistrationSerializer,
-    LoginSerializer, RoleSerializer, UserRoleUpdateSerializer
+    LoginSerializer, RoleSerializer, UserRoleUpdateSerializer,
+    TokenRefreshSerializer
 )
-from .permissions import IsAdmin, IsAdminOrSelf
+from .permissions import IsAdminOrSelf, CanManageUsers, CanManageRoles
 
 
 class RegisterView(generics.CreateAPIView):
@@ -16,12 +29,15 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
 
+    # Kept briefly: the stored response holds the new user's tokens
+    @idempotent('accounts.register', ttl=15 * 60)
     def post(self, request, *args, **kwargs):
+        check_auth_rate(request)
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
 
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
 
         response = Response({
             'user': UserSerializer(user).data,
@@ -49,7 +65,8 @@ class LoginView(APIView):
         email = serializer.validated_data['email']
         password = serializer.validated_data['password']
 
-        user = authenticate(email=email, password=password)
+        check_auth_rate(request, email)
+        user = authenticate_user(email, password)
 
         if user is None:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -57,7 +74,7 @@ class LoginView(APIView):
         if not user.is_active:
             return Response({'error': 'Account is disabled'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
 
         response = Response({
             'user': UserSerializer(user).data,
@@ -76,27 +93,51 @@ class LoginView(APIView):
 
 
 class LogoutView(APIView):
+    """Revoke the access token of the request and the given refresh token"""
     def post(self, request):
         try:
             refresh_token = request.data.get('refresh')
             if refresh_token:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Exception:
+                revoke_token(RefreshToken(refresh_token))
+        except TokenError:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class LogoutAllView(APIView):
+    """Revoke every token issued to the current user"""
+    def post(self, request):
+        revoke_all_for_user(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UserTokenRevokeView(APIView):
+    """Revoke every token issued to a user"""
+    permission_classes = [permissions.IsAuthenticated, CanManageUsers]
+
+    def post(self, request, pk):
+        user = generics.get_object_or_404(User, pk=pk)
+        revoke_all_for_user(user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenRefreshView(BaseTokenRefreshView):
+    serializer_class = TokenRefreshSerializer
+
+
+class UserProfileView(FlexFieldsViewMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrSelf]
 
     def get_object(self):
-        return self.request.user
+        # request.user only carries the cached principal fields
+        return self.filter_queryset(User.objects.filter(pk=self.request.user.pk)).get()
 
     def get(self, request, *args, **kwargs):
         user = self.get_object()
-        serializer = self.serializer_class(user)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
     def update(self, request, *args, **kwargs):
@@ -107,25 +148,79 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return Response(serializer.data)
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(FlexFieldsViewMixin, generics.ListAPIView):
+    """
+    User directory. `q` searches email, names and department: each term
+    must match one of them, case-insensitively, as a prefix when shorter
+    than three characters and anywhere in the value otherwise, so `x.c`
+    finds emp@x.com (see accounts.search). `role` and `department` filter
+    exactly. Unless
+    `facets=false`, the page carries role and department counts, each
+    computed under every filter except its own.
+    """
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    permission_classes = [permissions.IsAuthenticated, CanManageUsers]
+
+    def get_filters(self):
+        params = self.request.query_params
+        filters = {}
+        if params.get('role'):
+            filters['role__in'] = params['role'].split(',')
+        if params.get('department'):
+            filters['department'] = params['department']
+        return filters
+
+    def get_search_queryset(self):
+        return search_users(User.objects.all(), self.request.query_params.get('q', ''))
+
+    def get_queryset(self):
+        return self.get_search_queryset().filter(**self.get_filters()).order_by('email')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') != 'false':
+            searched = self.get_search_queryset()
+            filters = self.get_filters()
+            response.data['facets'] = {
+                'role': facet_counts(
+                    searched.filter(**{k: v for k, v in filters.items() if k != 'role__in'}), 'role'
+                ),
+                'department': facet_counts(
+                    searched.filter(**{k: v for k, v in filters.items() if k != 'department'}), 'department'
+                ),
+            }
+        return response
 
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserDetailView(FlexFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    permission_classes = [permissions.IsAuthenticated, CanManageUsers]
+
+
+class UserBulkImportView(APIView):
+    """
+    Create users from a CSV/JSON upload or a JSON list, streaming one
+    NDJSON result line per row followed by a summary line
+    """
+    permission_classes = [permissions.IsAuthenticated, CanManageUsers]
+    parser_classes = [FastJSONParser, MultiPartParser]
+
+    @idempotent('accounts.bulk_import')
+    def post(self, request):
+        user_import = UserImport(parse_upload(request))
+        lines = (json_dumps(result) + b'\n' for result in user_import.results())
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(FlexFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
-    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    permission_classes = [permissions.IsAuthenticated, CanManageRoles]
 
 
 class UserRoleUpdateView(generics.UpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRoleUpdateSerializer
-    permission_classes = [permissions.IsAuthenticated, IsAdmin]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated, CanManageUsers]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Result cache for the admin analytics reports.
+
+Report results are keyed by report name, normalized parameters and the
+current booking-data version. The version token lives in the shared cache
+(see CACHES['shared']) so every worker on the host sees a change as soon as
+a booking, workspace or metric is saved. Results themselves are held in a
+size-bounded, in-process LRU.
+
+Reports over closed historical ranges (ending before today) are pinned:
+they are keyed without the data version and are never recomputed while
+they stay in the pinned LRU.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DATA_VERSION_KEY = 'analytics:booking-data-version'
+
+
+def get_data_version():
+    """Return the current booking-data version token"""
+    shared = caches[settings.ANALYTICS_REPORT_CACHE['VERSION_CACHE']]
+    version = shared.get(DATA_VERSION_KEY)
+    if version is None:
+        version = bump_data_version()
+    return version
+
+
+def bump_data_version():
+    """Invalidate every unpinned report by moving to a new version token"""
+    shared = caches[settings.ANALYTICS_REPORT_CACHE['VERSION_CACHE']]
+    version = f"{time.time_ns():x}-{os.getpid():x}"
+    shared.set(DATA_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def version_age(version):
+    """Seconds since the data version token was issued"""
+    return (time.time_ns() - int(version.split('-')[0], 16)) / 1e9
+
+
+class ReportCache:
+    """
+    Size-bounded LRU of computed report results.
+
+    Unpinned and pinned results are held in separate LRUs so a burst of
+    ad-hoc queries can't evict the historical reports.
+    """
+
+    def __init__(self, max_entries=256, max_pinned=512):
+        self.max_entries = max_entries
+        self.max_pinned = max_pinned
+        self._entries = OrderedDict()
+        self._pinned = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compute_seconds = 0.0
+        self.compute_seconds_saved = 0.0
+
+    @staticmethod
+    def make_key(report_name, params, version):
+        normalized = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f"{report_name}:{version or 'pinned'}:{digest}"
+
+    def get_or_compute(self, report_name, params, compute, pinned=False):
+        """Return the cached result for the report, computing it on a miss"""
+        version = None if pinned else get_data_version()
+        key = self.make_key(report_name, params, version)
+        store, limit = (self._pinned, self.max_pinned) if pinned else (self._entries, self.max_entries)
+
+        with self._lock:
+            entry = store.get(key)
+            if entry is not None:
+                store.move_to_end(key)
+                self.hits += 1
+                self.compute_seconds_saved += entry[1]
+                return entry[0]
+            self.misses += 1
+
+        started = time.perf_counter()
+        result = compute()
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.compute_seconds += elapsed
+            store[key] = (result, elapsed)
+            store.move_to_end(key)
+            while len(store) > limit:
+                store.popitem(last=False)
+                self.evictions += 1
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'pinned_entries': len(self._pinned),
+                'max_entries': self.max_entries,
+                'max_pinned': self.max_pinned,
+                'evictions': self.evictions,
+                'compute_seconds': round(self.compute_seconds, 4),
+                'compute_seconds_saved': round(self.compute_seconds_saved, 4),
+            }
+
+
+report_cache = ReportCache(
+    max_entries=settings.ANALYTICS_REPORT_CACHE['MAX_ENTRIES'],
+    max_pinned=settings.ANALYTICS_REPORT_CACHE['MAX_PINNED'],
+)
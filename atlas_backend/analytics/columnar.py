@@ -0,0 +1,85 @@
+"""
+Columnar layout for analytics report payloads.
+
+Instead of one JSON object per row, a columnar payload carries one array
+per field:
+
+    {
+        "layout": "columnar",
+        "count": 3,
+        "columns": {"date": [...], "workspace_name": [0, 1, 0], ...},
+        "dictionaries": {"workspace_name": ["Desk 1", "Desk 2"]}
+    }
+
+String columns are dictionary-encoded: the column holds indexes into
+`dictionaries[field]`. With `delta_dates`, date columns become
+{"start": "2024-01-01", "deltas": [0, 0, 1, ...]}, each delta being the
+number of days since the previous row's date. Rows are read straight from
+the report's dicts; the serializer class is only consulted once for the
+field list and types.
+"""
+from datetime import date
+from functools import lru_cache
+
+from rest_framework import serializers
+
+
+@lru_cache(maxsize=None)
+def columnar_schema(serializer_class):
+    """Return (fields, dictionary fields, date fields) for a serializer class"""
+    fields = serializer_class().fields
+    dictionary_fields = {
+        name for name, field in fields.items()
+        if isinstance(field, serializers.CharField)
+    }
+    date_fields = {
+        name for name, field in fields.items()
+        if isinstance(field, serializers.DateField)
+    }
+    return tuple(fields), dictionary_fields, date_fields
+
+
+def encode_dictionary(values):
+    index = {}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    return codes, list(index)
+
+
+def encode_dates(values, delta_dates):
+    # Some backends hand back raw DATE() expressions as ISO strings
+    values = [date.fromisoformat(value) if isinstance(value, str) else value for value in values]
+    if not delta_dates:
+        return [value.isoformat() if value is not None else None for value in values]
+
+    start = next((value for value in values if value is not None), None)
+    deltas = []
+    previous = start
+    for value in values:
+        if value is None:
+            deltas.append(None)
+            continue
+        deltas.append((value - previous).days)
+        previous = value
+    return {'start': start.isoformat() if start is not None else None, 'deltas': deltas}
+
+
+def to_columnar(rows, serializer_class, delta_dates=False):
+    fields, dictionary_fields, date_fields = columnar_schema(serializer_class)
+
+    columns = {}
+    dictionaries = {}
+    for field in fields:
+        values = [row[field] for row in rows]
+        if field in dictionary_fields:
+            columns[field], dictionaries[field] = encode_dictionary(values)
+        elif field in date_fields:
+            columns[field] = encode_dates(values, delta_dates)
+        else:
+            columns[field] = values
+
+    return {
+        'layout': 'columnar',
+        'count': len(rows),
+        'columns': columns,
+        'dictionaries': dictionaries,
+    }
@@ -0,0 +1,213 @@
+"""
+Hourly occupancy cube.
+
+`HourlyOccupancy` holds one row per (workspace, hour) with the occupied
+minutes, overlapping/started booking counts and attendee-minutes of every
+confirmed or completed booking. Rows are kept current by applying the
+difference between a booking's previous and new state on every save or
+delete, and `OccupancyCube` rolls them up across time (hour, day, week,
+month, hour of day) and workspace dimensions.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from bookings.models import Booking
+from .models import HourlyOccupancy
+
+COUNTED_STATUSES = ('confirmed', 'completed')
+
+TIME_GRAINS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+DIMENSIONS = {
+    'total': (),
+    'workspace': ('workspace_id', 'workspace__name'),
+    'floor': ('workspace__location', 'workspace__floor'),
+    'location': ('workspace__location',),
+    'workspace_type': ('workspace__workspace_type_id', 'workspace__workspace_type__name'),
+}
+
+MEASURES = ('occupied_minutes', 'booking_count', 'bookings_started', 'attendee_minutes')
+
+
+def hour_floor(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value):
+    return datetime.combine(value, time.min).replace(tzinfo=timezone.get_current_timezone())
+
+
+def booking_facts(state):
+    """
+    Split a booking state into per-hour contributions.
+
+    Returns {hour: [occupied_minutes, booking_count, bookings_started,
+    attendee_minutes]} for counted bookings, and {} otherwise.
+    """
+    if state is None or state['status'] not in COUNTED_STATUSES:
+        return {}
+
+    start, end = state['start_time'], state['end_time']
+    facts = {}
+    hour = hour_floor(start)
+    while hour < end:
+        next_hour = hour + timedelta(hours=1)
+        minutes = (min(end, next_hour) - max(start, hour)).total_seconds() / 60
+        facts[hour] = [
+            minutes,
+            1,
+            1 if hour <= start < next_hour else 0,
+            minutes * state['attendees'],
+        ]
+        hour = next_hour
+    return facts
+
+
+def apply_booking_change(old_state, new_state):
+    """Apply the difference between two booking states to the cube"""
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        for hour, values in booking_facts(state).items():
+            delta = deltas[(state['workspace_id'], hour)]
+            for i, value in enumerate(values):
+                delta[i] += sign * value
+
+    with transaction.atomic():
+        new_facts = []
+        for (workspace_id, hour), delta in deltas.items():
+            if not any(delta):
+                continue
+            changes = {
+                measure: F(measure) + value
+                for measure, value in zip(MEASURES, delta)
+            }
+            updated = HourlyOccupancy.objects.filter(workspace_id=workspace_id, hour=hour).update(**changes)
+            if not updated and delta[1] > 0:
+                new_facts.append(HourlyOccupancy(
+                    workspace_id=workspace_id,
+                    hour=hour,
+                    **dict(zip(MEASURES, delta))
+                ))
+        if new_facts:
+            insert_facts(new_facts)
+
+        # Hours no longer covered by any booking are dropped
+        HourlyOccupancy.objects.filter(
+            workspace_id__in={workspace_id for workspace_id, _ in deltas},
+            hour__in={hour for _, hour in deltas},
+            booking_count__lte=0
+        ).delete()
+
+
+def insert_facts(new_facts):
+    """
+    Insert cube rows, in one statement unless a concurrent booking created
+    one of them first; that row then gets the values added instead
+    """
+    try:
+        with transaction.atomic():
+            HourlyOccupancy.objects.bulk_create(new_facts)
+    except IntegrityError:
+        for fact in new_facts:
+            facts = HourlyOccupancy.objects.filter(workspace_id=fact.workspace_id, hour=fact.hour)
+            changes = {measure: F(measure) + getattr(fact, measure) for measure in MEASURES}
+            if facts.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    fact.save(force_insert=True)
+            except IntegrityError:
+                facts.update(**changes)
+
+
+def rebuild(start_date=None, end_date=None, batch_size=2000):
+    """
+    Recompute the cube from bookings, optionally for a date range only.
+
+    Returns the number of fact rows written.
+    """
+    facts = HourlyOccupancy.objects.all()
+    bookings = Booking.objects.filter(status__in=COUNTED_STATUSES)
+
+    if start_date:
+        range_start = day_start(start_date)
+        facts = facts.filter(hour__gte=range_start)
+        bookings = bookings.filter(end_time__gt=range_start)
+    if end_date:
+        range_end = day_start(end_date + timedelta(days=1))
+        facts = facts.filter(hour__lt=range_end)
+        bookings = bookings.filter(start_time__lt=range_end)
+
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for state in bookings.values(*Booking.TRACKED_FIELDS).iterator():
+        for hour, values in booking_facts(state).items():
+            if start_date and hour < range_start or end_date and hour >= range_end:
+                continue
+            total = totals[(state['workspace_id'], hour)]
+            for i, value in enumerate(values):
+                total[i] += value
+
+    with transaction.atomic():
+        facts.delete()
+        HourlyOccupancy.objects.bulk_create(
+            (
+                HourlyOccupancy(workspace_id=workspace_id, hour=hour, **dict(zip(MEASURES, total)))
+                for (workspace_id, hour), total in totals.items()
+            ),
+            batch_size=batch_size
+        )
+    return len(totals)
+
+
+class OccupancyCube:
+    """
+    Roll-up queries over the hourly fact table.
+
+    `grain` is one of hour, day, week, month or hour_of_day (hours folded
+    across days), or None for no time axis. `by` is one of the keys of
+    DIMENSIONS. Each row carries the summed MEASURES plus `hours`, the
+    number of workspace-hours with booked time.
+    """
+
+    def __init__(self, start_date, end_date, workspaces=None):
+        self.queryset = HourlyOccupancy.objects.filter(
+            hour__gte=day_start(start_date),
+            hour__lt=day_start(end_date + timedelta(days=1))
+        )
+        if workspaces is not None:
+            self.queryset = self.queryset.filter(workspace__in=workspaces)
+
+    def rollup(self, grain='day', by='total'):
+        group_by = list(DIMENSIONS[by])
+        queryset = self.queryset
+
+        if grain == 'hour_of_day':
+            queryset = queryset.annotate(period=ExtractHour('hour'))
+            group_by.insert(0, 'period')
+        elif grain is not None:
+            queryset = queryset.annotate(period=TIME_GRAINS[grain]('hour'))
+            group_by.insert(0, 'period')
+
+        aggregates = {measure: Sum(measure) for measure in MEASURES}
+        aggregates['hours'] = Count('id')
+
+        if not group_by:
+            return [queryset.aggregate(**aggregates)]
+
+        rows = queryset.values(*group_by).annotate(**aggregates).order_by(*group_by)
+
+        if grain in ('day', 'week', 'month'):
+            return [dict(row, period=row['period'].date()) for row in rows]
+        return list(rows)
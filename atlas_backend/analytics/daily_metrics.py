@@ -0,0 +1,152 @@
+"""
+Daily workspace metrics computed from bookings.
+
+A workspace-day counts the confirmed and completed bookings that start and
+end within the day (in the current time zone): their number, booked hours,
+a HyperLogLog of their users and DDSketches of their duration, lead time
+and attendees. WorkspaceMetric.calculate_for_date keeps one day current
+after a booking change; WorkspaceMetric.rebuild recomputes a date range in
+one pass over the bookings, and the analytics migrations use
+fill_sketches() to backfill sketch columns of existing rows.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .sketches import HyperLogLog, DDSketch
+
+COUNTED_STATUSES = ('confirmed', 'completed')
+
+BOOKING_FIELDS = ('workspace_id', 'user_id', 'start_time', 'end_time', 'created_at', 'attendees')
+
+SKETCH_FIELDS = ('user_sketch', 'duration_sketch', 'lead_time_sketch', 'attendees_sketch')
+
+
+def day_bounds(day):
+    """First and last second of a day in the current time zone"""
+    start_of_day = datetime.combine(day, datetime.min.time()).replace(tzinfo=timezone.get_current_timezone())
+    return start_of_day, start_of_day + timedelta(days=1) - timedelta(seconds=1)
+
+
+def new_quantile_sketch():
+    config = settings.ANALYTICS_QUANTILE_SKETCH
+    return DDSketch(config['RELATIVE_ACCURACY'], config['MAX_BINS'])
+
+
+class DayMetrics:
+    """Totals and sketches of one workspace-day's bookings"""
+
+    def __init__(self, workspace_id, day):
+        self.workspace_id = workspace_id
+        self.day = day
+        self.start_of_day, self.end_of_day = day_bounds(day)
+        self.total_bookings = 0
+        self.total_hours = 0
+        self.user_sketch = HyperLogLog(settings.ANALYTICS_HLL_PRECISION)
+        self.duration_sketch = new_quantile_sketch()
+        self.lead_time_sketch = new_quantile_sketch()
+        self.attendees_sketch = new_quantile_sketch()
+
+    def add(self, booking):
+        """Count a booking given as a dict of BOOKING_FIELDS"""
+        start_time, end_time = booking['start_time'], booking['end_time']
+        self.total_bookings += 1
+        self.user_sketch.add(booking['user_id'])
+        self.duration_sketch.add((end_time - start_time).total_seconds() / 60)
+        self.lead_time_sketch.add((start_time - booking['created_at']).total_seconds() / 60)
+        self.attendees_sketch.add(booking['attendees'])
+        # Overlap of the booking with the day
+        booking_end = min(end_time, self.end_of_day)
+        self.total_hours += (booking_end - max(start_time, self.start_of_day)).total_seconds() / 3600
+
+    def sketches(self):
+        """The sketch columns, serialized"""
+        return {
+            'user_sketch': self.user_sketch.to_bytes(),
+            'duration_sketch': self.duration_sketch.to_dict(),
+            'lead_time_sketch': self.lead_time_sketch.to_dict(),
+            'attendees_sketch': self.attendees_sketch.to_dict(),
+        }
+
+    def fields(self, available_minutes):
+        """WorkspaceMetric column values, given the day's available minutes"""
+        available_hours = available_minutes / 60
+        occupancy_rate = (self.total_hours / available_hours) * 100 if available_hours > 0 else 0
+        return {
+            'total_bookings': self.total_bookings,
+            'total_hours_booked': self.total_hours,
+            # Capped at 100%
+            'occupancy_rate': min(occupancy_rate, 100),
+            **self.sketches(),
+        }
+
+
+def empty_sketches():
+    """Serialized sketches of a day without bookings"""
+    return DayMetrics(None, timezone.localdate()).sketches()
+
+
+def daily_metrics(bookings):
+    """
+    DayMetrics of every workspace-day with bookings, from booking dicts
+    (BOOKING_FIELDS) ordered by workspace and start time. Days are yielded
+    as they complete, so only one is held at a time.
+    """
+    metrics = None
+    for booking in bookings:
+        day = timezone.localdate(booking['start_time'])
+        if metrics is None or (metrics.workspace_id, metrics.day) != (booking['workspace_id'], day):
+            if metrics is not None:
+                yield metrics
+            metrics = DayMetrics(booking['workspace_id'], day)
+        if booking['end_time'] <= metrics.end_of_day:
+            metrics.add(booking)
+    if metrics is not None:
+        yield metrics
+
+
+def counted_bookings(booking_model, start_date=None, end_date=None):
+    """Booking dicts for daily_metrics(), optionally for days in a range"""
+    bookings = booking_model.objects.filter(status__in=COUNTED_STATUSES)
+    if start_date:
+        bookings = bookings.filter(start_time__gte=day_bounds(start_date)[0])
+    if end_date:
+        bookings = bookings.filter(start_time__lte=day_bounds(end_date)[1])
+    return bookings.order_by('workspace_id', 'start_time').values(*BOOKING_FIELDS).iterator()
+
+
+def fill_sketches(metric_model, booking_model, fields, batch_size=1000):
+    """
+    Compute `fields` (some of SKETCH_FIELDS) of the metric rows that don't
+    have them yet, leaving the other columns alone. Takes the models as
+    arguments so that migrations can pass their historical versions.
+    Returns the number of rows filled.
+    """
+    missing = {
+        (workspace_id, day): pk
+        for pk, workspace_id, day in metric_model.objects.filter(
+            **{f'{fields[0]}__isnull': True}
+        ).values_list('pk', 'workspace_id', 'date').iterator()
+    }
+    if not missing:
+        return 0
+
+    days = [day for _, day in missing]
+    filled = 0
+    batch = []
+    for metrics in daily_metrics(counted_bookings(booking_model, min(days), max(days))):
+        pk = missing.pop((metrics.workspace_id, metrics.day), None)
+        if pk is None:
+            continue
+        sketches = metrics.sketches()
+        batch.append(metric_model(pk=pk, **{field: sketches[field] for field in fields}))
+        if len(batch) == batch_size:
+            metric_model.objects.bulk_update(batch, fields)
+            filled += len(batch)
+            batch = []
+    # Days left without bookings get empty sketches
+    empty = empty_sketches()
+    batch.extend(metric_model(pk=pk, **{field: empty[field] for field in fields}) for pk in missing.values())
+    metric_model.objects.bulk_update(batch, fields, batch_size=batch_size)
+    return filled + len(batch)
@@ -0,0 +1,60 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from analytics.columnar import to_columnar
+from analytics.serializers import WorkspaceOccupancySerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and serialization time of the row and columnar report layouts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workspaces', type=int, default=500)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = date.today() - timedelta(days=options['days'])
+
+        # Synthetic occupancy report rows, ordered the way the view orders them
+        rows = [
+            {
+                'date': start + timedelta(days=day),
+                'workspace_id': workspace_id,
+                'workspace_name': f'Workspace {workspace_id}',
+                'occupancy_rate': rng.uniform(0, 100),
+                'total_hours_booked': rng.uniform(0, 12),
+                'total_bookings': rng.randint(0, 8),
+            }
+            for day in range(options['days'])
+            for workspace_id in range(1, options['workspaces'] + 1)
+        ]
+
+        renderer = JSONRenderer()
+        layouts = {
+            'rows': lambda: list(WorkspaceOccupancySerializer(rows, many=True).data),
+            'columnar': lambda: to_columnar(rows, WorkspaceOccupancySerializer),
+            'columnar+delta': lambda: to_columnar(rows, WorkspaceOccupancySerializer, delta_dates=True),
+        }
+
+        self.stdout.write(f'{len(rows)} rows, best of {options["repeat"]} runs')
+        self.stdout.write(f'{"layout":<16}{"bytes":>12}{"format ms":>12}{"render ms":>12}')
+        for name, build in layouts.items():
+            best_format = best_render = float('inf')
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                data = build()
+                formatted = time.perf_counter()
+                payload = renderer.render(data)
+                rendered = time.perf_counter()
+                best_format = min(best_format, formatted - started)
+                best_render = min(best_render, rendered - formatted)
+            self.stdout.write(
+                f'{name:<16}{len(payload):>12}{best_format * 1000:>12.1f}{best_render * 1000:>12.1f}'
+            )
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from analytics import cube
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly occupancy cube from bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        rows = cube.rebuild(options['start_date'], options['end_date'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} hourly occupancy rows'))
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from analytics.cache import bump_data_version
+from analytics.models import WorkspaceMetric
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily workspace metrics and their sketches from bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        days = WorkspaceMetric.rebuild(options['start_date'], options['end_date'])
+        # Rebuilt rows bypass the signals that move cached reports on
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'Wrote metrics for {days} workspace-days'))
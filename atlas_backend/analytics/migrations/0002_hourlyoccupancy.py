@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-19 14:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('occupied_minutes', models.FloatField(default=0.0)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('bookings_started', models.IntegerField(default=0)),
+                ('attendee_minutes', models.FloatField(default=0.0)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_occupancy', to='bookings.workspace')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='analytics_h_hour_65b9d8_idx')],
+                'unique_together': {('workspace', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_hourlyoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspacemetric',
+            name='user_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_workspacemetric_user_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspacemetric',
+            name='attendees_sketch',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workspacemetric',
+            name='duration_sketch',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workspacemetric',
+            name='lead_time_sketch',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from analytics.daily_metrics import fill_sketches
+
+
+def fill_user_sketches(apps, schema_editor):
+    fill_sketches(
+        apps.get_model('analytics', 'WorkspaceMetric'),
+        apps.get_model('bookings', 'Booking'),
+        ['user_sketch']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_workspacemetric_quantile_sketches'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_user_sketches, migrations.RunPython.noop),
+    ]
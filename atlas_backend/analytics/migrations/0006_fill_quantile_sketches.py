@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from analytics.daily_metrics import fill_sketches
+
+
+def fill_quantile_sketches(apps, schema_editor):
+    fill_sketches(
+        apps.get_model('analytics', 'WorkspaceMetric'),
+        apps.get_model('bookings', 'Booking'),
+        ['duration_sketch', 'lead_time_sketch', 'attendees_sketch']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_fill_user_sketches'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_quantile_sketches, migrations.RunPython.noop),
+    ]
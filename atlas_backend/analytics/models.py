@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
 from accounts.models import User
 from bookings.models import Workspace, Booking
+from bookings.operating_hours import available_minutes, available_minutes_map
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Count, Sum, F, ExpressionWrapper, fields
 from django.db.models.functions import ExtractHour
+from .daily_metrics import (
+    BOOKING_FIELDS, COUNTED_STATUSES, SKETCH_FIELDS,
+    DayMetrics, counted_bookings, daily_metrics, day_bounds, empty_sketches
+)
+from .sketches import HyperLogLog
 
 
 class WorkspaceMetric(models.Model):
@@ -17,6 +24,12 @@ class WorkspaceMetric(models.Model):
     total_bookings = models.IntegerField(default=0)
     total_hours_booked = models.FloatField(default=0.0)
     occupancy_rate = models.FloatField(default=0.0)  # Percentage of available hours booked
+    user_sketch = models.BinaryField(null=True, blank=True)  # HyperLogLog of booking user ids
+    # DDSketch quantile sketches of booking duration (minutes), lead time
+    # (minutes from creation to start) and attendees
+    duration_sketch = models.JSONField(null=True, blank=True)
+    lead_time_sketch = models.JSONField(null=True, blank=True)
+    attendees_sketch = models.JSONField(null=True, blank=True)
     
     class Meta:
         unique_together = ('workspace', 'date')
@@ -24,50 +37,87 @@ class WorkspaceMetric(models.Model):
     def __str__(self):
         return f"{self.workspace.name} - {self.date}"
     
+    def get_user_sketch(self):
+        if not self.user_sketch:
+            return HyperLogLog(settings.ANALYTICS_HLL_PRECISION)
+        return HyperLogLog.from_bytes(bytes(self.user_sketch))
+    
     @classmethod
     def calculate_for_date(cls, workspace, date):
         """Calculate metrics for a given workspace and date"""
         # Get the bookings for this workspace on this date
-        start_of_day = datetime.combine(date, datetime.min.time()).replace(tzinfo=timezone.get_current_timezone())
-        end_of_day = (start_of_day + timedelta(days=1)) - timedelta(seconds=1)
-        
+        start_of_day, end_of_day = day_bounds(date)
         bookings = Booking.objects.filter(
             workspace=workspace,
             start_time__gte=start_of_day,
             end_time__lte=end_of_day,
-            status__in=['confirmed', 'completed']
+            status__in=COUNTED_STATUSES
         )
         
-        total_bookings = bookings.count()
-        
-        # Calculate total hours booked
-        total_hours = 0
-        for booking in bookings:
-            # Calculate the overlap of the booking with the target date
-            booking_start = max(booking.start_time, start_of_day)
-            booking_end = min(booking.end_time, end_of_day)
-            hours = (booking_end - booking_start).total_seconds() / 3600
-            total_hours += hours
-        
-        # Assume workspace is available for 12 hours per day (8am to 8pm)
-        available_hours = 12
-        occupancy_rate = (total_hours / available_hours) * 100 if available_hours > 0 else 0
-        
-        # Cap at 100%
-        occupancy_rate = min(occupancy_rate, 100)
+        metrics = DayMetrics(workspace.id, date)
+        for booking in bookings.values(*BOOKING_FIELDS):
+            metrics.add(booking)
         
-        # Create or update the metric object
+        # Available hours come from the workspace's operating-hours calendar
         metric, created = cls.objects.update_or_create(
             workspace=workspace,
             date=date,
-            defaults={
-                'total_bookings': total_bookings,
-                'total_hours_booked': total_hours,
-                'occupancy_rate': occupancy_rate
-            }
+            defaults=metrics.fields(available_minutes(workspace.id, date))
         )
         
         return metric
+    
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None, batch_size=1000):
+        """
+        Recompute the metrics of every workspace-day, optionally for a date
+        range only, in one pass over the bookings. Days that have a row but
+        no longer any bookings are reset. Returns the number of days with
+        bookings written.
+        """
+        rows = cls.objects.all()
+        if start_date:
+            rows = rows.filter(date__gte=start_date)
+        if end_date:
+            rows = rows.filter(date__lte=end_date)
+        
+        written = 0
+        with transaction.atomic():
+            rows.update(total_bookings=0, total_hours_booked=0.0, occupancy_rate=0.0, **empty_sketches())
+            batch = []
+            for metrics in daily_metrics(counted_bookings(Booking, start_date, end_date)):
+                batch.append(metrics)
+                if len(batch) == batch_size:
+                    written += cls.write_days(batch)
+                    batch = []
+            written += cls.write_days(batch)
+        return written
+    
+    @classmethod
+    def write_days(cls, days):
+        """Insert or update the rows of a batch of DayMetrics"""
+        if not days:
+            return 0
+        minutes = available_minutes_map(
+            min(metrics.day for metrics in days),
+            max(metrics.day for metrics in days),
+            {metrics.workspace_id for metrics in days}
+        )
+        rows = [
+            cls(
+                workspace_id=metrics.workspace_id,
+                date=metrics.day,
+                **metrics.fields(minutes.get((metrics.workspace_id, metrics.day), 0))
+            )
+            for metrics in days
+        ]
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['workspace', 'date'],
+            update_fields=['total_bookings', 'total_hours_booked', 'occupancy_rate', *SKETCH_FIELDS]
+        )
+        return len(rows)
 
 
 class UserAnalytic(models.Model):
@@ -142,4 +192,28 @@ class UserAnalytic(models.Model):
             }
         )
         
-        return analytic
\ No newline at end of file
+        return analytic
+
+class HourlyOccupancy(models.Model):
+    """
+    Hourly occupancy fact table, one row per workspace per booked hour.
+    
+    Maintained incrementally from booking changes (see analytics.cube) so
+    reports can roll up across time and workspace dimensions without
+    scanning Booking rows.
+    """
+    workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='hourly_occupancy')
+    hour = models.DateTimeField()  # Start of the hour
+    occupied_minutes = models.FloatField(default=0.0)
+    booking_count = models.IntegerField(default=0)  # Bookings overlapping the hour
+    bookings_started = models.IntegerField(default=0)  # Bookings starting in the hour
+    attendee_minutes = models.FloatField(default=0.0)
+    
+    class Meta:
+        unique_together = ('workspace', 'hour')
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.workspace_id} - {self.hour:%Y-%m-%d %H:00}"
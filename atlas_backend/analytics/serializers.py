@@ -1,10 +1,11 @@
 from rest_framework import serializers
+from atlas_config.serializers import FlexFieldsMixin
 from .models import WorkspaceMetric, UserAnalytic
 from accounts.serializers import UserSerializer
 from bookings.serializers import WorkspaceListSerializer
 
 
-class WorkspaceMetricSerializer(serializers.ModelSerializer):
+class WorkspaceMetricSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     workspace = WorkspaceListSerializer(read_only=True)
     
     class Meta:
@@ -13,7 +14,7 @@ class WorkspaceMetricSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'date', 'total_bookings', 'total_hours_booked', 'occupancy_rate')
 
 
-class UserAnalyticSerializer(serializers.ModelSerializer):
+class UserAnalyticSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     most_booked_workspace = WorkspaceListSerializer(read_only=True)
     month_display = serializers.SerializerMethodField()
@@ -22,6 +23,7 @@ class UserAnalyticSerializer(serializers.ModelSerializer):
         model = UserAnalytic
         fields = ('id', 'user', 'month', 'month_display', 'total_bookings', 'total_hours', 'most_booked_workspace')
         read_only_fields = ('id', 'month', 'total_bookings', 'total_hours')
+        field_sources = {'month_display': ('month',)}
     
     def get_month_display(self, obj):
         return obj.month.strftime('%B %Y')
@@ -63,4 +65,19 @@ class WorkspacePopularitySerializer(serializers.Serializer):
 class PeakHoursSerializer(serializers.Serializer):
     hour = serializers.IntegerField()
     total_bookings = serializers.IntegerField()
-    occupancy_rate = serializers.FloatField()
\ No newline at end of file
+    occupancy_rate = serializers.FloatField()
+
+
+class UniqueUsersSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    unique_users = serializers.IntegerField()
+    exact = serializers.BooleanField()
+    relative_error = serializers.FloatField()
+    workspace_days = serializers.IntegerField()
+
+
+class PercentilesSerializer(serializers.Serializer):
+    group = serializers.DictField()
+    count = serializers.IntegerField()
+    percentiles = serializers.DictField(child=serializers.FloatField(allow_null=True))
\ No newline at end of file
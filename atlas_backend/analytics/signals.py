@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.signals import users_imported
+from bookings.models import Booking, Workspace
+from .cache import bump_data_version
+from .cube import apply_booking_change
+from .models import WorkspaceMetric
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+@receiver(post_save, sender=WorkspaceMetric)
+@receiver(post_delete, sender=WorkspaceMetric)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(users_imported)
+def invalidate_report_cache(sender, **kwargs):
+    """Any change to data the reports read moves them to a new data version"""
+    bump_data_version()
+
+
+def refresh_workspace_metrics(*states):
+    """
+    Recompute the daily metrics (and sketches) of every workspace-day the
+    given booking states touch, once the surrounding transaction commits
+    """
+    days = set()
+    for state in states:
+        if state is None:
+            continue
+        day = timezone.localdate(state['start_time'])
+        while day <= timezone.localdate(state['end_time']):
+            days.add((state['workspace_id'], day))
+            day += timedelta(days=1)
+    
+    def refresh():
+        # Skip workspaces deleted along with their bookings
+        existing = set(Workspace.objects.filter(
+            id__in={workspace_id for workspace_id, _ in days}
+        ).values_list('id', flat=True))
+        for workspace_id, day in sorted(days):
+            if workspace_id in existing:
+                WorkspaceMetric.calculate_for_date(Workspace(id=workspace_id), day)
+    
+    if days:
+        transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = getattr(instance, '_loaded_state', None)
+    new_state = instance.tracked_state()
+    apply_booking_change(old_state, new_state)
+    refresh_workspace_metrics(old_state, new_state)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    old_state = getattr(instance, '_loaded_state', instance.tracked_state())
+    apply_booking_change(old_state, None)
+    refresh_workspace_metrics(old_state)
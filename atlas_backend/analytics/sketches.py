@@ -0,0 +1,212 @@
+"""
+Mergeable sketches stored alongside the daily workspace metrics.
+"""
+import hashlib
+import math
+import zlib
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter.
+
+    With precision p the sketch keeps m = 2**p one-byte registers and has a
+    standard error of about 1.04 / sqrt(m): 1.6% at p=12, 0.8% at p=14.
+    Sketches of different precision merge by folding the finer one down.
+    Serialized sketches are zlib-compressed, so sparse days stay small.
+    """
+    MIN_PRECISION = 4
+    MAX_PRECISION = 16
+
+    def __init__(self, precision=12, registers=None):
+        if not self.MIN_PRECISION <= precision <= self.MAX_PRECISION:
+            raise ValueError(f'HyperLogLog precision must be between {self.MIN_PRECISION} and {self.MAX_PRECISION}')
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def reduce(self, precision):
+        """Return this sketch folded down to a lower precision"""
+        if precision == self.precision:
+            return self
+        if precision > self.precision:
+            raise ValueError('Cannot increase the precision of a HyperLogLog sketch')
+
+        shift = self.precision - precision
+        reduced = HyperLogLog(precision)
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            # The dropped index bits become the leading bits of the hash tail
+            dropped = index & ((1 << shift) - 1)
+            new_rank = shift - dropped.bit_length() + 1 if dropped else shift + rank
+            new_index = index >> shift
+            if new_rank > reduced.registers[new_index]:
+                reduced.registers[new_index] = new_rank
+        return reduced
+
+    def merge(self, other):
+        """Return the union of two sketches"""
+        precision = min(self.precision, other.precision)
+        left, right = self.reduce(precision), other.reduce(precision)
+        return HyperLogLog(precision, bytes(map(max, left.registers, right.registers)))
+
+    def count(self):
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return zlib.compress(bytes([self.precision]) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        raw = zlib.decompress(data)
+        return cls(raw[0], raw[1:])
+
+    @classmethod
+    def union(cls, sketches, precision=12):
+        """Merge an iterable of sketches; an empty iterable gives an empty sketch"""
+        return cls.union_registers(((sketch.precision, sketch.registers) for sketch in sketches), precision)
+
+    @classmethod
+    def union_bytes(cls, serialized, precision=12):
+        """union() of serialized sketches, without building a sketch for each"""
+        def registers():
+            for data in serialized:
+                raw = zlib.decompress(data)
+                yield raw[0], memoryview(raw)[1:]
+        return cls.union_registers(registers(), precision)
+
+    @classmethod
+    def union_registers(cls, sketches, precision=12, batch_size=64):
+        """
+        Merge (precision, registers) pairs. Registers are maxed a batch at a
+        time in one map() pass, so long ranges don't hold every sketch in
+        memory; only sketches whose precision differs from the result's are
+        folded first.
+        """
+        merged = bytes(1 << precision)
+        batch = []
+        for sketch_precision, registers in sketches:
+            if sketch_precision < precision:
+                merged = cls(precision, max_registers(merged, batch)).reduce(sketch_precision).registers
+                batch = []
+                precision = sketch_precision
+            elif sketch_precision > precision:
+                registers = cls(sketch_precision, registers).reduce(precision).registers
+            batch.append(registers)
+            if len(batch) == batch_size:
+                merged = max_registers(merged, batch)
+                batch = []
+        return cls(precision, max_registers(merged, batch))
+
+
+def max_registers(registers, batch):
+    """Element-wise maximum of equal-length register arrays"""
+    return bytes(map(max, registers, *batch)) if batch else registers
+
+
+class DDSketch:
+    """
+    DDSketch quantile sketch with relative-error guarantees.
+
+    Values fall into logarithmic bins of ratio gamma = (1 + a) / (1 - a), so
+    any quantile of a sketch with relative accuracy `a` is within a * value
+    of the true quantile. Memory is bounded by `max_bins`: when exceeded, the
+    lowest bins are collapsed together, which only costs accuracy at the
+    bottom of the distribution. Non-positive values are counted separately
+    as zeros. Sketches merge when they share the same accuracy.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=1024, bins=None, zero_count=0):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('DDSketch relative accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = dict(bins or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value, weight=1):
+        if value <= 0:
+            self.zero_count += weight
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + weight
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        overflow = keys[:len(keys) - self.max_bins + 1]
+        target = keys[len(overflow)]
+        self.bins[target] += sum(self.bins.pop(key) for key in overflow)
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1); None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def merge(self, other):
+        """Return the union of two sketches"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge DDSketches with different relative accuracy')
+        merged = DDSketch(self.relative_accuracy, self.max_bins, self.bins, self.zero_count + other.zero_count)
+        for key, weight in other.bins.items():
+            merged.bins[key] = merged.bins.get(key, 0) + weight
+        while len(merged.bins) > merged.max_bins:
+            merged._collapse()
+        return merged
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'bins': {str(key): weight for key, weight in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_bins=1024):
+        return cls(
+            data['relative_accuracy'],
+            max_bins,
+            {int(key): weight for key, weight in data['bins'].items()},
+            data['zero_count']
+        )
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from bookings.models import Booking, Workspace, WorkspaceType
+
+from .daily_metrics import day_bounds, fill_sketches
+from .models import HourlyOccupancy, WorkspaceMetric
+from .sketches import DDSketch, HyperLogLog
+
+
+class OccupancyCubeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('member@example.com', 'pw12345!', role='employee')
+        workspace_type = WorkspaceType.objects.create(name='Desk')
+        self.workspace = Workspace.objects.create(name='D1', location='HQ', workspace_type=workspace_type)
+        self.start_time = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+    def book(self):
+        return Booking.objects.create(
+            user=self.user, workspace=self.workspace, status='confirmed',
+            start_time=self.start_time, end_time=self.start_time + timedelta(hours=1)
+        )
+
+    def test_cancelling_from_two_stale_instances_counts_once(self):
+        self.book()
+        booking = self.book()
+        # Loaded by two concurrent cancel requests
+        first = Booking.objects.get(pk=booking.pk)
+        second = Booking.objects.get(pk=booking.pk)
+
+        for instance in (first, second):
+            instance.status = 'cancelled'
+            instance.save()
+
+        fact = HourlyOccupancy.objects.get(workspace=self.workspace, hour=self.start_time)
+        self.assertEqual(fact.booking_count, 1)
+        self.assertEqual(fact.occupied_minutes, 60)
+
+    def test_deleting_a_cancelled_booking_from_a_stale_instance(self):
+        self.book()
+        booking = self.book()
+        stale = Booking.objects.get(pk=booking.pk)
+        booking.status = 'cancelled'
+        booking.save()
+
+        stale.delete()
+
+        fact = HourlyOccupancy.objects.get(workspace=self.workspace, hour=self.start_time)
+        self.assertEqual(fact.booking_count, 1)
+
+
+class WorkspaceMetricTests(TestCase):
+    def setUp(self):
+        workspace_type = WorkspaceType.objects.create(name='Desk')
+        self.workspace = Workspace.objects.create(name='D1', location='HQ', workspace_type=workspace_type)
+        self.day = timezone.localdate() - timedelta(days=3)
+        start_time = day_bounds(self.day)[0] + timedelta(hours=9)
+        for i in range(3):
+            user = User.objects.create_user(f'member{i}@example.com', 'pw12345!', role='employee')
+            Booking.objects.create(
+                user=user, workspace=self.workspace, status='confirmed',
+                start_time=start_time, end_time=start_time + timedelta(hours=i + 1)
+            )
+
+    def test_rebuild_matches_calculate_for_date(self):
+        expected = WorkspaceMetric.calculate_for_date(self.workspace, self.day)
+        WorkspaceMetric.objects.all().delete()
+
+        self.assertEqual(WorkspaceMetric.rebuild(), 1)
+
+        metric = WorkspaceMetric.objects.get(workspace=self.workspace, date=self.day)
+        self.assertEqual(metric.total_bookings, 3)
+        self.assertEqual(metric.total_hours_booked, expected.total_hours_booked)
+        self.assertEqual(metric.occupancy_rate, expected.occupancy_rate)
+        self.assertEqual(bytes(metric.user_sketch), bytes(expected.user_sketch))
+        self.assertEqual(metric.duration_sketch, expected.duration_sketch)
+
+    def test_fill_sketches_backfills_rows_without_them(self):
+        WorkspaceMetric.calculate_for_date(self.workspace, self.day)
+        WorkspaceMetric.objects.update(user_sketch=None)
+
+        self.assertEqual(fill_sketches(WorkspaceMetric, Booking, ['user_sketch']), 1)
+
+        metric = WorkspaceMetric.objects.get(workspace=self.workspace, date=self.day)
+        self.assertEqual(metric.get_user_sketch().count(), 3)
+
+    def test_fill_sketches_backfills_quantile_sketches(self):
+        WorkspaceMetric.calculate_for_date(self.workspace, self.day)
+        WorkspaceMetric.objects.update(duration_sketch=None, lead_time_sketch=None, attendees_sketch=None)
+
+        fill_sketches(WorkspaceMetric, Booking, ['duration_sketch', 'lead_time_sketch', 'attendees_sketch'])
+
+        metric = WorkspaceMetric.objects.get(workspace=self.workspace, date=self.day)
+        duration = DDSketch.from_dict(metric.duration_sketch)
+        self.assertEqual(duration.count, 3)
+        self.assertAlmostEqual(duration.quantile(1), 180, delta=180 * 0.01)
+        self.assertEqual(DDSketch.from_dict(metric.attendees_sketch).count, 3)
+
+
+class HyperLogLogTests(TestCase):
+    def sketch(self, precision, users):
+        sketch = HyperLogLog(precision)
+        for user_id in users:
+            sketch.add(user_id)
+        return sketch
+
+    def test_union_matches_pairwise_merges(self):
+        sketches = [self.sketch(12, range(start, start + 300)) for start in range(0, 6000, 200)]
+        sketches.insert(10, self.sketch(10, range(5000, 5200)))
+        merged = sketches[0]
+        for sketch in sketches[1:]:
+            merged = merged.merge(sketch)
+
+        union = HyperLogLog.union(sketches, precision=12)
+
+        self.assertEqual(union.precision, 10)
+        self.assertEqual(union.registers, merged.registers)
+        self.assertEqual(
+            HyperLogLog.union_bytes([sketch.to_bytes() for sketch in sketches]).registers, merged.registers
+        )
+        self.assertEqual(HyperLogLog.union([], precision=12).count(), 0)
@@ -8,7 +8,10 @@ from .views import (
     BookingTrendsView,
     UserActivityReportView,
     WorkspacePopularityView,
-    PeakHoursView
+    PeakHoursView,
+    UniqueUsersView,
+    PercentilesView,
+    ReportCacheStatsView
 )
 
 router = DefaultRouter()
@@ -22,5 +25,8 @@ urlpatterns = [
     path('user-activity/', UserActivityReportView.as_view(), name='user-activity'),
     path('workspace-popularity/', WorkspacePopularityView.as_view(), name='workspace-popularity'),
     path('peak-hours/', PeakHoursView.as_view(), name='peak-hours'),
+    path('unique-users/', UniqueUsersView.as_view(), name='unique-users'),
+    path('percentiles/', PercentilesView.as_view(), name='percentiles'),
+    path('report-cache/', ReportCacheStatsView.as_view(), name='report-cache'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
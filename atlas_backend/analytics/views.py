@@ -2,41 +2,58 @@ from rest_framework import viewsets, generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from accounts.permissions import IsAdmin
+from rest_framework.exceptions import ValidationError
+from accounts.permissions import CanViewAnalytics
+from atlas_config.renderers import StreamingJSONResponse, should_stream
+from atlas_config.routers import primary_reads
+from atlas_config.serializers import FlexFieldsViewMixin
+from atlas_config.throttling import ThrottledViewMixin
 from django.db.models import Count, Sum, F, Q, Avg
 from django.db.models.functions import ExtractHour
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from .cache import get_data_version, report_cache, version_age
+from .columnar import to_columnar
+from .cube import OccupancyCube, DIMENSIONS
 from .models import WorkspaceMetric, UserAnalytic
+from .sketches import HyperLogLog, DDSketch
 from .serializers import (
     WorkspaceMetricSerializer, 
     UserAnalyticSerializer,
     WorkspaceOccupancySerializer,
     BookingTrendSerializer,
     UserActivitySerializer,
-    WorkspacePopularitySerializer
+    WorkspacePopularitySerializer,
+    PeakHoursSerializer,
+    UniqueUsersSerializer,
+    PercentilesSerializer
 )
 from accounts.models import User
 from bookings.models import Booking, Workspace
-from accounts.permissions import IsAdmin
+from bookings.operating_hours import available_minutes_map
 
 
-class WorkspaceMetricViewSet(viewsets.ReadOnlyModelViewSet):
+class WorkspaceMetricViewSet(FlexFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
+    replica_reads = True
     queryset = WorkspaceMetric.objects.all()
     serializer_class = WorkspaceMetricSerializer
-    permission_classes = [IsAuthenticated, IsAdmin]
+    permission_classes = [IsAuthenticated, CanViewAnalytics]
 
 
-class UserAnalyticViewSet(viewsets.ReadOnlyModelViewSet):
+class UserAnalyticViewSet(FlexFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
+    replica_reads = True
     serializer_class = UserAnalyticSerializer
-    permission_classes = [IsAuthenticated, IsAdmin]
+    permission_classes = [IsAuthenticated, CanViewAnalytics]
     
     def get_queryset(self):
         return UserAnalytic.objects.all()
 
 
-class DashboardView(APIView):
+class DashboardView(ThrottledViewMixin, APIView):
+    replica_reads = True
+    throttle_scope = 'dashboard'
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -136,33 +153,188 @@ class DashboardView(APIView):
             })
 
 
-class OccupancyReportView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
+def parse_date_range(request, default_days):
+    """
+    Resolve the start_date/end_date query params, defaulting to the
+    trailing `default_days` window ending today
+    """
+    start_date_str = request.query_params.get('start_date')
+    end_date_str = request.query_params.get('end_date')
+    
+    today = timezone.now().date()
+    
+    if not start_date_str:
+        start_date = today - timedelta(days=default_days)
+    else:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    
+    if not end_date_str:
+        end_date = today
+    else:
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    
+    return start_date, end_date
+
+
+def parse_workspace_filters(request):
+    """
+    Resolve the workspace dimension filters (?workspace=1,2&floor=&location=
+    &workspace_type=) into Workspace lookups
+    """
+    filters = {}
+    workspace_ids = request.query_params.get('workspace')
+    if workspace_ids:
+        try:
+            filters['id__in'] = sorted(int(workspace_id) for workspace_id in workspace_ids.split(','))
+        except ValueError:
+            raise ValidationError({'workspace': 'Give workspace ids separated by commas'})
+    for param, lookup in (('floor', 'floor'), ('location', 'location'), ('workspace_type', 'workspace_type_id')):
+        value = request.query_params.get(param)
+        if value:
+            filters[lookup] = value
+    if 'workspace_type_id' in filters:
+        try:
+            filters['workspace_type_id'] = int(filters['workspace_type_id'])
+        except ValueError:
+            raise ValidationError({'workspace_type': 'Give a workspace type id'})
+    return filters
+
+
+def occupancy_rate(occupied_minutes, available_minutes):
+    """Percentage of the available minutes booked, capped at 100%"""
+    if not available_minutes:
+        return 0.0
+    return min(occupied_minutes / available_minutes * 100, 100)
+
+
+def bucket_by_period(daily_counts, start_date, end_date, period):
+    """
+    Fold {date: count} into the report's weekly (7-day windows from
+    start_date) or monthly buckets
+    """
+    buckets = []
+    if period == 'weekly':
+        current = start_date
+        while current <= end_date:
+            next_start = current + timedelta(days=7)
+            buckets.append((current, next_start))
+            current = next_start
+    else:
+        current = date(start_date.year, start_date.month, 1)
+        while current <= end_date:
+            next_start = current + relativedelta(months=1)
+            buckets.append((current, next_start))
+            current = next_start
+    
+    return [
+        {
+            'date': bucket_start,
+            'total_bookings': sum(
+                count for day, count in daily_counts.items()
+                if bucket_start <= day < bucket_end
+            )
+        }
+        for bucket_start, bucket_end in buckets
+    ]
+
+
+class ReportView(ThrottledViewMixin, APIView):
+    """
+    Base class for the admin reports.
+    
+    Subclasses resolve request parameters in `get_report_params` and compute
+    plain row dicts in `build_report` (scanning bookings) and, where
+    possible, `build_report_from_cube` (reading the hourly occupancy cube).
+    The source is picked with `?source=` or settings.ANALYTICS_SOURCE.
+    
+    Rows are formatted with `serializer_class`, or with `?layout=columnar`
+    into parallel arrays without instantiating the serializer per row
+    (see analytics.columnar). Formatted results are served from the report
+    cache; reports over a closed date range are pinned. Long row lists are
+    streamed as encoded chunks (see atlas_config.renderers).
+    
+    Reports read the replica, except just after a data change: a result
+    computed from a replica that hasn't caught up would be cached under the
+    new data version.
+    
+    Reports share the 'reports' throttle scope: besides the per-user rate,
+    only a few run at once per process (see atlas_config.throttling).
+    """
+    replica_reads = True
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated, CanViewAnalytics]
+    report_name = None
+    serializer_class = None
+    build_report_from_cube = None
+    
+    def get_report_params(self, request):
+        raise NotImplementedError
+    
+    def build_report(self, **params):
+        raise NotImplementedError
+    
+    def get_source(self, request):
+        source = request.query_params.get('source', settings.ANALYTICS_SOURCE)
+        if source == 'cube' and self.build_report_from_cube is not None:
+            return 'cube'
+        return 'bookings'
+    
+    def get_layout(self, request):
+        layout = request.query_params.get('layout', 'rows')
+        if layout not in ('rows', 'columnar'):
+            raise ValidationError({'layout': 'Choose one of rows, columnar'})
+        delta_dates = request.query_params.get('delta_dates', '').lower() in ('1', 'true')
+        return {'layout': layout, 'delta_dates': delta_dates and layout == 'columnar'}
+    
+    def format_report(self, rows, layout, delta_dates):
+        if isinstance(rows, dict):
+            return dict(self.serializer_class(rows).data)
+        if layout == 'columnar':
+            return to_columnar(rows, self.serializer_class, delta_dates=delta_dates)
+        return list(self.serializer_class(rows, many=True).data)
+    
+    def is_closed_range(self, params):
+        end_date = params.get('end_date')
+        return end_date is not None and end_date < timezone.now().date()
+    
+    def compute_report(self, build, params, layout):
+        if version_age(get_data_version()) < settings.DATABASE_REPLICA['MAX_LAG_SECONDS']:
+            with primary_reads():
+                return self.format_report(build(**params), **layout)
+        return self.format_report(build(**params), **layout)
     
     def get(self, request):
-        """Get workspace occupancy data for a date range"""
-        # Get date range parameters with defaults
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        
-        today = timezone.now().date()
-        
+        params = self.get_report_params(request)
+        source = self.get_source(request)
+        layout = self.get_layout(request)
+        build = self.build_report_from_cube if source == 'cube' else self.build_report
+        data = report_cache.get_or_compute(
+            self.report_name,
+            dict(params, source=source, **layout),
+            lambda: self.compute_report(build, params, layout),
+            pinned=self.is_closed_range(params)
+        )
+        if should_stream(request, data):
+            return StreamingJSONResponse(data)
+        return Response(data)
+
+
+class OccupancyReportView(ReportView):
+    report_name = 'occupancy-report'
+    serializer_class = WorkspaceOccupancySerializer
+    
+    def get_report_params(self, request):
         # Default to last 7 days if not specified
-        if not start_date_str:
-            start_date = today - timedelta(days=6)
-        else:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        
-        if not end_date_str:
-            end_date = today
-        else:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        
+        start_date, end_date = parse_date_range(request, default_days=6)
+        return {'start_date': start_date, 'end_date': end_date}
+    
+    def build_report(self, start_date, end_date):
+        """Get workspace occupancy data for a date range"""
         # Get metrics for the date range
         metrics = WorkspaceMetric.objects.filter(
             date__gte=start_date,
             date__lte=end_date
-        ).select_related('workspace')
+        ).select_related('workspace').order_by('date', 'workspace_id')
         
         # Format the data for the response
         workspace_data = []
@@ -176,22 +348,42 @@ class OccupancyReportView(APIView):
                 'total_bookings': metric.total_bookings
             })
         
-        serializer = WorkspaceOccupancySerializer(workspace_data, many=True)
-        return Response(serializer.data)
+        return workspace_data
+    
+    def build_report_from_cube(self, start_date, end_date):
+        rows = OccupancyCube(start_date, end_date).rollup(grain='day', by='workspace')
+        available = available_minutes_map(start_date, end_date, {row['workspace_id'] for row in rows})
+        
+        workspace_data = [
+            {
+                'date': row['period'],
+                'workspace_id': row['workspace_id'],
+                'workspace_name': row['workspace__name'],
+                'occupancy_rate': occupancy_rate(row['occupied_minutes'], available[(row['workspace_id'], row['period'])]),
+                'total_hours_booked': row['occupied_minutes'] / 60,
+                'total_bookings': row['bookings_started']
+            }
+            for row in rows
+        ]
+        
+        return workspace_data
 
 
-class BookingTrendsView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
+class BookingTrendsView(ReportView):
+    report_name = 'booking-trends'
+    serializer_class = BookingTrendSerializer
     
-    def get(self, request):
-        """Get booking trends over time"""
+    def get_report_params(self, request):
         # Get period parameter (daily, weekly, monthly) with default
         period = request.query_params.get('period', 'daily')
         
         # Get date range parameters with defaults
         months = int(request.query_params.get('months', 3))
         
-        today = timezone.now().date()
+        return {'period': period, 'months': months, 'today': timezone.now().date()}
+    
+    def build_report(self, period, months, today):
+        """Get booking trends over time"""
         start_date = today - relativedelta(months=months)
         
         # Get all bookings in the period
@@ -266,32 +458,38 @@ class BookingTrendsView(APIView):
                 # Move to the next month
                 current = next_month
         
-        serializer = BookingTrendSerializer(trend_data, many=True)
-        return Response(serializer.data)
-
-
-class UserActivityReportView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
+        return trend_data
     
-    def get(self, request):
-        """Get report on user booking activity"""
-        # Get date range parameters with defaults
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        
-        today = timezone.now().date()
-        
-        # Default to last month if not specified
-        if not start_date_str:
-            start_date = today - timedelta(days=30)
-        else:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    def build_report_from_cube(self, period, months, today):
+        start_date = today - relativedelta(months=months)
+        rows = OccupancyCube(start_date, today).rollup(grain='day')
+        daily_counts = {
+            row['period']: row['bookings_started']
+            for row in rows if row['bookings_started'] > 0
+        }
         
-        if not end_date_str:
-            end_date = today
+        if period == 'daily':
+            trend_data = [
+                {'date': day, 'total_bookings': count}
+                for day, count in daily_counts.items()
+            ]
         else:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+            trend_data = bucket_by_period(daily_counts, start_date, today, period)
         
+        return trend_data
+
+
+class UserActivityReportView(ReportView):
+    report_name = 'user-activity'
+    serializer_class = UserActivitySerializer
+    
+    def get_report_params(self, request):
+        # Default to last month if not specified
+        start_date, end_date = parse_date_range(request, default_days=30)
+        return {'start_date': start_date, 'end_date': end_date}
+    
+    def build_report(self, start_date, end_date):
+        """Get report on user booking activity"""
         # Get all users with their booking stats
         users = User.objects.all()
         
@@ -325,32 +523,20 @@ class UserActivityReportView(APIView):
         # Sort by total bookings (descending)
         user_activities.sort(key=lambda x: x['total_bookings'], reverse=True)
         
-        serializer = UserActivitySerializer(user_activities, many=True)
-        return Response(serializer.data)
+        return user_activities
 
 
-class WorkspacePopularityView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
+class WorkspacePopularityView(ReportView):
+    report_name = 'workspace-popularity'
+    serializer_class = WorkspacePopularitySerializer
     
-    def get(self, request):
-        """Get report on workspace popularity"""
-        # Get date range parameters with defaults
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        
-        today = timezone.now().date()
-        
+    def get_report_params(self, request):
         # Default to last month if not specified
-        if not start_date_str:
-            start_date = today - timedelta(days=30)
-        else:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        
-        if not end_date_str:
-            end_date = today
-        else:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        
+        start_date, end_date = parse_date_range(request, default_days=30)
+        return {'start_date': start_date, 'end_date': end_date}
+    
+    def build_report(self, start_date, end_date):
+        """Get report on workspace popularity"""
         # Get total number of bookings in the period
         total_bookings = Booking.objects.filter(
             start_time__date__gte=start_date,
@@ -388,23 +574,39 @@ class WorkspacePopularityView(APIView):
         # Sort by total bookings (descending)
         popularity_data.sort(key=lambda x: x['total_bookings'], reverse=True)
         
-        serializer = WorkspacePopularitySerializer(popularity_data, many=True)
-        return Response(serializer.data)
-class PeakHoursView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
+        return popularity_data
     
-    def get(self, request):
-        """Get peak hour analysis data"""
-        # Get date range parameters
-        start_date = request.query_params.get('start_date', 
-            (timezone.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
-        end_date = request.query_params.get('end_date', 
-            timezone.now().strftime('%Y-%m-%d'))
-        
-        # Convert to datetime objects
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    def build_report_from_cube(self, start_date, end_date):
+        rows = [
+            row for row in OccupancyCube(start_date, end_date).rollup(grain=None, by='workspace')
+            if row['bookings_started'] > 0
+        ]
+        total_bookings = sum(row['bookings_started'] for row in rows)
+        
+        popularity_data = [
+            {
+                'workspace_id': row['workspace_id'],
+                'workspace_name': row['workspace__name'],
+                'total_bookings': row['bookings_started'],
+                'booking_percentage': round(row['bookings_started'] / total_bookings * 100, 1)
+            }
+            for row in rows
+        ]
+        popularity_data.sort(key=lambda x: x['total_bookings'], reverse=True)
         
+        return popularity_data
+
+
+class PeakHoursView(ReportView):
+    report_name = 'peak-hours'
+    serializer_class = PeakHoursSerializer
+    
+    def get_report_params(self, request):
+        start_date, end_date = parse_date_range(request, default_days=30)
+        return {'start_date': start_date, 'end_date': end_date}
+    
+    def build_report(self, start_date, end_date):
+        """Get peak hour analysis data"""
         # Query bookings and group by hour
         bookings_by_hour = Booking.objects.filter(
             start_time__date__gte=start_date,
@@ -413,9 +615,156 @@ class PeakHoursView(APIView):
         ).annotate(
             hour=ExtractHour('start_time')
         ).values('hour').annotate(
-            total_bookings=Count('id'),
-            occupancy_rate=Avg('workspace__workspace_metrics__occupancy_rate')
+            total_bookings=Count('id', distinct=True),
+            occupancy_rate=Avg('workspace__metrics__occupancy_rate')
         ).order_by('hour')
         
-        serializer = PeakHoursSerializer(bookings_by_hour, many=True)
-        return Response(serializer.data)
+        return list(bookings_by_hour)
+    
+    def build_report_from_cube(self, start_date, end_date):
+        rows = OccupancyCube(start_date, end_date).rollup(grain='hour_of_day')
+        
+        peak_data = [
+            {
+                'hour': row['period'],
+                'total_bookings': row['bookings_started'],
+                'occupancy_rate': row['occupied_minutes'] / (row['hours'] * 60) * 100
+            }
+            for row in rows if row['bookings_started'] > 0
+        ]
+        
+        return peak_data
+
+
+class UniqueUsersView(ReportView):
+    report_name = 'unique-users'
+    serializer_class = UniqueUsersSerializer
+    
+    def get_report_params(self, request):
+        start_date, end_date = parse_date_range(request, default_days=30)
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'filters': parse_workspace_filters(request),
+            'exact': request.query_params.get('exact', '').lower() in ('1', 'true')
+        }
+    
+    def build_report(self, start_date, end_date, filters, exact):
+        """
+        Count distinct booking users over a date range and workspace set by
+        merging the per workspace-day HyperLogLog sketches. `exact` runs
+        COUNT(DISTINCT user_id) over the bookings instead, for validation.
+        """
+        workspaces = Workspace.objects.filter(**filters)
+        metrics = WorkspaceMetric.objects.filter(
+            workspace__in=workspaces,
+            date__gte=start_date,
+            date__lte=end_date
+        )
+        
+        if exact:
+            unique_users = Booking.objects.filter(
+                workspace__in=workspaces,
+                start_time__date__gte=start_date,
+                end_time__date__lte=end_date,
+                status__in=['confirmed', 'completed']
+            ).values('user_id').distinct().count()
+            relative_error = 0.0
+        else:
+            sketch = HyperLogLog.union_bytes(
+                metrics.exclude(user_sketch=None).values_list('user_sketch', flat=True).iterator(),
+                precision=settings.ANALYTICS_HLL_PRECISION
+            )
+            unique_users = sketch.count()
+            relative_error = sketch.relative_error
+        
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'unique_users': unique_users,
+            'exact': exact,
+            'relative_error': round(relative_error, 4),
+            'workspace_days': metrics.count()
+        }
+
+
+class PercentilesView(ReportView):
+    """
+    Percentiles of booking duration, lead time (both in minutes) or
+    attendees, merged from the per workspace-day DDSketches. Estimates are
+    within ANALYTICS_QUANTILE_SKETCH['RELATIVE_ACCURACY'] of the true value.
+    """
+    report_name = 'percentiles'
+    serializer_class = PercentilesSerializer
+    sketch_fields = {
+        'duration': 'duration_sketch',
+        'lead_time': 'lead_time_sketch',
+        'attendees': 'attendees_sketch',
+    }
+    
+    def get_report_params(self, request):
+        start_date, end_date = parse_date_range(request, default_days=30)
+        metric = request.query_params.get('metric', 'duration')
+        by = request.query_params.get('by', 'total')
+        if metric not in self.sketch_fields:
+            raise ValidationError({'metric': f"Choose one of {', '.join(self.sketch_fields)}"})
+        if by not in DIMENSIONS:
+            raise ValidationError({'by': f"Choose one of {', '.join(DIMENSIONS)}"})
+        try:
+            quantiles = sorted({
+                float(q) for q in request.query_params.get('q', '50,90,99').split(',')
+            })
+        except ValueError:
+            raise ValidationError({'q': 'Give percentiles as numbers separated by commas, e.g. 50,90,99'})
+        if not all(0 <= q <= 100 for q in quantiles):
+            raise ValidationError({'q': 'Percentiles must be between 0 and 100'})
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'filters': parse_workspace_filters(request),
+            'metric': metric,
+            'by': by,
+            'quantiles': quantiles
+        }
+    
+    def build_report(self, start_date, end_date, filters, metric, by, quantiles):
+        group_fields = DIMENSIONS[by]
+        sketch_field = self.sketch_fields[metric]
+        
+        rows = WorkspaceMetric.objects.filter(
+            workspace__in=Workspace.objects.filter(**filters),
+            date__gte=start_date,
+            date__lte=end_date
+        ).exclude(**{sketch_field: None}).values_list(*group_fields, sketch_field)
+        
+        max_bins = settings.ANALYTICS_QUANTILE_SKETCH['MAX_BINS']
+        groups = {}
+        for row in rows.iterator():
+            key, sketch = row[:-1], DDSketch.from_dict(row[-1], max_bins)
+            groups[key] = groups[key].merge(sketch) if key in groups else sketch
+        
+        percentile_data = [
+            {
+                'group': {field.replace('workspace__', ''): value for field, value in zip(group_fields, key)},
+                'count': sketch.count,
+                'percentiles': {
+                    f"p{q:g}": sketch.quantile(q / 100) for q in quantiles
+                }
+            }
+            for key, sketch in sorted(groups.items(), key=lambda item: [str(v) for v in item[0]])
+        ]
+        
+        return percentile_data
+
+
+class ReportCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated, CanViewAnalytics]
+    
+    def get(self, request):
+        """Report cache hit rates and compute time saved"""
+        return Response(report_cache.stats())
+    
+    def delete(self, request):
+        """Drop every cached report, including pinned ones"""
+        report_cache.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,103 @@
+"""
+Static OpenAPI schema for the API docs.
+
+The schema is generated once, at build time, by `manage.py generate_schema`
+into settings.API_SCHEMA['PATH'], and the docs views serve that file.
+drf_yasg (and pkg_resources, which it imports) is only loaded to generate
+the schema, so workers don't pay for it at startup.
+
+When the file is missing (a fresh checkout where generate_schema hasn't
+run) the schema is generated in-process on first use instead, so the docs
+keep working, just with the old cost.
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+API_INFO = {
+    'title': "ATLAS Workspace Booking API",
+    'default_version': 'v1',
+    'description': "API for ATLAS Workspace Booking application",
+    'terms_of_service': "https://www.example.com/terms/",
+    'contact_email': "contact@example.com",
+    'license_name': "BSD License",
+}
+
+
+def generate_schema(url=None):
+    """OpenAPI (Swagger 2.0) schema of every API endpoint, as JSON bytes"""
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    info = openapi.Info(
+        title=API_INFO['title'],
+        default_version=API_INFO['default_version'],
+        description=API_INFO['description'],
+        terms_of_service=API_INFO['terms_of_service'],
+        contact=openapi.Contact(email=API_INFO['contact_email']),
+        license=openapi.License(name=API_INFO['license_name']),
+    )
+    schema = OpenAPISchemaGenerator(info, url=url).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema(path=None, url=None):
+    """Generate the schema into `path` (default: the configured PATH); returns the path"""
+    path = path or settings.API_SCHEMA['PATH']
+    content = generate_schema(url)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write then rename, so running workers never read a partial file
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as schema_file:
+        schema_file.write(content)
+    os.replace(temporary, path)
+    return path
+
+
+class SchemaStore:
+    """The schema file's content and ETag, reloaded when the file changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = None
+
+    def get(self):
+        """Returns (content, etag)"""
+        path = settings.API_SCHEMA['PATH']
+        try:
+            stamp = (path, os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            stamp = (path, None)
+
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == stamp:
+            return loaded[1], loaded[2]
+
+        with self._lock:
+            if self._loaded is not None and self._loaded[0] == stamp:
+                return self._loaded[1], self._loaded[2]
+            if stamp[1] is None:
+                logger.warning(
+                    "API schema file %s is missing; generating it in-process. "
+                    "Run `manage.py generate_schema` at build time.", path
+                )
+                content = generate_schema()
+            else:
+                with open(path, 'rb') as schema_file:
+                    content = schema_file.read()
+            etag = '"%s"' % hashlib.sha1(content).hexdigest()
+            self._loaded = (stamp, content, etag)
+            return content, etag
+
+    def clear(self):
+        with self._lock:
+            self._loaded = None
+
+
+schema_store = SchemaStore()
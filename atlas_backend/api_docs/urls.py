@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import DocsView, SchemaView
+
+urlpatterns = [
+    path('schema.json', SchemaView.as_view(), name='schema-json'),
+    path('docs/', DocsView.as_view(template_name='api_docs/swagger-ui.html'), name='schema-swagger-ui'),
+    path('redoc/', DocsView.as_view(template_name='api_docs/redoc.html'), name='schema-redoc'),
+]
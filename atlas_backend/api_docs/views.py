@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.generic import TemplateView, View
+
+from .schema import API_INFO, schema_store
+
+
+def schema_response(request):
+    content, etag = schema_store.get()
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA['CACHE_MAX_AGE'])
+    return response
+
+
+class SchemaView(View):
+    """The prebuilt OpenAPI schema"""
+
+    def get(self, request):
+        return schema_response(request)
+
+
+class DocsView(TemplateView):
+    """Swagger UI or ReDoc, loading the schema from SchemaView"""
+
+    def get(self, request, *args, **kwargs):
+        # drf_yasg served the schema from the docs URLs themselves
+        if request.GET.get('format') == 'openapi':
+            return schema_response(request)
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = API_INFO['title']
+        context['schema_url'] = reverse('schema-json')
+        return context
@@ -0,0 +1,323 @@
+"""
+Process-wide database connection pool.
+
+Django opens a connection per thread and, with CONN_MAX_AGE = 0, closes
+it at the end of every request. The pooled backends (see
+atlas_config.db.postgresql) instead check a connection out of a
+ConnectionPool on connect and hand it back on close, so a request reuses
+an established connection instead of paying TCP, TLS and authentication
+again.
+
+Pools are shared by every thread of the process, which suits both WSGI
+worker threads and the thread pool ASGI runs sync views in. A pool is
+never shared across a fork: a process that finds a pool created by its
+parent drops the inherited connections (without closing the parent's
+sockets) and starts over.
+
+Options (the POOL key of a DATABASES entry):
+
+MIN_SIZE      connections opened on first use; idle connections are not
+              trimmed below this
+MAX_SIZE      connections open at once, idle or in use
+TIMEOUT       seconds a checkout waits for a free connection before
+              raising PoolTimeout
+MAX_LIFETIME  seconds after which a connection is replaced (with up to 10%
+              jitter, so connections opened together don't expire together)
+MAX_IDLE      seconds an idle connection above MIN_SIZE is kept
+CHECK_IDLE    run a `SELECT 1` health check on checkout when a connection
+              has been idle at least this many seconds (0: on every
+              checkout)
+"""
+import os
+import random
+import threading
+import time
+import weakref
+
+from atlas_config.metrics import Counter, Gauge, Histogram
+
+POOL_CONNECTIONS = Gauge(
+    'atlas_db_pool_connections', 'Pooled database connections by state', ('alias', 'state')
+)
+POOL_MAX_CONNECTIONS = Gauge(
+    'atlas_db_pool_max_connections', 'Configured maximum pooled database connections', ('alias',)
+)
+POOL_WAITING = Gauge(
+    'atlas_db_pool_waiting', 'Checkouts waiting for a free database connection', ('alias',)
+)
+POOL_WAIT_SECONDS = Histogram(
+    'atlas_db_pool_wait_seconds', 'Time to check out a database connection, including opening it', ('alias',)
+)
+POOL_CHECKOUTS = Counter(
+    'atlas_db_pool_checkouts_total', 'Database connection checkouts by result (reused, opened, timeout)',
+    ('alias', 'result')
+)
+POOL_CLOSED = Counter(
+    'atlas_db_pool_closed_total', 'Pooled database connections closed, by reason', ('alias', 'reason')
+)
+
+DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'MAX_IDLE': 300,
+    'CHECK_IDLE': 30,
+}
+
+
+class PooledConnection:
+    """Bookkeeping for one pooled connection"""
+    __slots__ = ('connection', 'opened_at', 'expires_at', 'returned_at', 'finalizer')
+
+    def __init__(self, connection, max_lifetime):
+        now = time.monotonic()
+        self.connection = connection
+        self.opened_at = now
+        self.expires_at = now + max_lifetime * random.uniform(0.9, 1.0)
+        self.returned_at = now
+        self.finalizer = None
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections.
+
+    `connect()` opens a new connection; `is_healthy(connection, ping)`
+    reports whether a connection can be reused (pinging the server when
+    `ping` is true); `reset(connection)` returns a connection to a clean
+    state before it goes back to the pool and returns False when it can't.
+    """
+
+    def __init__(self, alias, connect, is_healthy, reset, options=None):
+        self.alias = alias
+        self.options = dict(DEFAULTS, **(options or {}))
+        self._connect = connect
+        self._is_healthy = is_healthy
+        self._reset = reset
+        self._idle = []
+        self._in_use = {}
+        self._opening = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._warmed = False
+        self.pid = os.getpid()
+        POOL_MAX_CONNECTIONS.inc((alias,), self.options['MAX_SIZE'])
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def stats(self):
+        with self._condition:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'opening': self._opening,
+                'waiting': self._waiting,
+                'max_size': self.options['MAX_SIZE'],
+            }
+
+    def checkout(self, owner=None):
+        """
+        Return a connection, reusing an idle one when possible. `owner` is
+        the object the connection is lent to; if it is garbage collected
+        without checking the connection in (a thread that ended mid-request),
+        the connection is closed and its slot freed.
+        """
+        if not self._warmed:
+            self.warm()
+        started = time.monotonic()
+        deadline = started + self.options['TIMEOUT']
+
+        while True:
+            entry = None
+            with self._condition:
+                while not self._idle and self.size >= self.options['MAX_SIZE']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        POOL_CHECKOUTS.inc((self.alias, 'timeout'))
+                        POOL_WAIT_SECONDS.observe((self.alias,), time.monotonic() - started)
+                        raise PoolTimeout(
+                            f"No database connection free in pool '{self.alias}' after "
+                            f"{self.options['TIMEOUT']}s ({self.options['MAX_SIZE']} in use)"
+                        )
+                    self._waiting += 1
+                    POOL_WAITING.inc((self.alias,))
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                        POOL_WAITING.dec((self.alias,))
+
+                if self._idle:
+                    # Most recently returned first, so surplus connections
+                    # stay idle long enough to be trimmed
+                    entry = self._idle.pop()
+                    self._in_use[id(entry.connection)] = entry
+                    POOL_CONNECTIONS.dec((self.alias, 'idle'))
+                    POOL_CONNECTIONS.inc((self.alias, 'in_use'))
+                else:
+                    self._opening += 1
+
+            if entry is None:
+                try:
+                    entry = PooledConnection(self._connect(), self.options['MAX_LIFETIME'])
+                except BaseException:
+                    with self._condition:
+                        self._opening -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._opening -= 1
+                    self._in_use[id(entry.connection)] = entry
+                POOL_CONNECTIONS.inc((self.alias, 'in_use'))
+                result = 'opened'
+            else:
+                now = time.monotonic()
+                reason = None
+                if now >= entry.expires_at:
+                    reason = 'lifetime'
+                elif not self._is_healthy(entry.connection, now - entry.returned_at >= self.options['CHECK_IDLE']):
+                    reason = 'unhealthy'
+                if reason:
+                    with self._condition:
+                        self._in_use.pop(id(entry.connection), None)
+                    POOL_CONNECTIONS.dec((self.alias, 'in_use'))
+                    self._close(entry, reason)
+                    continue
+                result = 'reused'
+
+            if owner is not None:
+                entry.finalizer = weakref.finalize(owner, self._abandon, id(entry.connection))
+            POOL_CHECKOUTS.inc((self.alias, result))
+            POOL_WAIT_SECONDS.observe((self.alias,), time.monotonic() - started)
+            return entry.connection
+
+    def checkin(self, connection):
+        """Give a connection back; it is closed instead when it can't be reused"""
+        with self._condition:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            # Not ours (opened before pooling was enabled, or abandoned)
+            self._close_quietly(connection)
+            return
+        POOL_CONNECTIONS.dec((self.alias, 'in_use'))
+        if entry.finalizer is not None:
+            entry.finalizer.detach()
+            entry.finalizer = None
+
+        if os.getpid() != self.pid:
+            return
+        if time.monotonic() >= entry.expires_at:
+            self._close(entry, 'lifetime')
+            return
+        if not self._reset(connection):
+            self._close(entry, 'unhealthy')
+            return
+
+        entry.returned_at = time.monotonic()
+        with self._condition:
+            self._idle.append(entry)
+            POOL_CONNECTIONS.inc((self.alias, 'idle'))
+            surplus = self._trim()
+            self._condition.notify()
+        for stale in surplus:
+            self._close(stale, 'idle')
+
+    def warm(self):
+        """Open connections up to MIN_SIZE"""
+        while True:
+            with self._condition:
+                if self.size >= self.options['MIN_SIZE']:
+                    self._warmed = True
+                    return
+                self._opening += 1
+            try:
+                entry = PooledConnection(self._connect(), self.options['MAX_LIFETIME'])
+            except BaseException:
+                with self._condition:
+                    self._opening -= 1
+                raise
+            with self._condition:
+                self._opening -= 1
+                self._idle.append(entry)
+                POOL_CONNECTIONS.inc((self.alias, 'idle'))
+                self._condition.notify()
+
+    def close_all(self):
+        """Close every idle connection; in-use ones are closed when checked in"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            for entry in self._in_use.values():
+                entry.expires_at = 0
+        for entry in idle:
+            POOL_CONNECTIONS.dec((self.alias, 'idle'))
+            self._close(entry, 'closed')
+
+    def _trim(self):
+        """Remove idle connections above MIN_SIZE idle for longer than MAX_IDLE; call with the lock held"""
+        cutoff = time.monotonic() - self.options['MAX_IDLE']
+        surplus = []
+        # The oldest returned are at the front
+        while self._idle and self.size > self.options['MIN_SIZE'] and self._idle[0].returned_at < cutoff:
+            surplus.append(self._idle.pop(0))
+            POOL_CONNECTIONS.dec((self.alias, 'idle'))
+        return surplus
+
+    def _abandon(self, key):
+        with self._condition:
+            entry = self._in_use.pop(key, None)
+            self._condition.notify()
+        if entry is not None:
+            POOL_CONNECTIONS.dec((self.alias, 'in_use'))
+            self._close(entry, 'abandoned')
+
+    def _close(self, entry, reason):
+        """Close a connection that is no longer counted as idle or in use, freeing its slot"""
+        POOL_CLOSED.inc((self.alias, reason))
+        self._close_quietly(entry.connection)
+        with self._condition:
+            self._condition.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class PoolTimeout(Exception):
+    """No connection freed up within TIMEOUT"""
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """The pool for `key` in this process, created with factory() on first use"""
+    pool = _pools.get(key)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            # A pool inherited across fork belongs to the parent: its
+            # sockets are left alone, and this process starts its own
+            pool = _pools[key] = factory()
+        return pool
+
+
+def close_pools(alias=None):
+    """
+    Retire every pool (or one alias's pools): idle connections are closed
+    now and in-use ones when checked in. The next checkout starts a new pool.
+    """
+    with _pools_lock:
+        keys = [key for key, pool in _pools.items() if alias is None or pool.alias == alias]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close_all()
@@ -0,0 +1,105 @@
+"""
+PostgreSQL backend whose connections come from a process-wide pool (see
+atlas_config.db.pool).
+
+Set ENGINE to 'atlas_config.db.postgresql' and configure the pool under
+the POOL key of the DATABASES entry. Without a POOL key, or with
+POOL['ENABLED'] false, it behaves exactly like
+django.db.backends.postgresql. Keep CONN_MAX_AGE at 0 so every request
+returns its connection to the pool when Django closes it.
+"""
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from atlas_config.db.pool import ConnectionPool, PoolTimeout, get_pool
+from .creation import DatabaseCreation
+
+# libpq's PQTRANSACTION_IDLE, the same in psycopg2 and psycopg 3
+TRANSACTION_IDLE = 0
+
+
+def is_healthy(connection, ping):
+    if connection.closed or connection.info.transaction_status != TRANSACTION_IDLE:
+        return False
+    if ping:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_IDLE:
+                connection.rollback()
+        except base.Database.Error:
+            return False
+    return True
+
+
+def reset(connection):
+    """Roll back whatever the borrower left open"""
+    if connection.closed:
+        return False
+    try:
+        if connection.info.transaction_status != TRANSACTION_IDLE:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+    return connection.info.transaction_status == TRANSACTION_IDLE
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def pool_options(self):
+        options = dict(self.settings_dict.get('POOL') or {'ENABLED': False})
+        # The server-level connections Django opens to create and drop test
+        # databases are never pooled
+        if not options.pop('ENABLED', True) or self.alias == NO_DB_ALIAS:
+            return None
+        return options
+
+    def get_pool(self, conn_params):
+        options = self.pool_options()
+        if options is None:
+            return None
+
+        def create_pool():
+            # New connections are opened by a plain Django wrapper, so the
+            # pool holds no reference to a thread's own wrapper
+            connector = base.DatabaseWrapper(self.settings_dict, self.alias)
+            return ConnectionPool(
+                self.alias,
+                lambda: connector.get_new_connection(conn_params),
+                is_healthy,
+                reset,
+                options
+            )
+
+        key = (self.alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+        return get_pool(key, create_pool)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        if pool is None:
+            self.pool = None
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = (
+            IsolationLevel(isolation_level) if isolation_level is not None else IsolationLevel.READ_COMMITTED
+        )
+        try:
+            connection = pool.checkout(owner=self)
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection)
+            return
+        return super()._close()
@@ -0,0 +1,16 @@
+from django.db.backends.postgresql import creation
+
+from atlas_config.db.pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Idle pooled connections to the test database would make Postgres
+    # refuse to drop it or use it as a template
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools(self.connection.alias)
+        super()._clone_test_db(suffix, verbosity, keepdb)
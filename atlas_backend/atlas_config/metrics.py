@@ -0,0 +1,248 @@
+"""
+Process-local metrics with Prometheus text exposition.
+
+Every thread records into its own shard (a plain dict only that thread
+writes), so recording takes no lock; reads merge the shards. A thread's
+shard is folded into a process total when the thread ends, so servers
+that start a thread per connection don't accumulate shards. Each process
+periodically writes its merged snapshot to METRICS['DIR'] as
+<pid>-<start>.json, and the exposition sums every snapshot in the
+directory, so /metrics reports the totals of all workers on the host.
+Clear the directory on deploy, as snapshots of exited workers are kept to
+keep counters monotonic. Gauges only sum the snapshots of live processes.
+"""
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self._shards = {}
+        self._shard_ids = itertools.count()
+        # Totals of the threads that have ended
+        self._retired = {}
+        self._local = threading.local()
+        # Reentrant: a shard may be retired by a thread holding the lock
+        self._lock = threading.RLock()
+        self._flushed_at = 0.0
+        self._snapshot_name = f'{os.getpid()}-{time.time_ns()}.json'
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Released with the thread's locals when the thread ends
+            sentinel = self._local.sentinel = ThreadSentinel()
+            with self._lock:
+                shard_id = next(self._shard_ids)
+                self._shards[shard_id] = shard
+            weakref.finalize(sentinel, self.retire, shard_id)
+            return shard
+
+    def retire(self, shard_id):
+        """Fold the shard of an ended thread into the process total"""
+        with self._lock:
+            shard = self._shards.pop(shard_id, None)
+            for key, value in (shard or {}).items():
+                merge_value(self._retired, key, list(value) if isinstance(value, list) else value)
+
+    def snapshot(self):
+        """{(name, labels): value} merged across this process's threads"""
+        with self._lock:
+            shards = list(self._shards.values())
+            merged = {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self._retired.items()
+            }
+        for shard in shards:
+            for key, value in shard.copy().items():
+                merge_value(merged, key, list(value) if isinstance(value, list) else value)
+        return merged
+
+    def snapshot_dir(self):
+        return settings.METRICS['DIR']
+
+    def flush(self, force=False):
+        """Write this process's snapshot for the exposition, at most every FLUSH_INTERVAL"""
+        directory = self.snapshot_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < settings.METRICS['FLUSH_INTERVAL']:
+            return
+        self._flushed_at = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self._snapshot_name)
+        with open(f'{path}.tmp', 'w') as snapshot_file:
+            json.dump([[name, list(labels), value] for (name, labels), value in self.snapshot().items()], snapshot_file)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """Snapshots of every process sharing the directory, summed"""
+        directory = self.snapshot_dir()
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        merged = {}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    entries = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            live = process_alive(int(os.path.basename(path).split('-')[0]))
+            for name, labels, value in entries:
+                metric = self.metrics.get(name)
+                if not live and metric is not None and metric.type == 'gauge':
+                    continue
+                merge_value(merged, (name, tuple(labels)), value)
+        return merged
+
+    def exposition(self):
+        """Prometheus text format (version 0.0.4)"""
+        samples = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            series = sorted(
+                (labels, value) for (sample_name, labels), value in samples.items()
+                if sample_name == name
+            )
+            for labels, value in series:
+                lines.extend(metric.format(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+class ThreadSentinel:
+    """Lives as long as its thread's locals; weakly referenceable, unlike object()"""
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_value(merged, key, value):
+    current = merged.get(key)
+    if current is None:
+        merged[key] = value
+    elif isinstance(current, list):
+        for i, part in enumerate(value):
+            current[i] += part
+    else:
+        merged[key] = current + value
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def inc(self, labels=(), value=1):
+        shard = registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def format(self, labels, value):
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {value}']
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. connections in use"""
+    type = 'gauge'
+
+    def dec(self, labels=(), value=1):
+        self.inc(labels, -value)
+
+
+class Histogram:
+    """Shard values are [per-bucket counts..., +Inf count, sum]"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        registry.register(self)
+
+    def observe(self, labels, value):
+        shard = registry.shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def format(self, labels, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), values):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{format_labels(self.labelnames, labels, [("le", bound)])} {cumulative}'
+            )
+        label_text = format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label_text} {values[-1]}')
+        lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+registry = Registry()
+
+REQUEST_LABELS = ('view', 'action', 'method', 'status')
+
+REQUEST_DURATION = Histogram(
+    'atlas_request_duration_seconds', 'Request latency in seconds', REQUEST_LABELS
+)
+REQUEST_QUERIES = Histogram(
+    'atlas_request_db_queries', 'Database queries per request', REQUEST_LABELS, QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = Counter(
+    'atlas_request_db_seconds_total', 'Time spent executing database queries', REQUEST_LABELS
+)
+REQUEST_RENDER_SECONDS = Counter(
+    'atlas_request_render_seconds_total', 'Time spent rendering (serializing) response bodies', REQUEST_LABELS
+)
+RESPONSE_BYTES = Counter(
+    'atlas_response_bytes_total', 'Response body bytes', REQUEST_LABELS
+)
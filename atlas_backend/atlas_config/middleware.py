@@ -0,0 +1,102 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import (
+    registry, REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_SECONDS,
+    REQUEST_RENDER_SECONDS, RESPONSE_BYTES
+)
+from .routers import allow_replica_reads, begin_request, end_request, view_reads_replica
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that counts and times the queries of a request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, query count, DB time, render time and response size
+    per resolved view and action (see atlas_config.metrics). Goes first in
+    MIDDLEWARE so the whole stack is measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        request._metrics_view = ('unmatched', '')
+        request._metrics_render_seconds = 0.0
+        queries = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view, action = request._metrics_view
+        labels = (view, action, request.method, str(response.status_code))
+        REQUEST_DURATION.observe(labels, elapsed)
+        REQUEST_QUERIES.observe(labels, queries.count)
+        REQUEST_DB_SECONDS.inc(labels, queries.seconds)
+        REQUEST_RENDER_SECONDS.inc(labels, request._metrics_render_seconds)
+        if not response.streaming:
+            RESPONSE_BYTES.inc(labels, len(response.content))
+        registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else getattr(view_func, '__name__', 'unknown')
+        # DRF viewsets map methods to actions (list, retrieve, create, ...)
+        actions = getattr(view_func, 'actions', None) or {}
+        request._metrics_view = (view, actions.get(request.method.lower(), ''))
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that step
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets the database router send the reads of opted-in, safe-method views
+    to the replica (see atlas_config.routers). A view opts in with
+    `replica_reads = True`, or for viewsets a tuple of action names.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_reads_replica(view_func, request.method):
+            allow_replica_reads()
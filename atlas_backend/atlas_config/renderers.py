@@ -0,0 +1,121 @@
+"""
+Fast JSON rendering and parsing for the REST API.
+
+`FastJSONRenderer` and `FastJSONParser` replace DRF's JSONRenderer and
+JSONParser with orjson, which encodes dicts, lists, strings, numbers,
+datetimes, dates, times and UUIDs natively. Anything else (Decimal,
+timedelta, lazy translations, querysets, generators) is handed to DRF's
+own JSONEncoder.default, so it comes out as before.
+
+Output is byte-identical to DRF for strings, integers and dates and times
+(UTC as Z, microseconds kept; offsets in whole minutes), including the
+\\u2028/\\u2029 escaping. Floats in exponent form are spelled the shortest
+way (1e-05 becomes 0.00001, 1e+16 becomes 1e16) and NaN/Infinity render
+as null instead of failing the request.
+
+orjson is optional. Without it, and for indented, ASCII-only or
+non-compact output (the browsable API, `; indent=` media type parameters,
+REST_FRAMEWORK UNICODE_JSON/COMPACT_JSON off), DRF's implementation is
+used.
+"""
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import parsers, renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    def __init__(self):
+        super().__init__()
+        self.default = self.encoder_class().default
+
+    @property
+    def fast(self):
+        return orjson is not None and self.compact and not self.ensure_ascii
+
+    def dumps(self, data):
+        """Encode data compactly; JSON bytes, as render() would produce"""
+        if not self.fast:
+            return super().render(data)
+        try:
+            content = orjson.dumps(data, default=self.default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, deep nesting: the stdlib copes or
+            # raises the error DRF always raised
+            return super().render(data)
+        # JSON must stay a strict JavaScript subset, as in DRF
+        for raw, escaped in LINE_SEPARATORS:
+            content = content.replace(raw, escaped)
+        return content
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return self.dumps(data)
+
+    def iter_list(self, items, chunk_size=None):
+        """Encode a list as a sequence of byte chunks of up to chunk_size items"""
+        chunk_size = chunk_size or settings.JSON_RENDERING['STREAM_CHUNK_ITEMS']
+        yield b'['
+        for start in range(0, len(items), chunk_size):
+            chunk = self.dumps(items[start:start + chunk_size])
+            # Strip the brackets and join chunks with a comma
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']'
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        content = stream.read()
+        if encoding.lower().replace('_', '-') in ('utf-8', 'utf8'):
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass
+        # Other charsets, and input orjson refuses but the stdlib accepts
+        # (integers beyond 64 bits, lone surrogates, NaN when STRICT_JSON is
+        # off), take DRF's path, which also raises the usual ParseError
+        return super().parse(io.BytesIO(content), media_type, parser_context)
+
+
+def json_dumps(data):
+    """Compact JSON bytes of data, encoded like API responses"""
+    return FastJSONRenderer().dumps(data)
+
+
+def should_stream(request, data):
+    """Whether a list response is large enough to stream instead of render at once"""
+    return (
+        isinstance(data, list)
+        and len(data) >= settings.JSON_RENDERING['STREAM_MIN_ITEMS']
+        and isinstance(getattr(request, 'accepted_renderer', None), FastJSONRenderer)
+        and request.accepted_renderer.get_indent(request.accepted_media_type, {}) is None
+    )
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """A JSON list sent in encoded chunks, so the whole document is never in memory at once"""
+
+    def __init__(self, items, chunk_size=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(FastJSONRenderer().iter_list(items, chunk_size), **kwargs)
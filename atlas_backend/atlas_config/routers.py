@@ -0,0 +1,204 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary. Reads go to the replica
+(settings.DATABASE_REPLICA['ALIAS'], when that alias is configured) only
+inside requests that opted in: safe-method requests to views whose
+`replica_reads` attribute is True, or, for viewsets, names the action
+(e.g. `replica_reads = ('list',)`). ReplicaRoutingMiddleware marks each
+request; everything outside a request (commands, signals run from them,
+tests without the middleware) reads the primary.
+
+Within an opted-in request, reads still use the primary when:
+
+* the user isn't known yet (authentication itself reads the primary),
+* the user wrote something in the last STICKY_SECONDS (read-your-writes;
+  tracked per user in the shared cache so it holds across workers),
+* the replica is more than MAX_LAG_SECONDS behind or unreachable (checked
+  at most every LAG_CHECK_INTERVAL seconds per process),
+* the primary connection is inside an atomic block, or
+* the code is running under `primary_reads()`.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from .metrics import Counter
+
+REPLICA_ROUTING = Counter(
+    'atlas_db_replica_routing_total',
+    'Replica-eligible requests by where their reads went and why', ('target', 'reason')
+)
+
+STICKY_KEY = 'db:primary-until:{}'
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+# and NULL (treated as 0) when the server isn't a standby
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_alias():
+    alias = settings.DATABASE_REPLICA['ALIAS']
+    return alias if alias in settings.DATABASES else None
+
+
+class RoutingState:
+    """Routing decisions of one request"""
+
+    def __init__(self, request, eligible):
+        self.request = request
+        self.eligible = eligible
+        self.wrote = False
+        self.forced_primary = 0
+        self.decision = None
+
+    def user_id(self):
+        """The authenticated user's id, or None while authentication hasn't happened"""
+        user = getattr(self.request, 'user', None)
+        # Don't trigger the session lookup behind a lazy user; DRF replaces
+        # it with the authenticated user before the view runs
+        if user is None or isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            return None
+        return user.pk if user.is_authenticated else None
+
+    def read_alias(self):
+        if not self.eligible or self.forced_primary or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if self.decision is None:
+            user_id = self.user_id()
+            if user_id is None:
+                return None
+            if caches['shared'].get(STICKY_KEY.format(user_id)):
+                self.decision, reason = DEFAULT_DB_ALIAS, 'sticky'
+            elif lag_monitor.lagging():
+                self.decision, reason = DEFAULT_DB_ALIAS, 'lagging'
+            else:
+                self.decision, reason = replica_alias(), ''
+            REPLICA_ROUTING.inc(('replica' if reason == '' else 'primary', reason))
+        return self.decision
+
+
+class LagMonitor:
+    """Per-process, periodically refreshed view of whether the replica lags"""
+
+    def __init__(self):
+        self._checked_at = float('-inf')
+        self._lagging = False
+        self._lock = threading.Lock()
+
+    def lagging(self):
+        options = settings.DATABASE_REPLICA
+        if time.monotonic() - self._checked_at < options['LAG_CHECK_INTERVAL']:
+            return self._lagging
+        # One thread refreshes; the others keep using the last result
+        if not self._lock.acquire(blocking=False):
+            return self._lagging
+        try:
+            lag = self.measure()
+            self._lagging = lag is None or lag > options['MAX_LAG_SECONDS']
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._lagging
+
+    def measure(self):
+        """Replica lag in seconds, or None when it can't be reached"""
+        connection = connections[replica_alias()]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        return float(lag or 0)
+
+    def reset(self):
+        self._checked_at = float('-inf')
+
+
+lag_monitor = LagMonitor()
+
+
+def view_reads_replica(view_func, method):
+    """Whether a view opted in to replica reads for this request method"""
+    if method not in ('GET', 'HEAD', 'OPTIONS'):
+        return False
+    replica_reads = getattr(getattr(view_func, 'cls', None), 'replica_reads', False)
+    if isinstance(replica_reads, (tuple, list)):
+        actions = getattr(view_func, 'actions', None) or {}
+        return actions.get(method.lower()) in replica_reads
+    return bool(replica_reads)
+
+
+def begin_request(request, eligible=False):
+    """Start routing a request; pass the returned token to end_request"""
+    return _state.set(RoutingState(request, eligible and replica_alias() is not None))
+
+
+def allow_replica_reads():
+    """Let the current request read the replica (once its view is known to opt in)"""
+    state = _state.get()
+    if state is not None:
+        state.eligible = replica_alias() is not None
+
+
+def end_request(token):
+    """Finish routing a request, making its user sticky to the primary if it wrote"""
+    state = _state.get()
+    _state.reset(token)
+    if state is not None and state.wrote and replica_alias() is not None:
+        user_id = state.user_id()
+        if user_id is not None:
+            sticky_seconds = settings.DATABASE_REPLICA['STICKY_SECONDS']
+            caches['shared'].set(STICKY_KEY.format(user_id), True, timeout=sticky_seconds)
+
+
+@contextmanager
+def primary_reads():
+    """Read the primary for the duration of the block"""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    state.forced_primary += 1
+    try:
+        yield
+    finally:
+        state.forced_primary -= 1
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            return None
+        return state.read_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, settings.DATABASE_REPLICA['ALIAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
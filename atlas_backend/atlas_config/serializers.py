@@ -0,0 +1,193 @@
+"""
+Sparse fieldsets and on-demand expansion for API responses.
+
+`?fields=id,start_time,workspace.name` limits a response to the named
+fields, dotted names selecting inside a related object. `?expand=workspace`
+embeds a related object. Without either parameter a response keeps its
+full shape, relations embedded as always; once either is given, relations
+not named in `expand` (or selected into by a dotted field) are rendered as
+their primary key. Unknown names are ignored.
+
+FlexFieldsMixin adds this to a ModelSerializer. Its nested serializer
+fields are the expandable relations; Meta may also declare
+
+    expandable_fields  computed fields backed by the relation of the same
+                       name, rendered as that relation's id unless expanded
+    field_sources      {field: model paths it reads} for computed fields,
+                       e.g. {'duration': ('start_time', 'end_time')}
+
+FlexFieldsViewMixin makes a view load only what its serializer will read:
+only() for the selected columns, select_related() for embedded relations
+and no join for relations rendered as ids. It applies to GET requests, on
+get_object() and list(), and to custom actions through prune_queryset().
+A computed field without field_sources loads every column of its model.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    """'id,workspace.name' -> {'id': {}, 'workspace': {'name': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def requested_selection(request):
+    """(fields tree, expand tree) asked for by the request, or None for the full shape"""
+    params = getattr(request, 'query_params', None)
+    if params is None or (FIELDS_PARAM not in params and EXPAND_PARAM not in params):
+        return None
+    return parse_paths(params.get(FIELDS_PARAM)), parse_paths(params.get(EXPAND_PARAM))
+
+
+class FlexFieldsMixin:
+
+    # Set by the parent serializer on an expanded nested serializer
+    selection = None
+
+    def is_root(self):
+        parent = self.parent
+        return parent is None or isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+    def get_selection(self):
+        if self.selection is not None:
+            return self.selection
+        if not self.is_root():
+            return None
+        return requested_selection(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.get_selection()
+        if selection is None:
+            return fields
+
+        selected, expand = selection
+        if selected:
+            fields = {name: field for name, field in fields.items() if name in selected}
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        for name, field in fields.items():
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer) and name not in expandable:
+                continue
+            if name in expand or selected.get(name):
+                if isinstance(nested, FlexFieldsMixin):
+                    nested.selection = (selected.get(name, {}), expand.get(name, {}))
+            else:
+                # A computed field (source '*') stands for the relation of its name
+                source = field.source if field.source and field.source != '*' else name
+                options = {'source': source} if source != name else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, **options)
+        return fields
+
+
+def model_path(model, source):
+    """
+    (columns, relations) to load for a field reading `source` ('name',
+    'workspace.name', 'user__email'), or None when it isn't a model field
+    """
+    parts = source.replace('.', '__').split('__')
+    relations = []
+    for depth, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if depth == len(parts) - 1:
+            if not field.concrete:
+                # Reverse and many-to-many relations come from a query of their own
+                return [], relations
+            return ['__'.join(parts)], relations
+        if not (field.many_to_one or field.one_to_one):
+            return None
+        relations.append('__'.join(parts[:depth + 1]))
+        model = field.related_model
+    return None
+
+
+def load_plan(serializer, prefix=''):
+    """(only() paths, select_related() paths) for what a serializer instance reads"""
+    model = serializer.Meta.model
+    sources = getattr(serializer.Meta, 'field_sources', {})
+    columns, relations = [], []
+    every_column = False
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            # To-many nesting reads a related manager, not a column
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            path = model_path(model, field.source)
+            if path is None or not path[0]:
+                every_column = True
+                continue
+            relation = path[0][0]
+            columns += [prefix + column for column in path[0]]
+            relations += [prefix + related for related in path[1]] + [prefix + relation]
+            nested_columns, nested_relations = load_plan(field, f'{prefix}{relation}__')
+            columns += nested_columns
+            relations += nested_relations
+            continue
+        if name in sources and not isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField)):
+            paths = [model_path(model, source) for source in sources[name]]
+        elif field.source == '*':
+            paths = [None]
+        else:
+            paths = [model_path(model, field.source)]
+        for path in paths:
+            if path is None:
+                every_column = True
+            else:
+                columns += [prefix + column for column in path[0]]
+                relations += [prefix + related for related in path[1]]
+
+    if every_column:
+        columns += [prefix + field.name for field in model._meta.concrete_fields]
+    # Traversing a relation needs its foreign key loaded
+    columns += relations
+    return columns, relations
+
+
+@lru_cache(maxsize=512)
+def cached_load_plan(serializer_class, fields, expand):
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return None
+    serializer = serializer_class()
+    if fields is not None or expand is not None:
+        serializer.selection = (parse_paths(fields), parse_paths(expand))
+    columns, relations = load_plan(serializer)
+    return tuple(dict.fromkeys(columns)), tuple(dict.fromkeys(relations))
+
+
+class FlexFieldsViewMixin:
+
+    def prune_queryset(self, queryset, serializer_class=None):
+        """Load only the columns and relations the response serializer reads"""
+        params = self.request.query_params
+        plan = cached_load_plan(
+            serializer_class or self.get_serializer_class(), params.get(FIELDS_PARAM), params.get(EXPAND_PARAM)
+        )
+        if plan is None:
+            return queryset
+        columns, relations = plan
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in ('GET', 'HEAD'):
+            queryset = self.prune_queryset(queryset)
+        return queryset
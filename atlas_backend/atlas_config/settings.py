@@ -2,9 +2,11 @@
 Django settings for atlas_config project.
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -38,15 +40,20 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
-    'drf_yasg',
     
     # Custom apps
+    'api_docs',
+    'idempotency',
+    'batch',
     'accounts',
     'bookings',
     'analytics',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'atlas_config.middleware.RequestMetricsMiddleware',
+    'atlas_config.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -80,20 +87,97 @@ WSGI_APPLICATION = 'atlas_config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections come from a per-process pool (atlas_config.db.pool) instead of
+# being opened per request; CONN_MAX_AGE stays 0 so each request hands its
+# connection back. Size MAX_SIZE so workers x MAX_SIZE fits max_connections
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'atlas_config.db.postgresql',
         'NAME': os.environ.get('PGDATABASE', 'postgres'),
         'USER': os.environ.get('PGUSER', 'postgres'),
         'PASSWORD': os.environ.get('PGPASSWORD', 'postgres'),
         'HOST': os.environ.get('PGHOST', 'localhost'),
         'PORT': os.environ.get('PGPORT', '5432'),
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'ENABLED': os.environ.get('DB_POOL_ENABLED', 'True') == 'True',
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'CHECK_IDLE': float(os.environ.get('DB_POOL_CHECK_IDLE', 30)),
+        },
+    }
+}
+
+# DATABASE_ENGINE=sqlite3 runs against a local SQLite file instead, e.g. for
+# benchmarks on a machine without Postgres
+if os.environ.get('DATABASE_ENGINE') == 'sqlite3':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
     }
+
+# Read replica (see atlas_config.routers). Configured by REPLICA_PGHOST, with
+# the other REPLICA_PG* variables defaulting to the primary's settings; in
+# SQLite mode by SQLITE_REPLICA_PATH. Tests read the primary through it.
+if os.environ.get('DATABASE_ENGINE') == 'sqlite3':
+    if os.environ.get('SQLITE_REPLICA_PATH'):
+        DATABASES['replica'] = dict(
+            DATABASES['default'], NAME=os.environ['SQLITE_REPLICA_PATH'], TEST={'MIRROR': 'default'}
+        )
+elif os.environ.get('REPLICA_PGHOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ.get('REPLICA_PGDATABASE', DATABASES['default']['NAME']),
+        USER=os.environ.get('REPLICA_PGUSER', DATABASES['default']['USER']),
+        PASSWORD=os.environ.get('REPLICA_PGPASSWORD', DATABASES['default']['PASSWORD']),
+        HOST=os.environ['REPLICA_PGHOST'],
+        PORT=os.environ.get('REPLICA_PGPORT', DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['atlas_config.routers.PrimaryReplicaRouter']
+
+# STICKY_SECONDS: how long a user who wrote keeps reading the primary;
+# MAX_LAG_SECONDS: replica lag beyond which reads fall back to the primary;
+# LAG_CHECK_INTERVAL: seconds between lag checks per process
+DATABASE_REPLICA = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 15)),
+    'MAX_LAG_SECONDS': float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 5)),
+    'LAG_CHECK_INTERVAL': float(os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 5)),
+}
+
+# Caches
+# The 'shared' cache is file-based so every worker on the host sees the same
+# entries; it holds small coordination values such as data version tokens.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'shared')),
+    },
 }
 
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
+# Seconds between checks of the shared permission-matrix version token
+PERMISSION_MATRIX_CHECK_INTERVAL = float(os.environ.get('PERMISSION_MATRIX_CHECK_INTERVAL', 5))
+
+# Request metrics (atlas_config.metrics). Each worker writes a snapshot to
+# DIR every FLUSH_INTERVAL seconds; /metrics sums them. Clear DIR on deploy
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', 'True') == 'True',
+    'DIR': os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, '.cache', 'metrics')),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 10)),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -129,6 +213,19 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# The Swagger UI and ReDoc assets ship with drf_yasg, which isn't an
+# installed app so that workers don't import it; locate them without importing
+STATICFILES_DIRS = [
+    os.path.join(importlib.util.find_spec('drf_yasg').submodule_search_locations[0], 'static'),
+]
+
+# OpenAPI schema written by `manage.py generate_schema` and served by the
+# docs views (see api_docs.schema)
+API_SCHEMA = {
+    'PATH': os.environ.get('API_SCHEMA_PATH', os.path.join(BASE_DIR, 'build', 'openapi.json')),
+    'CACHE_MAX_AGE': int(os.environ.get('API_SCHEMA_CACHE_MAX_AGE', 300)),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -137,16 +234,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': (
+        'atlas_config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'atlas_config.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Reverse proxies in front of the app, so that throttles key clients on
+    # their own address rather than the proxy's
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
 }
 
+# JSON responses (atlas_config.renderers). List responses of at least
+# STREAM_MIN_ITEMS items are streamed in chunks of STREAM_CHUNK_ITEMS
+JSON_RENDERING = {
+    'STREAM_MIN_ITEMS': int(os.environ.get('JSON_STREAM_MIN_ITEMS', 5000)),
+    'STREAM_CHUNK_ITEMS': int(os.environ.get('JSON_STREAM_CHUNK_ITEMS', 1000)),
+}
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -163,5 +279,134 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Operating-hours calendar: hours used when neither a workspace nor its
+# location has a schedule, and how far ahead availability is precomputed
+OPERATING_CALENDAR = {
+    'DEFAULT_HOURS': ('08:00', '20:00'),
+    'HORIZON_DAYS': int(os.environ.get('OPERATING_CALENDAR_HORIZON_DAYS', 90)),
+}
+
+# Analytics report cache
+ANALYTICS_REPORT_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('ANALYTICS_REPORT_CACHE_MAX_ENTRIES', 256)),
+    'MAX_PINNED': int(os.environ.get('ANALYTICS_REPORT_CACHE_MAX_PINNED', 512)),
+    'VERSION_CACHE': 'shared',
+}
+
+# Where the admin reports read from by default: 'bookings' scans Booking
+# rows, 'cube' reads the hourly occupancy fact table
+ANALYTICS_SOURCE = os.environ.get('ANALYTICS_SOURCE', 'bookings')
+
+# HyperLogLog precision for distinct-user sketches: 2**p registers per
+# workspace-day, standard error about 1.04 / sqrt(2**p)
+ANALYTICS_HLL_PRECISION = int(os.environ.get('ANALYTICS_HLL_PRECISION', 12))
+
+# DDSketch quantile sketches: estimates are within RELATIVE_ACCURACY of the
+# true value; at most MAX_BINS bins are kept per sketch
+ANALYTICS_QUANTILE_SKETCH = {
+    'RELATIVE_ACCURACY': float(os.environ.get('ANALYTICS_QUANTILE_ACCURACY', 0.01)),
+    'MAX_BINS': int(os.environ.get('ANALYTICS_QUANTILE_MAX_BINS', 1024)),
+}
+
+# Authenticated-user cache for CachedJWTAuthentication. MODE is 'cache'
+# (bounded LRU with TTL) or 'stateless' (trust the principal claims
+# embedded in the access token)
+JWT_USER_CACHE = {
+    'MODE': os.environ.get('JWT_USER_CACHE_MODE', 'cache'),
+    'MAX_ENTRIES': int(os.environ.get('JWT_USER_CACHE_MAX_ENTRIES', 10000)),
+    'TTL': float(os.environ.get('JWT_USER_CACHE_TTL', 30)),
+}
+
+# JWT revocation (accounts.revocation). Other processes see a revocation
+# within CHECK_INTERVAL seconds; BLOOM_CAPACITY grows as needed
+TOKEN_REVOCATION = {
+    'BLOOM_CAPACITY': int(os.environ.get('TOKEN_REVOCATION_BLOOM_CAPACITY', 100000)),
+    'BLOOM_ERROR_RATE': float(os.environ.get('TOKEN_REVOCATION_BLOOM_ERROR_RATE', 0.001)),
+    'CHECK_INTERVAL': float(os.environ.get('TOKEN_REVOCATION_CHECK_INTERVAL', 5)),
+}
+
+# Login and registration password hashing runs on a bounded thread pool.
+# Requests beyond MAX_WORKERS + MAX_PENDING get 503 with Retry-After.
+# MAX_WORKERS of 0 means one per CPU
+PASSWORD_HASHING = {
+    'OFFLOAD': os.environ.get('PASSWORD_HASHING_OFFLOAD', 'True') == 'True',
+    'MAX_WORKERS': int(os.environ.get('PASSWORD_HASHING_MAX_WORKERS', 0)),
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 32)),
+    'TIMEOUT': float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 10)),
+}
+
+# Admin bulk user import. WORKERS is the password-hashing process pool size
+# (0 means one per CPU); 'spawn' keeps workers safe under threaded servers
+BULK_USER_IMPORT = {
+    'WORKERS': int(os.environ.get('BULK_USER_IMPORT_WORKERS', 0)),
+    'BATCH_SIZE': int(os.environ.get('BULK_USER_IMPORT_BATCH_SIZE', 1000)),
+    'MAX_ROWS': int(os.environ.get('BULK_USER_IMPORT_MAX_ROWS', 50000)),
+    'START_METHOD': os.environ.get('BULK_USER_IMPORT_START_METHOD', 'spawn'),
+}
+
+# Idempotency-Key handling (see idempotency.keys). TTL: seconds a response
+# is kept for replay; WAIT_TIMEOUT: seconds a duplicate waits for the first
+# request; LOCK_TIMEOUT: seconds after which an unfinished request's key is
+# taken over; MAX_STORED_BYTES: largest streamed body kept for replay
+IDEMPOTENCY = {
+    'TTL': int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60)),
+    'WAIT_TIMEOUT': float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)),
+    'LOCK_TIMEOUT': float(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)),
+    'MAX_STORED_BYTES': int(os.environ.get('IDEMPOTENCY_MAX_STORED_BYTES', 8 * 1024 * 1024)),
+}
+
+# Batched GET requests (batch.views): at most MAX_REQUESTS per batch;
+# batches sent with "concurrent": true share MAX_WORKERS threads per process
+BATCH = {
+    'MAX_REQUESTS': int(os.environ.get('BATCH_MAX_REQUESTS', 20)),
+    'MAX_WORKERS': int(os.environ.get('BATCH_MAX_WORKERS', 4)),
+}
+
+# Sliding-window rate limits and concurrency caps per throttle_scope
+# (atlas_config.throttling). RATES are '<requests>/<period>' per user, or
+# for all clients together under '<scope>.endpoint'. STORE is 'local'
+# (each process counts on its own) or 'shared' (CACHES['shared'], across
+# the host's workers). CONCURRENCY caps requests in flight per process; a
+# request waits up to QUEUE_SECONDS for a slot, then gets 503
+THROTTLING = {
+    'ENABLED': os.environ.get('THROTTLING_ENABLED', 'True') == 'True',
+    'STORE': os.environ.get('THROTTLING_STORE', 'local'),
+    'MAX_KEYS': 100000,
+    'RATES': {
+        'workspaces.available': os.environ.get('THROTTLE_AVAILABLE_RATE', '120/min'),
+        'workspaces.available.endpoint': os.environ.get('THROTTLE_AVAILABLE_ENDPOINT_RATE', '6000/min'),
+        'dashboard': os.environ.get('THROTTLE_DASHBOARD_RATE', '120/min'),
+        'reports': os.environ.get('THROTTLE_REPORTS_RATE', '60/min'),
+    },
+    'CONCURRENCY': {
+        'dashboard': {
+            'MAX_IN_FLIGHT': int(os.environ.get('THROTTLE_DASHBOARD_MAX_IN_FLIGHT', 8)),
+            'QUEUE_SECONDS': float(os.environ.get('THROTTLE_DASHBOARD_QUEUE_SECONDS', 1)),
+            'RETRY_AFTER': 1,
+        },
+        'reports': {
+            'MAX_IN_FLIGHT': int(os.environ.get('THROTTLE_REPORTS_MAX_IN_FLIGHT', 4)),
+            'QUEUE_SECONDS': float(os.environ.get('THROTTLE_REPORTS_QUEUE_SECONDS', 2)),
+            'RETRY_AFTER': 5,
+        },
+    },
+}
+
+# Token buckets for login and registration attempts, per process.
+# RATE is tokens per second, BURST the bucket size
+AUTH_RATE_LIMIT = {
+    'ENABLED': os.environ.get('AUTH_RATE_LIMIT_ENABLED', 'True') == 'True',
+    'ACCOUNT': {
+        'RATE': float(os.environ.get('AUTH_RATE_LIMIT_ACCOUNT_RATE', 5 / 60)),
+        'BURST': int(os.environ.get('AUTH_RATE_LIMIT_ACCOUNT_BURST', 5)),
+    },
+    'IP': {
+        'RATE': float(os.environ.get('AUTH_RATE_LIMIT_IP_RATE', 1)),
+        'BURST': int(os.environ.get('AUTH_RATE_LIMIT_IP_BURST', 20)),
+    },
+}
+
 # CORS settings
-CORS_ALLOW_ALL_ORIGINS = True  # In production, set specific origins
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True  # In production, set specific origins
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
\ No newline at end of file
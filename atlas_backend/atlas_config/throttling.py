@@ -0,0 +1,314 @@
+"""
+Request throttling and load shedding for expensive endpoints.
+
+Views opt in with ThrottledViewMixin and a `throttle_scope` (a viewset can
+name it per action: `@action(..., throttle_scope='workspaces.available')`).
+For that scope, settings.THROTTLING configures:
+
+* RATES['<scope>']: requests per period for each user (anonymous clients
+  by IP), e.g. '120/min'. Over the limit the client gets 429.
+* RATES['<scope>.endpoint']: requests per period for all clients together.
+* CONCURRENCY['<scope>']: requests of the scope running at once in a
+  process. A request waits up to QUEUE_SECONDS for a slot, then gets 503;
+  the cap protects the database from a burst of slow scans, so it is shed
+  regardless of who sent it.
+
+Both come with Retry-After. Rate limits use sliding-window counters: the
+count of the current fixed window plus the previous window's count weighted
+by how much of it still overlaps the last `period` seconds. That smooths
+the burst a fixed window allows at its boundary, in two integers per key.
+
+Windows are kept in process memory (STORE 'local'; each worker enforces the
+limit on its own, as accounts.ratelimit does) or in CACHES['shared'] (STORE
+'shared'; one limit across the host's workers, at the cost of a cache read
+and write per request, and counts that may undercount slightly under
+concurrent requests since the cache has no atomic increment).
+
+A request is counted only once all of its scope's limits allow it. Requests
+checked at the same moment can all pass before any is counted, so under
+concurrency a window may admit a few more than its limit.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import Counter, Gauge
+
+THROTTLE_REQUESTS = Counter(
+    'atlas_throttle_requests_total',
+    'Throttled-scope requests by decision (allowed, throttled, shed)', ('scope', 'result')
+)
+THROTTLE_TRACKED_KEYS = Gauge(
+    'atlas_throttle_tracked_keys', 'Clients with a rate-limit window held in process memory', ('scope',)
+)
+CONCURRENCY_IN_FLIGHT = Gauge(
+    'atlas_throttle_in_flight', 'Requests holding a concurrency slot', ('scope',)
+)
+CONCURRENCY_QUEUED = Gauge(
+    'atlas_throttle_queued', 'Requests waiting for a concurrency slot', ('scope',)
+)
+CONCURRENCY_MAX_IN_FLIGHT = Gauge(
+    'atlas_throttle_max_in_flight', 'Configured concurrency slots', ('scope',)
+)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'120/min' -> (120, 60)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip().lower()]
+
+
+def window_decision(limit, period, offset, previous, current):
+    """
+    Whether one more request fits in the sliding window, and if not, the
+    seconds until it would. `offset` is how far into the current window we are.
+    """
+    weight = 1 - offset / period
+    if previous * weight + current + 1 <= limit:
+        return True, 0
+    if current + 1 > limit:
+        # Not before the next window, once this one has aged enough
+        return False, period - offset + period * max(0.0, 1 - (limit - 1) / current)
+    # Once enough of the previous window has slid out
+    return False, period * (1 - (limit - current - 1) / previous) - offset
+
+
+class LocalWindowStore:
+    """
+    Sliding-window counters held in process memory. The least recently used
+    keys are dropped past `max_keys`, which at worst forgets a client's
+    recent requests.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def counts(self, scope, key, index):
+        """(previous, current) counts of a key's sliding window at window `index`"""
+        entry = self._windows.get((scope, key))
+        if entry is None:
+            return 0, 0
+        if entry[0] == index:
+            return entry[1], entry[2]
+        if entry[0] == index - 1:
+            return entry[2], 0
+        return 0, 0
+
+    def check(self, scope, key, limit, period):
+        """
+        Whether a request fits, without counting it. Returns (allowed,
+        seconds until allowed, count), where count() records the request.
+        """
+        index, offset = divmod(time.time(), period)
+        with self._lock:
+            previous, current = self.counts(scope, key, index)
+        allowed, wait = window_decision(limit, period, offset, previous, current)
+        return allowed, wait, lambda: self.record(scope, key, index)
+
+    def record(self, scope, key, index):
+        with self._lock:
+            if (scope, key) not in self._windows:
+                THROTTLE_TRACKED_KEYS.inc((scope,))
+            previous, current = self.counts(scope, key, index)
+            self._windows[(scope, key)] = (index, previous, current + 1)
+            self._windows.move_to_end((scope, key))
+            while len(self._windows) > self.max_keys:
+                (evicted_scope, _), _ = self._windows.popitem(last=False)
+                THROTTLE_TRACKED_KEYS.dec((evicted_scope,))
+
+
+class SharedWindowStore:
+    """Sliding-window counters in CACHES['shared'], one entry per key and window"""
+
+    def check(self, scope, key, limit, period):
+        """As LocalWindowStore.check"""
+        cache = caches['shared']
+        index, offset = divmod(time.time(), period)
+        previous_key = f'throttle:{scope}:{key}:{index - 1:.0f}'
+        current_key = f'throttle:{scope}:{key}:{index:.0f}'
+        counts = cache.get_many([previous_key, current_key])
+        current = counts.get(current_key, 0)
+        allowed, wait = window_decision(limit, period, offset, counts.get(previous_key, 0), current)
+        # Kept while it can still be the previous window
+        return allowed, wait, lambda: cache.set(current_key, current + 1, timeout=2 * period)
+
+
+local_windows = LocalWindowStore(max_keys=settings.THROTTLING['MAX_KEYS'])
+shared_windows = SharedWindowStore()
+
+
+def window_store():
+    return shared_windows if settings.THROTTLING['STORE'] == 'shared' else local_windows
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Limits each user (anonymous clients by IP) to THROTTLING['RATES'][throttle_scope]"""
+
+    def get_rate_scope(self, scope):
+        return scope
+
+    def get_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def check(self, request, view):
+        """
+        Whether the request fits the limit, without counting it. Returns
+        (allowed, count), where count() records the request (None when the
+        scope has no limit).
+        """
+        options = settings.THROTTLING
+        scope = getattr(view, 'throttle_scope', None)
+        if not options['ENABLED'] or scope is None:
+            return True, None
+        rate_scope = self.get_rate_scope(scope)
+        rate = options['RATES'].get(rate_scope)
+        if not rate:
+            return True, None
+        limit, period = parse_rate(rate)
+        allowed, self.wait_seconds, count = window_store().check(
+            rate_scope, self.get_key(request), limit, period
+        )
+        if not allowed:
+            THROTTLE_REQUESTS.inc((rate_scope, 'throttled'))
+        return allowed, count
+
+    def allow_request(self, request, view):
+        allowed, count = self.check(request, view)
+        if allowed and count is not None:
+            count()
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class EndpointSlidingWindowThrottle(SlidingWindowThrottle):
+    """Limits all clients of a scope together to THROTTLING['RATES']['<scope>.endpoint']"""
+
+    def get_rate_scope(self, scope):
+        return f'{scope}.endpoint'
+
+    def get_key(self, request):
+        return 'all'
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The server is busy with other requests like this one; retry shortly.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # The exception handler turns this into Retry-After
+        self.wait = wait
+
+
+class ConcurrencyLimiter:
+    """At most `max_in_flight` holders at once in this process"""
+
+    def __init__(self, scope, max_in_flight):
+        self.scope = scope
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        CONCURRENCY_MAX_IN_FLIGHT.inc((scope,), max_in_flight)
+
+    def acquire(self, timeout):
+        """Take a slot, waiting up to `timeout` seconds; returns whether one was taken"""
+        if not self._slots.acquire(blocking=False):
+            if timeout <= 0:
+                return False
+            CONCURRENCY_QUEUED.inc((self.scope,))
+            try:
+                if not self._slots.acquire(timeout=timeout):
+                    return False
+            finally:
+                CONCURRENCY_QUEUED.dec((self.scope,))
+        CONCURRENCY_IN_FLIGHT.inc((self.scope,))
+        return True
+
+    def release(self):
+        CONCURRENCY_IN_FLIGHT.dec((self.scope,))
+        self._slots.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def concurrency_limiter(scope):
+    """The limiter of a CONCURRENCY scope, or None when the scope isn't capped"""
+    options = settings.THROTTLING['CONCURRENCY'].get(scope)
+    if not options:
+        return None
+    limiter = _limiters.get(scope)
+    if limiter is None or limiter.max_in_flight != options['MAX_IN_FLIGHT']:
+        with _limiters_lock:
+            limiter = _limiters.get(scope)
+            if limiter is None or limiter.max_in_flight != options['MAX_IN_FLIGHT']:
+                if limiter is not None:
+                    CONCURRENCY_MAX_IN_FLIGHT.dec((scope,), limiter.max_in_flight)
+                limiter = _limiters[scope] = ConcurrencyLimiter(scope, options['MAX_IN_FLIGHT'])
+    return limiter
+
+
+class ThrottledViewMixin:
+    """
+    Rate limits and a concurrency cap for an APIView, configured per
+    `throttle_scope` in settings.THROTTLING. Views without a scope (other
+    actions of a viewset) pass through.
+    """
+    throttle_scope = None
+    throttle_classes = [SlidingWindowThrottle, EndpointSlidingWindowThrottle]
+
+    def check_throttles(self, request):
+        # Count the request only once every limit allows it, so that a
+        # client over its own limit doesn't use up the endpoint's, nor an
+        # endpoint over its limit the client's
+        counts = []
+        for throttle in self.get_throttles():
+            allowed, count = throttle.check(request, self)
+            if not allowed:
+                self.throttled(request, throttle.wait())
+            if count is not None:
+                counts.append(count)
+        for count in counts:
+            count()
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication, permissions and rate limits first, so that a
+        # rejected request never takes a slot
+        super().initial(request, *args, **kwargs)
+        scope = self.throttle_scope
+        if scope is None or not settings.THROTTLING['ENABLED']:
+            return
+        limiter = concurrency_limiter(scope)
+        if limiter is not None:
+            options = settings.THROTTLING['CONCURRENCY'][scope]
+            if not limiter.acquire(options['QUEUE_SECONDS']):
+                THROTTLE_REQUESTS.inc((scope, 'shed'))
+                raise ServiceOverloaded(wait=options['RETRY_AFTER'])
+            request.concurrency_slot = limiter
+        THROTTLE_REQUESTS.inc((scope, 'allowed'))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # The slot is released once the view returns: a streamed response
+        # (atlas_config.renderers.StreamingJSONResponse) encodes its body
+        # after that, without a slot. It is built from data already in
+        # memory, so the database work the cap protects is done by then.
+        limiter = getattr(request, 'concurrency_slot', None)
+        if limiter is not None:
+            request.concurrency_slot = None
+            limiter.release()
+        return super().finalize_response(request, response, *args, **kwargs)
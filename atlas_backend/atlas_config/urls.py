@@ -1,23 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework.routers import DefaultRouter
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ATLAS Workspace Booking API",
-        default_version='v1',
-        description="API for ATLAS Workspace Booking application",
-        terms_of_service="https://www.example.com/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from .views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,10 +10,13 @@ urlpatterns = [
     path('api/accounts/', include('accounts.urls')),
     path('api/bookings/', include('bookings.urls')),
     path('api/analytics/', include('analytics.urls')),
+    path('api/batch/', include('batch.urls')),
+    
+    # Prometheus metrics (admin only)
+    path('metrics', MetricsView.as_view(), name='metrics'),
     
-    # Swagger documentation
-    path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Swagger documentation, served from the prebuilt schema
+    path('api/', include('api_docs.urls')),
     
     # Redirect root to API docs
     path('', RedirectView.as_view(url='/api/docs/', permanent=False)),
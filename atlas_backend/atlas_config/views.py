@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+from accounts.permissions import IsAdmin
+from .metrics import registry
+
+
+class MetricsView(APIView):
+    """Request metrics of every worker, in Prometheus text format"""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BatchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'batch'
+
+    def ready(self):
+        from .query_cache import install
+        install()
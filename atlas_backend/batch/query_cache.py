@@ -0,0 +1,126 @@
+"""
+Per-batch cache of ORM query results.
+
+Inside `batch_query_cache()` every read the ORM runs (querysets, count(),
+exists(), values()) is memoised by database alias, SQL and parameters, so
+sub-requests of one batch that load the same rows hit the database once.
+The cache is shared by the threads a batch runs on and dropped when the
+batch ends; any write in the meantime clears it.
+
+Not cached: SELECT ... FOR UPDATE, `.iterator()` reads streamed from a
+server-side cursor, and queries whose parameters can't be hashed. Outside
+a batch the hook costs one context variable lookup per query.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import EmptyResultSet
+from django.db.models.sql import compiler
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI, SINGLE
+
+from atlas_config.metrics import Counter
+
+BATCH_QUERY_CACHE = Counter(
+    'atlas_batch_query_cache_total', 'ORM reads inside batches by cache result (hit, miss)', ('result',)
+)
+
+_cache = ContextVar('batch_query_cache', default=None)
+_installed = False
+
+
+class QueryCache:
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._results.get(key, QueryCache)
+
+    def set(self, key, result):
+        with self._lock:
+            self._results[key] = result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+@contextmanager
+def batch_query_cache():
+    """Share query results between everything run in the block (and contexts copied from it)"""
+    token = _cache.set(QueryCache())
+    try:
+        yield
+    finally:
+        _cache.reset(token)
+
+
+def cache_key(sql_compiler, result_type):
+    try:
+        sql, params = sql_compiler.as_sql()
+    except EmptyResultSet:
+        return None
+    key = (sql_compiler.using, result_type, sql, tuple(params))
+    try:
+        hash(key)
+    except TypeError:
+        # Lists and dicts bound for array and JSON columns
+        return None
+    return key
+
+
+def cached_execute_sql(execute_sql):
+
+    @functools.wraps(execute_sql)
+    def wrapper(self, result_type=MULTI, chunked_fetch=False, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        cache = _cache.get()
+        if cache is None:
+            return execute_sql(self, result_type, chunked_fetch, chunk_size)
+        if result_type not in (MULTI, SINGLE):
+            # UPDATE and DELETE compilers run through here with CURSOR
+            cache.clear()
+            return execute_sql(self, result_type, chunked_fetch, chunk_size)
+        if chunked_fetch or self.query.select_for_update:
+            return execute_sql(self, result_type, chunked_fetch, chunk_size)
+
+        key = cache_key(self, result_type)
+        if key is None:
+            return execute_sql(self, result_type, chunked_fetch, chunk_size)
+        result = cache.get(key)
+        if result is not QueryCache:
+            BATCH_QUERY_CACHE.inc(('hit',))
+            # A list of row chunks for MULTI; the chunks themselves are never modified
+            return list(result) if result_type == MULTI else result
+        BATCH_QUERY_CACHE.inc(('miss',))
+        result = execute_sql(self, result_type, chunked_fetch, chunk_size)
+        cache.set(key, result)
+        return list(result) if result_type == MULTI else result
+
+    return wrapper
+
+
+def clearing_execute_sql(execute_sql):
+
+    @functools.wraps(execute_sql)
+    def wrapper(self, *args, **kwargs):
+        cache = _cache.get()
+        if cache is not None:
+            cache.clear()
+        return execute_sql(self, *args, **kwargs)
+
+    return wrapper
+
+
+def install():
+    """Hook the cache into the ORM's SQL compilers; called once from BatchConfig.ready"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    compiler.SQLCompiler.execute_sql = cached_execute_sql(compiler.SQLCompiler.execute_sql)
+    # INSERT doesn't go through the base class
+    compiler.SQLInsertCompiler.execute_sql = clearing_execute_sql(compiler.SQLInsertCompiler.execute_sql)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.CharField(max_length=2048)
+
+    def validate_path(self, value):
+        if not value.startswith('/'):
+            raise serializers.ValidationError('Use an absolute path, e.g. /api/bookings/bookings/upcoming/')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    concurrent = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        limit = settings.BATCH['MAX_REQUESTS']
+        if len(value) > limit:
+            raise serializers.ValidationError(f'Send at most {limit} requests per batch.')
+        return value
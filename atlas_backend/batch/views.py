@@ -0,0 +1,169 @@
+"""
+Batched GET requests: several API reads in one round trip.
+
+    POST /api/batch/
+    {"requests": [{"id": "stats", "path": "/api/analytics/dashboard/"},
+                  {"path": "/api/bookings/bookings/upcoming/?page=2"}],
+     "concurrent": false}
+
+answers 200 with one entry per request, in order:
+
+    {"responses": [{"id": "stats", "path": "...", "status": 200, "headers": {...}, "body": {...}}, ...]}
+
+The batch is authenticated once; each sub-request is dispatched straight to
+its API view as that user, without going through the middleware again, and
+still runs the view's own permissions and throttles. Sub-requests read the
+replica when their view opts in (see atlas_config.routers) and share a
+per-batch cache of query results (see batch.query_cache).
+
+With "concurrent": true, sub-requests run on a per-process pool of
+BATCH['MAX_WORKERS'] threads, each with its own database connection; that
+helps when they mostly wait on the database. A failing sub-request gets its
+error status in its entry and doesn't fail the batch.
+"""
+import contextvars
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from atlas_config.metrics import Counter
+from atlas_config.routers import begin_request, end_request, view_reads_replica
+from .query_cache import batch_query_cache
+from .serializers import BatchSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SUBREQUESTS = Counter(
+    'atlas_batch_subrequests_total', 'Batched sub-requests by response status', ('status',)
+)
+
+# Not passed on to sub-requests: they have no body, and they are reads
+DROPPED_META = {'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_IDEMPOTENCY_KEY'}
+# Set by the renderer and the response handlers, not by the view
+UNREPORTED_HEADERS = {'content-type', 'content-length', 'vary', 'allow'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(settings.BATCH['MAX_WORKERS'], thread_name_prefix='batch')
+    return _executor
+
+
+def build_subrequest(request, path):
+    """A GET request for `path` with the batch request's headers, authenticated as its user"""
+    outer = request._request
+    url = urlsplit(path)
+    script_name = outer.META.get('SCRIPT_NAME', '')
+    path_info = url.path[len(script_name):] if script_name and url.path.startswith(script_name) else url.path
+    environ = {key: value for key, value in outer.META.items() if key not in DROPPED_META}
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path_info,
+        'QUERY_STRING': url.query,
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': outer.META.get('wsgi.url_scheme', outer.scheme),
+    })
+    subrequest = WSGIRequest(environ)
+    # DRF authenticates requests carrying these as the given user and token
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    subrequest.user = request.user
+    return subrequest
+
+
+def error_entry(item, status_code, detail):
+    return {
+        'id': item.get('id'), 'path': item['path'], 'status': status_code,
+        'headers': {}, 'body': {'detail': detail},
+    }
+
+
+def response_entry(item, response):
+    if isinstance(response, Response):
+        body = response.data
+    else:
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(content) if content else None
+        else:
+            body = content.decode(response.charset, errors='replace')
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name.lower() not in UNREPORTED_HEADERS
+    }
+    return {
+        'id': item.get('id'), 'path': item['path'], 'status': response.status_code,
+        'headers': headers, 'body': body,
+    }
+
+
+def run_subrequest(request, item):
+    subrequest = build_subrequest(request, item['path'])
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        return error_entry(item, status.HTTP_404_NOT_FOUND, 'Not found.')
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not issubclass(view_class, APIView) or issubclass(view_class, BatchView):
+        return error_entry(item, status.HTTP_400_BAD_REQUEST, 'Only API endpoints can be batched.')
+
+    subrequest.resolver_match = match
+    token = begin_request(subrequest, eligible=view_reads_replica(match.func, 'GET'))
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+        entry = response_entry(item, response)
+    except Exception:
+        logger.exception('Batched request to %s failed', item['path'])
+        entry = error_entry(item, status.HTTP_500_INTERNAL_SERVER_ERROR, 'Server error.')
+    finally:
+        end_request(token)
+    BATCH_SUBREQUESTS.inc((str(entry['status']),))
+    return entry
+
+
+def run_on_worker(request, item):
+    try:
+        return run_subrequest(request, item)
+    finally:
+        # As at the end of a request: give back connections past their
+        # CONN_MAX_AGE (the pool takes pooled ones back)
+        close_old_connections()
+
+
+class BatchView(APIView):
+    """Run several GET requests to the API in one round trip"""
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+
+        with batch_query_cache():
+            if serializer.validated_data['concurrent'] and len(items) > 1:
+                # Each task gets its own copy of the context, holding the shared query cache
+                futures = [
+                    executor().submit(contextvars.copy_context().run, run_on_worker, request, item)
+                    for item in items
+                ]
+                responses = [future.result() for future in futures]
+            else:
+                responses = [run_subrequest(request, item) for item in items]
+        return Response({'responses': responses})
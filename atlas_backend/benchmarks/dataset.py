@@ -0,0 +1,113 @@
+"""
+Seeded benchmark dataset.
+
+Generates workspaces, users and non-overlapping bookings for a profile
+with the generate_load_data command, adds the fixture users and rows the
+scenarios address, then builds the derived data (availability, occupancy
+cube, workspace activity, recent daily metrics) the endpoints read. The
+same seed always yields the same data.
+"""
+import io
+from datetime import time, timedelta
+
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User, Role
+from analytics import cube
+from analytics.models import WorkspaceMetric, UserAnalytic
+from bookings import activity
+from bookings.models import WorkspaceType, Workspace, Booking, OperatingHours, OperatingException
+from bookings.operating_hours import rebuild_availability
+
+PROFILES = {
+    'small': {'workspaces': 50, 'users': 1000, 'bookings': 20000},
+    'medium': {'workspaces': 200, 'users': 5000, 'bookings': 200000},
+    'full': {'workspaces': 500, 'users': 20000, 'bookings': 2000000},
+}
+
+ADMIN_EMAIL = 'bench-admin@example.com'
+EMPLOYEE_EMAIL = 'bench-employee@example.com'
+PASSWORD = 'bench-password'
+FREE_WORKSPACE = 'Bench Free'
+# Days of bookings generated around today
+HISTORY_DAYS = 120
+FUTURE_DAYS = 30
+# Days of daily metrics computed back from today
+METRIC_DAYS = 30
+
+
+def is_seeded(profile):
+    return User.objects.filter(email=ADMIN_EMAIL).exists()
+
+
+def seed(profile, seed=0):
+    """Create the dataset of a profile; returns nothing, see fixture() for handles"""
+    sizes = PROFILES[profile]
+    today = timezone.localdate()
+
+    call_command(
+        'generate_load_data',
+        users=sizes['users'],
+        workspaces=sizes['workspaces'],
+        bookings=sizes['bookings'],
+        days=HISTORY_DAYS,
+        future_days=FUTURE_DAYS,
+        seed=seed,
+        password=PASSWORD,
+        email_domain='bench.example.com',
+        skip_derived=True,
+        stdout=io.StringIO()
+    )
+
+    password = User.objects.filter(email__endswith='@bench.example.com').values_list('password', flat=True).first()
+    with transaction.atomic():
+        User.objects.bulk_create([
+            User(email=ADMIN_EMAIL, first_name='Bench', last_name='Admin', role='admin', password=password),
+            User(email=EMPLOYEE_EMAIL, first_name='Bench', last_name='Employee', role='employee',
+                 department='Engineering', password=password),
+        ])
+        meeting_room = WorkspaceType.objects.filter(capacity__gt=1).order_by('id').first()
+        Workspace.objects.create(name=FREE_WORKSPACE, location='Building 1', floor='1', workspace_type=meeting_room)
+        OperatingHours.objects.bulk_create(
+            OperatingHours(location='Building 1', weekday=weekday, opens_at=time(7), closes_at=time(21))
+            for weekday in range(5)
+        )
+        OperatingException.objects.create(location='Building 2', date=today + timedelta(days=7), description='Closed')
+
+    build_derived(today)
+
+
+def build_derived(today):
+    """Availability, occupancy cube, workspace activity and recent metrics, which bulk inserts skip"""
+    first_booking = Booking.objects.order_by('start_time').values_list('start_time', flat=True).first()
+    rebuild_availability(timezone.localdate(first_booking) if first_booking else today, today + timedelta(days=60))
+    cube.rebuild()
+    activity.refresh()
+    for workspace in Workspace.objects.all():
+        for offset in range(METRIC_DAYS):
+            WorkspaceMetric.calculate_for_date(workspace, today - timedelta(days=offset))
+    for user in User.objects.filter(email__in=[ADMIN_EMAIL, EMPLOYEE_EMAIL]):
+        UserAnalytic.calculate_for_month(user, today.year, today.month)
+
+
+def fixture():
+    """Handles on the seeded rows the scenarios address"""
+    admin = User.objects.get(email=ADMIN_EMAIL)
+    employee = User.objects.get(email=EMPLOYEE_EMAIL)
+    free_workspace = Workspace.objects.get(name=FREE_WORKSPACE)
+    workspace = Workspace.objects.exclude(pk=free_workspace.pk).order_by('id').first()
+    return {
+        'admin': admin,
+        'employee': employee,
+        'workspace_id': workspace.id,
+        'workspace_type_id': workspace.workspace_type_id,
+        'free_workspace_id': free_workspace.id,
+        'user_id': User.objects.exclude(pk__in=[admin.pk, employee.pk]).order_by('id').values_list('id', flat=True).first(),
+        'booking_id': Booking.objects.filter(workspace=workspace).order_by('id').values_list('id', flat=True).first(),
+        'operating_hours_id': OperatingHours.objects.order_by('id').values_list('id', flat=True).first(),
+        'operating_exception_id': OperatingException.objects.order_by('id').values_list('id', flat=True).first(),
+        'metric_id': WorkspaceMetric.objects.order_by('id').values_list('id', flat=True).first(),
+        'role_id': Role.objects.get(name='general').id,
+    }
@@ -0,0 +1,113 @@
+import io
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from atlas_config.renderers import FastJSONParser, FastJSONRenderer
+
+
+def booking_rows(rng, count, now):
+    """Booking list items as the serializers produce them: datetimes already strings"""
+    rows = []
+    for i in range(count):
+        start = now + timedelta(minutes=30 * rng.randint(-5000, 5000))
+        end = start + timedelta(minutes=30 * rng.randint(1, 8))
+        rows.append({
+            'id': i + 1,
+            'workspace': rng.randint(1, 500),
+            'workspace_name': f'Workspace {rng.randint(1, 500)}',
+            'start_time': start.isoformat().replace('+00:00', 'Z'),
+            'end_time': end.isoformat().replace('+00:00', 'Z'),
+            'status': rng.choice(('pending', 'confirmed', 'cancelled', 'completed')),
+            'duration': round((end - start).total_seconds() / 3600, 1),
+        })
+    return rows
+
+
+def report_rows(rng, count, now):
+    """Rows straight from .values(): native datetimes, dates, Decimals and UUIDs"""
+    return [
+        {
+            'hour': now - timedelta(hours=i, microseconds=rng.randrange(1000000)),
+            'date': (now - timedelta(hours=i)).date(),
+            'workspace_id': rng.randint(1, 500),
+            'occupied_minutes': rng.uniform(0, 60),
+            'revenue': Decimal(rng.randint(0, 100000)) / 100,
+            'request_id': uuid.UUID(int=rng.getrandbits(128)),
+            'label': rng.choice(('Desk', 'Meeting Room', 'Focus Booth — 2nd floor')),
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_allocation(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Compare encode/parse time and allocations of the fast JSON renderer and parser against DRF\'s'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        payloads = {
+            'bookings': booking_rows(rng, options['rows'], now),
+            'report': report_rows(rng, options['rows'], now),
+        }
+        renderers = {'drf': JSONRenderer(), 'fast': FastJSONRenderer()}
+        parsers = {'drf': JSONParser(), 'fast': FastJSONParser()}
+
+        self.stdout.write(f'{options["rows"]} rows per payload, best of {options["repeat"]} runs')
+        self.stdout.write(
+            f'{"payload":<10}{"impl":<6}{"bytes":>11}{"encode ms":>11}{"encode KiB":>12}'
+            f'{"parse ms":>10}{"parse KiB":>11}  output'
+        )
+        for name, data in payloads.items():
+            baseline = renderers['drf'].render(data)
+            for impl, renderer in renderers.items():
+                content = renderer.render(data)
+                parser = parsers[impl]
+                encode = best_of(options['repeat'], lambda: renderer.render(data))
+                encode_peak = peak_allocation(lambda: renderer.render(data))
+                parse = best_of(options['repeat'], lambda: parser.parse(io.BytesIO(baseline)))
+                parse_peak = peak_allocation(lambda: parser.parse(io.BytesIO(baseline)))
+                if content == baseline:
+                    output = 'identical'
+                elif json.loads(content) == json.loads(baseline):
+                    output = 'same values'
+                else:
+                    output = 'DIFFERENT'
+                self.stdout.write(
+                    f'{name:<10}{impl:<6}{len(content):>11}{encode * 1000:>11.1f}{encode_peak / 1024:>12.0f}'
+                    f'{parse * 1000:>10.1f}{parse_peak / 1024:>11.0f}  {output}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Done'))
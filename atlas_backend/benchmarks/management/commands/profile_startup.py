@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before serving its first request: configure Django,
+# build the WSGI application and load the URLconf (which imports every view)
+COLD_START = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import sys
+sys.stdout.write(repr(time.perf_counter() - started))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    """{module: (self us, cumulative us, depth)} from `python -X importtime` output"""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            modules[module] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure worker cold start (Django setup, WSGI application, URLconf) in fresh '
+        'interpreters with -X importtime, and report the import cost per top-level package'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help='Packages to list')
+        parser.add_argument('--output', help='Write the report as JSON, e.g. to compare against later')
+        parser.add_argument('--compare', help='A report written earlier with --output')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'atlas_config.settings'
+        ))
+
+        runs = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', COLD_START],
+                env=env, capture_output=True, text=True
+            )
+            wall = time.perf_counter() - started
+            if result.returncode:
+                raise CommandError(f'Cold start failed:\n{result.stderr[-2000:]}')
+            runs.append((wall, float(result.stdout), parse_importtime(result.stderr)))
+
+        packages = defaultdict(list)
+        for _, _, modules in runs:
+            totals = defaultdict(int)
+            for module, (own, _, _) in modules.items():
+                totals[module.split('.')[0]] += own
+            for package, own in totals.items():
+                packages[package].append(own)
+
+        report = {
+            'runs': options['runs'],
+            'process_ms': statistics.median(wall for wall, _, _ in runs) * 1000,
+            'startup_ms': statistics.median(startup for _, startup, _ in runs) * 1000,
+            'import_ms': statistics.median(
+                sum(own for own, _, _ in modules.values()) for _, _, modules in runs
+            ) / 1000,
+            'modules': statistics.median(len(modules) for _, _, modules in runs),
+            'packages': {
+                package: statistics.median(values + [0] * (options['runs'] - len(values))) / 1000
+                for package, values in packages.items()
+            },
+        }
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as report_file:
+                baseline = json.load(report_file)
+
+        self.print_report(report, baseline, options['top'])
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
+                report_file.write('\n')
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def print_report(self, report, baseline, top):
+        def delta(key, value):
+            if baseline is None:
+                return ''
+            before = baseline.get(key, 0)
+            return f'{value - before:>+10.1f}'
+
+        header = f'{"":<26}{"median":>10}' + (f'{"before":>10}{"change":>10}' if baseline else '')
+        self.stdout.write(f'Cold start over {report["runs"]} runs')
+        self.stdout.write(header)
+        for key, label in (('process_ms', 'process ms'), ('startup_ms', 'setup + URLconf ms'),
+                           ('import_ms', 'imports ms'), ('modules', 'modules imported')):
+            before = f'{baseline.get(key, 0):>10.1f}' if baseline else ''
+            self.stdout.write(f'{label:<26}{report[key]:>10.1f}{before}{delta(key, report[key])}')
+
+        self.stdout.write('')
+        self.stdout.write(f'{"package imports ms":<26}{"median":>10}' + (f'{"before":>10}{"change":>10}' if baseline else ''))
+        packages = dict(report['packages'])
+        if baseline:
+            # Packages no longer imported at all are the interesting ones
+            for package in baseline['packages']:
+                packages.setdefault(package, 0.0)
+        ranked = sorted(packages, key=lambda package: -max(
+            packages[package], (baseline or {}).get('packages', {}).get(package, 0)
+        ))
+        for package in ranked[:top]:
+            value = packages[package]
+            if baseline:
+                before = baseline['packages'].get(package, 0.0)
+                self.stdout.write(f'{package:<26}{value:>10.1f}{before:>10.1f}{value - before:>+10.1f}')
+            else:
+                self.stdout.write(f'{package:<26}{value:>10.1f}')
+        self.stdout.write(self.style.SUCCESS(f'Cold start: {report["startup_ms"]:.1f} ms (median)'))
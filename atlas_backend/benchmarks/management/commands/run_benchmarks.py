@@ -0,0 +1,87 @@
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from benchmarks import dataset
+from benchmarks.runner import Runner, compare, load_baseline, save_baseline
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a benchmark dataset in the test database and measure query count, '
+        'p50/p95 latency and peak memory of every API endpoint against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(dataset.PROFILES), default='small')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--only', nargs='*', help='Scenario names to run')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Record the results as the new baseline instead of comparing')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed latency and memory growth over the baseline, as a fraction')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep (and reuse) the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        # DEBUG off as under the test runner; it also keeps the query log from filling up
+        setup_test_environment(debug=False)
+        databases = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        auth_rate_limit = settings.AUTH_RATE_LIMIT['ENABLED']
+        throttling = settings.THROTTLING['ENABLED']
+        # Benchmarks log in and query far faster than the limiters allow
+        settings.AUTH_RATE_LIMIT['ENABLED'] = False
+        settings.THROTTLING['ENABLED'] = False
+        try:
+            regressions = self.run(options)
+        finally:
+            settings.AUTH_RATE_LIMIT['ENABLED'] = auth_rate_limit
+            settings.THROTTLING['ENABLED'] = throttling
+            teardown_databases(databases, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+
+    def run(self, options):
+        profile = options['profile']
+        if not dataset.is_seeded(profile):
+            self.stdout.write(f'Seeding the {profile} dataset...')
+            dataset.seed(profile, options['seed'])
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or scenario.name in options['only']
+        ]
+        runner = Runner(dataset.fixture(), options['iterations'])
+        baseline = load_baseline(options['baseline'], profile)
+
+        self.stdout.write(
+            f'{"scenario":<30}{"status":>10}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}{"peak KB":>10}'
+        )
+        results = {}
+        for scenario in scenarios:
+            result = results[scenario.name] = runner.run(scenario)
+            status = ','.join(map(str, result['status']))
+            line = (
+                f'{scenario.name:<30}{status:>10}{result["queries"]:>9}'
+                f'{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}{result["peak_kb"]:>10.1f}'
+            )
+            self.stdout.write(line if result['ok'] else self.style.ERROR(line))
+            sys.stdout.flush()
+
+        if options['update_baseline']:
+            save_baseline(options['baseline'], profile, results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline for {profile} written to {options["baseline"]}'))
+            return []
+        if not baseline:
+            self.stdout.write(self.style.WARNING(f'No {profile} baseline to compare against'))
+        return compare(results, baseline, options['threshold'])
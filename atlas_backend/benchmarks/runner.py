@@ -0,0 +1,166 @@
+"""
+Runs benchmark scenarios through the full request stack and compares the
+results with a baseline.
+
+Each scenario runs one warm-up iteration, then `iterations` timed ones,
+then one more under tracemalloc for peak memory (tracing slows requests
+down, so it is kept out of the latency figures). Every iteration runs in a
+transaction that is rolled back, so writes leave the dataset unchanged.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from accounts.tokens import tokens_for_user
+from atlas_config.middleware import QueryRecorder
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+class Runner:
+
+    def __init__(self, fixture, iterations):
+        self.fixture = fixture
+        self.iterations = iterations
+        self._clients = {}
+
+    @staticmethod
+    def authenticated_client(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+        return client
+
+    def client_for(self, scenario, context):
+        if 'user' in context:
+            # A user made by prepare, gone after the rollback
+            return self.authenticated_client(context['user'])
+        if scenario.user is None:
+            return APIClient()
+        if scenario.user not in self._clients:
+            self._clients[scenario.user] = self.authenticated_client(self.fixture[scenario.user])
+        return self._clients[scenario.user]
+
+    def request(self, scenario, measure):
+        """One rolled-back iteration; returns (status, seconds, queries)"""
+        with transaction.atomic():
+            context = dict(self.fixture)
+            if scenario.prepare:
+                context.update(scenario.prepare(self.fixture))
+            client = self.client_for(scenario, context)
+            path, data = scenario.build(context)
+
+            queries = QueryRecorder()
+            with connection.execute_wrapper(queries):
+                with measure():
+                    started = time.perf_counter()
+                    if scenario.method == 'get':
+                        response = client.get(path, data)
+                    else:
+                        response = getattr(client, scenario.method)(path, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        if scenario.cleanup:
+            scenario.cleanup()
+        return response.status_code, elapsed, queries.count
+
+    def run(self, scenario):
+        iterations = scenario.iterations or self.iterations
+        expected = scenario.expected_status or 200
+
+        status, _, _ = self.request(scenario, NoTracing)
+        durations, query_counts, statuses = [], [], {status}
+        for _ in range(iterations):
+            status, elapsed, queries = self.request(scenario, NoTracing)
+            statuses.add(status)
+            durations.append(elapsed)
+            query_counts.append(queries)
+
+        tracing = PeakMemory()
+        status, _, _ = self.request(scenario, lambda: tracing)
+        statuses.add(status)
+
+        return {
+            'status': sorted(statuses),
+            'ok': statuses == {expected},
+            'queries': round(statistics.median(query_counts)),
+            'p50_ms': round(percentile(durations, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+            'peak_kb': round(tracing.peak / 1024, 1),
+        }
+
+
+class NoTracing:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class PeakMemory:
+    peak = 0
+
+    def __enter__(self):
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return False
+
+
+def compare(results, baseline, threshold, min_ms=2.0):
+    """
+    Regressions against the baseline: any extra query, or latency / peak
+    memory beyond `threshold` (a fraction) and, for latency, more than
+    `min_ms` absolute, so sub-millisecond noise can't fail the run
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if not result['ok']:
+            regressions.append(f"{name}: status {result['status']}")
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}")
+        for metric in ('p50_ms', 'p95_ms'):
+            if result[metric] > expected[metric] * (1 + threshold) and result[metric] - expected[metric] > min_ms:
+                regressions.append(f"{name}: {metric} {result[metric]}, baseline {expected[metric]}")
+        if result['peak_kb'] > expected['peak_kb'] * (1 + threshold):
+            regressions.append(f"{name}: peak_kb {result['peak_kb']}, baseline {expected['peak_kb']}")
+    return regressions
+
+
+def load_baseline(path, profile):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file).get(profile, {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, profile, results):
+    try:
+        with open(path) as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+    baselines[profile] = {
+        name: {key: result[key] for key in ('queries', 'p50_ms', 'p95_ms', 'peak_kb')}
+        for name, result in sorted(results.items())
+    }
+    with open(path, 'w') as baseline_file:
+        json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
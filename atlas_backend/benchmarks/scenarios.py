@@ -0,0 +1,230 @@
+"""
+One scenario per endpoint route and method of the accounts, bookings,
+analytics and batch URLconfs.
+
+`path` and `data` are formatted with the fixture (see benchmarks.dataset)
+merged with whatever `prepare` returns. `prepare` runs inside the
+iteration's transaction, before timing starts, and can create the rows a
+write consumes; every iteration is rolled back. `user` names the fixture
+user the request authenticates as, unless prepare returns its own.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from accounts.models import User, Role
+from accounts.revocation import revocation_store
+from accounts.tokens import tokens_for_user
+from analytics.cache import report_cache
+from bookings.models import WorkspaceType, Workspace, Booking, OperatingHours, OperatingException
+
+
+class Scenario:
+
+    def __init__(self, name, method, path, data=None, user='admin', prepare=None, cleanup=None,
+                 iterations=None, expected_status=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.user = user
+        self.prepare = prepare
+        self.cleanup = cleanup
+        self.iterations = iterations
+        self.expected_status = expected_status
+
+    def build(self, context):
+        path = self.path.format(**context)
+        data = self.data
+        if isinstance(data, dict):
+            data = {key: value.format(**context) if isinstance(value, str) else value for key, value in data.items()}
+        elif isinstance(data, list):
+            data = [{key: value.format(**context) for key, value in row.items()} for row in data]
+        return path, data
+
+
+def throwaway_user(fixture, **fields):
+    user = User.objects.create_user(
+        'bench-throwaway@example.com', 'unused', first_name='Throw', last_name='Away', **fields
+    )
+    return {'target_id': user.id, 'target': user}
+
+
+def refresh_token(fixture):
+    return {'refresh': str(tokens_for_user(fixture['employee']))}
+
+
+def throwaway_requester(fixture):
+    context = throwaway_user(fixture)
+    context['user'] = context['target']
+    return context
+
+
+def reset_revocations():
+    # Rolled-back revocations linger in this process's filter
+    revocation_store.pruned()
+    revocation_store.get_filter()
+
+
+def future_slot(fixture):
+    start = (timezone.now() + timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+    return {'start': start, 'end': start + timedelta(hours=2)}
+
+
+def employee_booking(fixture):
+    slot = future_slot(fixture)
+    booking = Booking.objects.create(
+        user=fixture['employee'], workspace_id=fixture['free_workspace_id'],
+        start_time=slot['start'], end_time=slot['end'], status='confirmed'
+    )
+    return dict(slot, target_id=booking.id)
+
+
+def new_workspace_type(fixture):
+    return {'target_id': WorkspaceType.objects.create(name='Bench Type').id}
+
+
+def new_workspace(fixture):
+    workspace = Workspace.objects.create(
+        name='Bench Throwaway', location='Building 1', workspace_type_id=fixture['workspace_type_id']
+    )
+    return {'target_id': workspace.id}
+
+
+def new_role(fixture):
+    return {'target_id': Role.objects.create(name='bench-role').id}
+
+
+def new_operating_hours(fixture):
+    hours = OperatingHours.objects.create(location='Bench Site', weekday=0, opens_at='09:00', closes_at='17:00')
+    return {'target_id': hours.id}
+
+
+def new_operating_exception(fixture):
+    exception = OperatingException.objects.create(location='Bench Site', date=timezone.localdate())
+    return {'target_id': exception.id}
+
+
+def cold_reports(fixture):
+    # Measure report computation, not cache hits
+    report_cache.clear()
+    return {}
+
+
+def report(name, path, **params):
+    return Scenario(name, 'get', path, data=params or None, prepare=cold_reports)
+
+
+SCENARIOS = [
+    # accounts
+    Scenario('register', 'post', '/api/accounts/register/', user=None, iterations=3, expected_status=201, data={
+        'email': 'bench-register@example.com', 'password': 'bench-password',
+        'password_confirmation': 'bench-password', 'first_name': 'Bench', 'last_name': 'Register',
+    }),
+    Scenario('login', 'post', '/api/accounts/login/', user=None, iterations=3,
+             data={'email': 'bench-employee@example.com', 'password': 'bench-password'}),
+    Scenario('logout', 'post', '/api/accounts/logout/', user='employee', data={'refresh': '{refresh}'},
+             prepare=refresh_token, cleanup=reset_revocations, expected_status=204),
+    Scenario('logout-all', 'post', '/api/accounts/logout/all/', prepare=throwaway_requester,
+             cleanup=reset_revocations, expected_status=204),
+    Scenario('token-refresh', 'post', '/api/accounts/token/refresh/', user=None,
+             data={'refresh': '{refresh}'}, prepare=refresh_token),
+    Scenario('profile-get', 'get', '/api/accounts/profile/', user='employee'),
+    Scenario('profile-update', 'patch', '/api/accounts/profile/', user='employee', data={'department': 'Design'}),
+    Scenario('user-list', 'get', '/api/accounts/users/'),
+    Scenario('user-search', 'get', '/api/accounts/users/', data={'q': 'grace user1'}),
+    Scenario('user-bulk-import', 'post', '/api/accounts/users/bulk-import/', iterations=2, data=[
+        {'email': f'bench-import{i}@example.com', 'password': 'bench-password',
+         'first_name': 'Bench', 'last_name': f'Import{i}'}
+        for i in range(5)
+    ]),
+    Scenario('user-detail-get', 'get', '/api/accounts/users/{user_id}/'),
+    Scenario('user-detail-update', 'patch', '/api/accounts/users/{user_id}/', data={'department': 'Finance'}),
+    Scenario('user-detail-delete', 'delete', '/api/accounts/users/{target_id}/', prepare=throwaway_user,
+             expected_status=204),
+    Scenario('user-revoke-tokens', 'post', '/api/accounts/users/{target_id}/revoke-tokens/',
+             prepare=throwaway_user, cleanup=reset_revocations, expected_status=204),
+    Scenario('user-role-update', 'patch', '/api/accounts/users/{user_id}/role/', data={'role': 'learner'}),
+    Scenario('role-list', 'get', '/api/accounts/roles/'),
+    Scenario('role-create', 'post', '/api/accounts/roles/', data={'name': 'bench-created'}, expected_status=201),
+    Scenario('role-get', 'get', '/api/accounts/roles/{role_id}/'),
+    Scenario('role-update', 'patch', '/api/accounts/roles/{role_id}/', data={'description': 'Benchmarked'}),
+    Scenario('role-delete', 'delete', '/api/accounts/roles/{target_id}/', prepare=new_role, expected_status=204),
+
+    # bookings
+    Scenario('workspace-type-list', 'get', '/api/bookings/workspace-types/'),
+    Scenario('workspace-type-create', 'post', '/api/bookings/workspace-types/', data={'name': 'Bench Pod'},
+             expected_status=201),
+    Scenario('workspace-type-get', 'get', '/api/bookings/workspace-types/{workspace_type_id}/'),
+    Scenario('workspace-type-update', 'patch', '/api/bookings/workspace-types/{workspace_type_id}/',
+             data={'description': 'Benchmarked'}),
+    Scenario('workspace-type-delete', 'delete', '/api/bookings/workspace-types/{target_id}/',
+             prepare=new_workspace_type, expected_status=204),
+    Scenario('workspace-list', 'get', '/api/bookings/workspaces/'),
+    Scenario('workspace-available', 'get', '/api/bookings/workspaces/available/', prepare=future_slot,
+             data={'start_time': '{start}', 'end_time': '{end}'}),
+    Scenario('workspace-create', 'post', '/api/bookings/workspaces/', expected_status=201, data={
+        'name': 'Bench Created', 'location': 'Building 1', 'floor': '2', 'workspace_type': '{workspace_type_id}',
+    }),
+    Scenario('workspace-get', 'get', '/api/bookings/workspaces/{workspace_id}/'),
+    Scenario('workspace-update', 'patch', '/api/bookings/workspaces/{workspace_id}/', data={'floor': '9'}),
+    Scenario('workspace-delete', 'delete', '/api/bookings/workspaces/{target_id}/', prepare=new_workspace,
+             expected_status=204),
+    Scenario('operating-hours-list', 'get', '/api/bookings/operating-hours/'),
+    Scenario('operating-hours-create', 'post', '/api/bookings/operating-hours/', expected_status=201, data={
+        'location': 'Building 3', 'weekday': 5, 'opens_at': '10:00', 'closes_at': '14:00',
+    }),
+    Scenario('operating-hours-get', 'get', '/api/bookings/operating-hours/{operating_hours_id}/'),
+    Scenario('operating-hours-update', 'patch', '/api/bookings/operating-hours/{operating_hours_id}/',
+             data={'closes_at': '22:00'}),
+    Scenario('operating-hours-delete', 'delete', '/api/bookings/operating-hours/{target_id}/',
+             prepare=new_operating_hours, expected_status=204),
+    Scenario('operating-exception-list', 'get', '/api/bookings/operating-exceptions/'),
+    Scenario('operating-exception-create', 'post', '/api/bookings/operating-exceptions/', expected_status=201,
+             data={'location': 'Building 3', 'date': '2030-12-25', 'description': 'Holiday'}),
+    Scenario('operating-exception-get', 'get', '/api/bookings/operating-exceptions/{operating_exception_id}/'),
+    Scenario('operating-exception-update', 'patch',
+             '/api/bookings/operating-exceptions/{operating_exception_id}/', data={'description': 'Benchmarked'}),
+    Scenario('operating-exception-delete', 'delete', '/api/bookings/operating-exceptions/{target_id}/',
+             prepare=new_operating_exception, expected_status=204),
+    Scenario('booking-list-admin', 'get', '/api/bookings/bookings/'),
+    Scenario('booking-list-employee', 'get', '/api/bookings/bookings/', user='employee'),
+    Scenario('booking-create', 'post', '/api/bookings/bookings/', user='employee', prepare=future_slot,
+             expected_status=201, data={
+                 'workspace': '{free_workspace_id}', 'start_time': '{start}', 'end_time': '{end}', 'attendees': 2,
+             }),
+    Scenario('booking-get', 'get', '/api/bookings/bookings/{booking_id}/'),
+    Scenario('booking-update', 'patch', '/api/bookings/bookings/{target_id}/', user='employee',
+             prepare=employee_booking, data={'purpose': 'Benchmarking'}),
+    Scenario('booking-delete', 'delete', '/api/bookings/bookings/{target_id}/', user='employee',
+             prepare=employee_booking, expected_status=204),
+    Scenario('booking-cancel', 'post', '/api/bookings/bookings/{target_id}/cancel/', user='employee',
+             prepare=employee_booking),
+    Scenario('booking-upcoming', 'get', '/api/bookings/bookings/upcoming/', user='employee'),
+    Scenario('booking-today', 'get', '/api/bookings/bookings/today/'),
+
+    # analytics
+    Scenario('workspace-metric-list', 'get', '/api/analytics/workspace-metrics/'),
+    Scenario('workspace-metric-get', 'get', '/api/analytics/workspace-metrics/{metric_id}/'),
+    Scenario('user-analytics-list', 'get', '/api/analytics/user-analytics/'),
+    Scenario('dashboard', 'get', '/api/analytics/dashboard/', user='employee'),
+    report('occupancy-report', '/api/analytics/occupancy-report/'),
+    report('occupancy-report-cube', '/api/analytics/occupancy-report/', source='cube'),
+    report('booking-trends', '/api/analytics/booking-trends/'),
+    report('user-activity', '/api/analytics/user-activity/'),
+    report('workspace-popularity', '/api/analytics/workspace-popularity/'),
+    report('peak-hours', '/api/analytics/peak-hours/'),
+    report('unique-users', '/api/analytics/unique-users/'),
+    report('percentiles', '/api/analytics/percentiles/', metric='duration'),
+    Scenario('report-cache-stats', 'get', '/api/analytics/report-cache/'),
+    Scenario('report-cache-clear', 'delete', '/api/analytics/report-cache/', expected_status=204),
+    Scenario('metrics', 'get', '/metrics'),
+
+    # batch: the employee dashboard's reads in one request
+    Scenario('batch-dashboard', 'post', '/api/batch/', user='employee', data={'requests': [
+        {'path': '/api/analytics/dashboard/'},
+        {'path': '/api/bookings/bookings/upcoming/'},
+        {'path': '/api/bookings/bookings/today/'},
+        {'path': '/api/bookings/workspaces/'},
+    ]}),
+]
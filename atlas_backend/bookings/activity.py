@@ -0,0 +1,163 @@
+"""
+Booking activity summarised on each workspace.
+
+    next_booking_at         start of the earliest pending or confirmed booking
+                            still ahead when the column was last updated
+    active_booking_count    pending and confirmed bookings
+    last_booked_at          when the latest booking that wasn't cancelled was made
+    lifetime_booking_count  bookings that weren't cancelled
+
+Listing and sorting workspaces by activity then reads columns instead of
+aggregating bookings. Every booking save or delete applies the difference
+between its previous and new state (see bookings.signals): counts move by
+F() deltas, and the timestamps are recomputed from the workspace's bookings
+in the same UPDATE when the change can move them. The previous state is the
+stored row, read under a lock by Booking.save() and delete(), so concurrent
+changes to one booking are each counted once.
+
+Workspace.save() leaves the columns out of its UPDATE, so that a workspace
+edited from a stale instance doesn't write back old values.
+
+Writes that bypass signals (queryset.update(), bulk inserts) leave the
+columns behind, and so does time: a next booking that has started stays
+until something recomputes it. `manage.py verify_workspace_counters`,
+run periodically, finds workspaces whose columns differ from their
+bookings and recomputes them.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Booking, Workspace
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+COLUMNS = Workspace.ACTIVITY_FIELDS
+
+
+def is_active(state):
+    return state is not None and state['status'] in ACTIVE_STATUSES
+
+
+def is_counted(state):
+    return state is not None and state['status'] != 'cancelled'
+
+
+def workspace_bookings():
+    return Booking.objects.filter(workspace=OuterRef('pk')).order_by()
+
+
+def next_booking_subquery(now):
+    return Subquery(
+        workspace_bookings().filter(
+            status__in=ACTIVE_STATUSES, start_time__gte=now
+        ).order_by('start_time').values('start_time')[:1]
+    )
+
+
+def last_booked_subquery():
+    return Subquery(
+        workspace_bookings().exclude(status='cancelled').order_by('-created_at').values('created_at')[:1]
+    )
+
+
+def count_subquery(bookings):
+    return Coalesce(Subquery(bookings.values('workspace').annotate(count=Count('id')).values('count')), 0)
+
+
+def apply_booking_change(old_state, new_state, created_at=None):
+    """
+    Apply the difference between two booking states to the activity
+    columns of their workspaces. `created_at` is the booking's, needed
+    when it starts counting.
+    """
+    now = timezone.now()
+    deltas = defaultdict(lambda: [0, 0])
+    changes = defaultdict(dict)
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        delta = deltas[state['workspace_id']]
+        delta[0] += sign * is_active(state)
+        delta[1] += sign * is_counted(state)
+        if is_active(state) and state['start_time'] >= now:
+            changes[state['workspace_id']]['next_booking_at'] = next_booking_subquery(now)
+
+    for workspace_id, (active, lifetime) in deltas.items():
+        fields = changes[workspace_id]
+        # Clamped, so that a booking the counts missed can't fail its delete
+        if active:
+            fields['active_booking_count'] = Greatest(F('active_booking_count') + active, Value(0))
+        if lifetime:
+            fields['lifetime_booking_count'] = Greatest(F('lifetime_booking_count') + lifetime, Value(0))
+            if lifetime > 0 and created_at is not None:
+                # Greatest is NULL with a NULL argument on some databases
+                fields['last_booked_at'] = Greatest(
+                    Coalesce(F('last_booked_at'), Value(created_at)), Value(created_at)
+                )
+            else:
+                fields['last_booked_at'] = last_booked_subquery()
+
+    updates = [(workspace_id, fields) for workspace_id, fields in sorted(changes.items()) if fields]
+    if len(updates) == 1:
+        workspace_id, fields = updates[0]
+        Workspace.objects.filter(pk=workspace_id).update(**fields)
+        return
+    with transaction.atomic():
+        # In id order, so that two bookings moving between the same
+        # workspaces lock their rows in the same order
+        for workspace_id, fields in updates:
+            Workspace.objects.filter(pk=workspace_id).update(**fields)
+
+
+def refresh(workspaces=None):
+    """
+    Recompute the activity columns from bookings, for a queryset of
+    workspaces or all of them. Returns the number of workspaces updated.
+    """
+    if workspaces is None:
+        workspaces = Workspace.objects.all()
+    return workspaces.update(
+        next_booking_at=next_booking_subquery(timezone.now()),
+        active_booking_count=count_subquery(workspace_bookings().filter(status__in=ACTIVE_STATUSES)),
+        last_booked_at=last_booked_subquery(),
+        lifetime_booking_count=count_subquery(workspace_bookings().exclude(status='cancelled')),
+    )
+
+
+def find_drift():
+    """Ids of the workspaces whose activity columns differ from their bookings"""
+    now = timezone.now()
+    expected = {
+        row.pop('workspace_id'): row
+        for row in Booking.objects.order_by().values('workspace_id').annotate(
+            next_booking_at=Min('start_time', filter=Q(status__in=ACTIVE_STATUSES, start_time__gte=now)),
+            active_booking_count=Count('id', filter=Q(status__in=ACTIVE_STATUSES)),
+            last_booked_at=Max('created_at', filter=~Q(status='cancelled')),
+            lifetime_booking_count=Count('id', filter=~Q(status='cancelled')),
+        )
+    }
+    idle = dict.fromkeys(COLUMNS, None) | {'active_booking_count': 0, 'lifetime_booking_count': 0}
+    drifted = []
+    for row in Workspace.objects.values('id', *COLUMNS).iterator():
+        workspace_id = row.pop('id')
+        if row != expected.get(workspace_id, idle):
+            drifted.append(workspace_id)
+    return drifted
+
+
+def verify(fix=True, batch_size=1000):
+    """
+    Find workspaces whose activity columns have drifted from their bookings
+    and, with `fix`, recompute them. Returns their ids.
+    """
+    drifted = find_drift()
+    if fix:
+        # Recomputed in the database rather than written from find_drift's
+        # rows, so that bookings changed in between aren't undone
+        for start in range(0, len(drifted), batch_size):
+            refresh(Workspace.objects.filter(id__in=drifted[start:start + batch_size]))
+    return drifted
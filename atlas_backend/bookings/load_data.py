@@ -0,0 +1,310 @@
+"""
+Synthetic load-test data.
+
+Generates users, workspace types, workspaces and bookings with realistic
+shape: bookings cluster in business hours, follow weekday and monthly
+seasonality, and each user has habits (home workspaces, preferred
+weekdays, usual duration and booking lead time). Bookings never overlap
+within a workspace by construction: each workspace-day draws distinct
+start slots and every booking ends at or before the next one starts.
+
+Everything is drawn from one seeded random.Random, so a seed always yields
+the same data. Rows are produced as tuples and loaded with COPY on Postgres
+or batched INSERTs elsewhere; see load_rows.
+"""
+import io
+import json
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from .models import WorkspaceType, Workspace, Booking
+
+SLOT_MINUTES = 30
+# Bookable day 07:00-20:00 in 30-minute slots
+FIRST_SLOT = 7 * 60 // SLOT_MINUTES
+LAST_SLOT = 20 * 60 // SLOT_MINUTES
+# Relative likelihood of a booking starting in each slot: morning and
+# early-afternoon peaks, little before 8:00 or after 17:00
+SLOT_WEIGHTS = [
+    0.2, 0.4, 1.2, 2.0, 3.0, 3.0, 2.6, 2.2, 1.4, 1.0,
+    2.0, 2.4, 2.2, 1.8, 1.6, 1.2, 0.9, 0.6, 0.4, 0.3,
+    0.2, 0.15, 0.1, 0.1, 0.05, 0.05,
+]
+WEEKDAY_WEIGHTS = (1.0, 1.15, 1.2, 1.05, 0.6, 0.06, 0.03)
+MONTH_WEIGHTS = (0.85, 1.0, 1.05, 1.0, 1.0, 0.95, 0.75, 0.65, 1.05, 1.1, 1.05, 0.7)
+
+WORKSPACE_TYPES = (
+    # name, capacity, share of workspaces, amenities
+    ('Hot Desk', 1, 0.55, {'monitor': True}),
+    ('Focus Booth', 1, 0.15, {'soundproof': True}),
+    ('Meeting Room', 8, 0.2, {'screen': True, 'whiteboard': True}),
+    ('Collaboration Space', 14, 0.1, {'whiteboard': True}),
+)
+ROLES = (('employee', 0.62), ('learner', 0.25), ('general', 0.1), ('admin', 0.03))
+DEPARTMENTS = ('Engineering', 'Design', 'Product', 'Sales', 'Support', 'Finance', 'People', 'Operations')
+FIRST_NAMES = ('Ada', 'Alan', 'Grace', 'Linus', 'Barbara', 'Ken', 'Margaret', 'Dennis', 'Frances', 'Edsger',
+               'Radia', 'Tim', 'Katherine', 'Guido', 'Hedy', 'Donald')
+LAST_NAMES = ('Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Liskov', 'Thompson', 'Hamilton', 'Ritchie',
+              'Allen', 'Dijkstra', 'Perlman', 'Berners-Lee', 'Johnson', 'Rossum', 'Lamarr', 'Knuth')
+
+
+def copy_value(value):
+    """A value in Postgres COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime, time)):
+        value = value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def load_rows(model, fields, rows, batch_size=50000):
+    """
+    Insert an iterable of value tuples for `fields` (attnames) of a model.
+
+    Postgres gets COPY ... FROM STDIN, one batch at a time. Other backends
+    get batched executemany INSERTs of the field-prepared values; unlike
+    bulk_create, neither touches auto_now/auto_now_add fields, so generated
+    timestamps are kept. Returns the number of rows inserted.
+    """
+    opts = model._meta
+    model_fields = [opts.get_field(name) if name != 'pk' else opts.pk for name in fields]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in model_fields)
+    table = quote(opts.db_table)
+    total = 0
+
+    def batches():
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in batches():
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                buffer.writelines('\t'.join(map(copy_value, row)) + '\n' for row in batch)
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(model_fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                    [
+                        [field.get_db_prep_save(value, connection) for field, value in zip(model_fields, row)]
+                        for row in batch
+                    ]
+                )
+            total += len(batch)
+    return total
+
+
+def new_ids(model, previous_max):
+    """Ids of the rows inserted after previous_max, in insertion order"""
+    return list(model.objects.filter(pk__gt=previous_max).order_by('pk').values_list('pk', flat=True))
+
+
+def max_id(model):
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def poisson(rng, mean):
+    """Poisson draw; Knuth's method for small means, normal approximation above"""
+    if mean > 30:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    threshold, count, product = math.exp(-mean), 0, rng.random()
+    while product > threshold:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+class LoadDataGenerator:
+
+    def __init__(self, users, workspaces, bookings, days, future_days, seed, password_hash,
+                 email_domain='load.example.com', batch_size=50000):
+        self.user_count = users
+        self.workspace_count = workspaces
+        self.booking_count = bookings
+        self.days = days
+        self.future_days = future_days
+        self.rng = random.Random(seed)
+        self.password_hash = password_hash
+        self.email_domain = email_domain
+        self.batch_size = batch_size
+        self.now = timezone.now().replace(microsecond=0)
+        self.today = timezone.localdate()
+        self.first_day = self.today - timedelta(days=days)
+        self.last_day = self.today + timedelta(days=future_days)
+
+    def run(self):
+        """Generate and load everything; returns {table: rows inserted}"""
+        counts = {}
+        counts['workspace types'], type_specs = self.load_workspace_types()
+        counts['workspaces'], workspaces = self.load_workspaces(type_specs)
+        counts['users'], user_ids = self.load_users()
+        habits = self.user_habits(user_ids, workspaces)
+        counts['bookings'] = load_rows(
+            Booking,
+            ('user_id', 'workspace_id', 'start_time', 'end_time', 'purpose', 'attendees', 'status',
+             'created_at', 'updated_at'),
+            self.bookings(workspaces, habits),
+            self.batch_size
+        )
+        return counts
+
+    def load_workspace_types(self):
+        previous = max_id(WorkspaceType)
+        rows = [
+            (name, f'{name} (generated)', capacity, amenities, self.now, self.now)
+            for name, capacity, _, amenities in WORKSPACE_TYPES
+        ]
+        count = load_rows(
+            WorkspaceType, ('name', 'description', 'capacity', 'amenities', 'created_at', 'updated_at'), rows
+        )
+        return count, list(zip(new_ids(WorkspaceType, previous), WORKSPACE_TYPES))
+
+    def load_workspaces(self, type_specs):
+        """Returns [(id, location, capacity, popularity)]"""
+        previous = max_id(Workspace)
+        buildings = max(1, self.workspace_count // 150)
+        kinds = self.rng.choices(type_specs, weights=[spec[2] for _, spec in type_specs], k=self.workspace_count)
+        specs = []
+        rows = []
+        for number, (type_id, (name, capacity, _, _)) in enumerate(kinds, start=1):
+            location = f'Building {self.rng.randint(1, buildings)}'
+            floor = str(self.rng.randint(1, 6))
+            rows.append((f'{name} {number}', location, floor, type_id, True, self.now, self.now, 0, 0))
+            # Some workspaces are far more popular than others
+            specs.append((location, capacity, self.rng.lognormvariate(0, 0.5)))
+        count = load_rows(
+            Workspace,
+            ('name', 'location', 'floor', 'workspace_type_id', 'is_active', 'created_at', 'updated_at',
+             'active_booking_count', 'lifetime_booking_count'),
+            rows
+        )
+        ids = new_ids(Workspace, previous)
+        return count, [(workspace_id,) + spec for workspace_id, spec in zip(ids, specs)]
+
+    def load_users(self):
+        previous = max_id(User)
+        roles = self.rng.choices([role for role, _ in ROLES], weights=[weight for _, weight in ROLES],
+                                 k=self.user_count)
+        joined_from = self.now - timedelta(days=730)
+
+        def rows():
+            for number, role in enumerate(roles):
+                joined = joined_from + timedelta(seconds=self.rng.randrange(730 * 86400))
+                yield (
+                    self.password_hash, None, False, f'load{number}@{self.email_domain}',
+                    self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES), role, joined,
+                    self.rng.random() > 0.02, False, None, self.rng.choice(DEPARTMENTS), None, True, True
+                )
+
+        count = load_rows(
+            User,
+            ('password', 'last_login', 'is_superuser', 'email', 'first_name', 'last_name', 'role', 'date_joined',
+             'is_active', 'is_staff', 'phone', 'department', 'profile_image', 'email_notifications',
+             'push_notifications'),
+            rows(),
+            self.batch_size
+        )
+        return count, new_ids(User, previous)
+
+    def user_habits(self, user_ids, workspaces):
+        """
+        Per-user habits, and for every workspace the users who treat it as
+        home: {workspace_id: [(user_id, weekdays, duration_slots, lead_hours)]}
+        """
+        by_location = {}
+        for workspace in workspaces:
+            by_location.setdefault(workspace[1], []).append(workspace)
+
+        regulars = {workspace[0]: [] for workspace in workspaces}
+        for user_id in user_ids:
+            location = self.rng.choice(list(by_location))
+            homes = self.rng.sample(by_location[location], min(len(by_location[location]), self.rng.randint(1, 3)))
+            habit = (
+                user_id,
+                frozenset(self.rng.sample(range(5), self.rng.randint(2, 5))),
+                self.rng.choice((1, 2, 2, 3, 4, 4, 6, 8, 12, 16)),
+                self.rng.expovariate(1 / 48),
+            )
+            for home in homes:
+                regulars[home[0]].append(habit)
+        return regulars
+
+    def days_range(self):
+        day = self.first_day
+        while day <= self.last_day:
+            yield day
+            day += timedelta(days=1)
+
+    def day_weight(self, day):
+        return WEEKDAY_WEIGHTS[day.weekday()] * MONTH_WEIGHTS[day.month - 1]
+
+    def bookings(self, workspaces, habits):
+        rng = self.rng
+        days = [(day, self.day_weight(day)) for day in self.days_range()]
+        popularity = sum(workspace[3] for workspace in workspaces)
+        day_weights = sum(weight for _, weight in days)
+        # Mean bookings of a workspace-day of weight 1 and popularity 1
+        base_rate = self.booking_count / (popularity * day_weights) if popularity and day_weights else 0
+        slots = list(range(FIRST_SLOT, LAST_SLOT))
+        all_habits = [habit for workspace_habits in habits.values() for habit in workspace_habits]
+        tz = timezone.get_current_timezone()
+        generated = 0
+
+        for day, weight in days:
+            midnight = datetime.combine(day, time.min).replace(tzinfo=tz)
+            for workspace_id, _, capacity, workspace_popularity in workspaces:
+                count = min(len(slots), poisson(rng, base_rate * weight * workspace_popularity))
+                if not count:
+                    continue
+                count = min(count, self.booking_count - generated)
+                if count <= 0:
+                    return
+                generated += count
+
+                # Distinct, sorted start slots weighted towards business hours
+                starts = set()
+                while len(starts) < count:
+                    starts.update(rng.choices(slots, weights=SLOT_WEIGHTS, k=count - len(starts)))
+                starts = sorted(starts)
+
+                regulars = habits[workspace_id]
+                for index, slot in enumerate(starts):
+                    candidates = [habit for habit in regulars if day.weekday() in habit[1]] or regulars
+                    if not candidates or rng.random() < 0.15:
+                        candidates = all_habits
+                    user_id, _, duration, lead_hours = rng.choice(candidates)
+
+                    # Never past the next booking or the end of the day
+                    next_start = starts[index + 1] if index + 1 < count else LAST_SLOT
+                    duration = max(1, min(duration + rng.randint(-1, 1), next_start - slot))
+                    start = midnight + timedelta(minutes=slot * SLOT_MINUTES)
+                    end = start + timedelta(minutes=duration * SLOT_MINUTES)
+                    created = start - timedelta(hours=max(0.2, rng.expovariate(1 / max(lead_hours, 0.5))))
+                    created = min(created, self.now)
+
+                    if end <= self.now:
+                        status = 'completed' if rng.random() < 0.9 else 'cancelled'
+                    else:
+                        status = 'confirmed' if rng.random() < 0.85 else 'pending'
+                    attendees = rng.randint(2, capacity) if capacity > 1 else 1
+
+                    yield (user_id, workspace_id, start, end, None, attendees, status, created,
+                           end if status == 'completed' else created)
@@ -0,0 +1,369 @@
+"""
+HTTP load-test harness for the booking workflow.
+
+Drives a running server with asyncio virtual users over keep-alive
+HTTP/1.1 connections (stdlib only, so it runs wherever manage.py does).
+
+* mixed: every virtual user logs in, then loops until the deadline:
+  browse available workspaces for a future window, book one of them,
+  poll the dashboard and cancel the booking again.
+* contention: many users log in, wait on a shared start signal, then all
+  try to book the same workspace slot at once. More than one success is a
+  double booking.
+
+Latency, status codes and errors are recorded per step; see LoadStats.
+The virtual users are expected to exist already, typically created by
+generate_load_data (load<N>@load.example.com / load-password).
+"""
+import asyncio
+import json
+import math
+import random
+import ssl
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.utils import timezone
+
+LOGIN_PATH = '/api/accounts/login/'
+AVAILABLE_PATH = '/api/bookings/workspaces/available/'
+BOOKINGS_PATH = '/api/bookings/bookings/'
+DASHBOARD_PATH = '/api/analytics/dashboard/'
+
+# Statuses that count as a successful outcome of each step; anything else
+# (or a transport error or timeout) is an error
+EXPECTED_STATUSES = {
+    'login': {200},
+    'available': {200},
+    # Losing a race for a slot is a normal outcome, not an error
+    'booking-create': {201, 400},
+    'dashboard': {200},
+    'booking-cancel': {200},
+    'contention-create': {201, 400},
+}
+# Retries of a throttled login, honouring Retry-After up to this many seconds
+LOGIN_RETRIES = 3
+MAX_RETRY_WAIT = 10
+
+
+class HTTPError(Exception):
+    pass
+
+
+class HTTPConnection:
+    """A single keep-alive HTTP/1.1 connection, reopened when the server closes it"""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.host_header = url.netloc
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        """Returns (status, decoded JSON body or None, lower-cased headers)"""
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host_header}',
+            'Accept: application/json',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+        # A kept-alive connection may have been closed by the server in the
+        # meantime; that surfaces on first use and is retried once
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self.connect()
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                return await asyncio.wait_for(self.read_response(method), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError, HTTPError):
+                await self.close()
+                if not reused or attempt:
+                    raise
+            except asyncio.TimeoutError:
+                await self.close()
+                raise
+
+    async def read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HTTPError('Connection closed before a response')
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (
+            headers.get('connection', '').lower() != 'close'
+            and (version != 'HTTP/1.0' or headers.get('connection', '').lower() == 'keep-alive')
+        )
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self.read_chunked()
+        else:
+            body = await self.reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            await self.close()
+
+        if body and headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(body), headers
+        return status, None, headers
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if not size:
+                # Trailers, then the blank line ending the body
+                while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class LoadStats:
+    """Per-step latencies, status codes and errors"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, step, seconds, status):
+        """`status` is the HTTP status, or the exception name of a failed request"""
+        self.latencies[step].append(seconds)
+        self.statuses[step][status] += 1
+        if status not in EXPECTED_STATUSES.get(step, {200}):
+            self.errors[step] += 1
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        """One row per step, in first-seen order"""
+        rows = []
+        for step, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            rows.append({
+                'step': step,
+                'requests': len(ordered),
+                'errors': self.errors[step],
+                'error_rate': self.errors[step] / len(ordered),
+                'p50_ms': percentile(ordered, 0.5) * 1000,
+                'p95_ms': percentile(ordered, 0.95) * 1000,
+                'p99_ms': percentile(ordered, 0.99) * 1000,
+                'max_ms': ordered[-1] * 1000,
+                'statuses': dict(self.statuses[step]),
+            })
+        return rows
+
+    @property
+    def total_requests(self):
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    @property
+    def total_errors(self):
+        return sum(self.errors.values())
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class VirtualUser:
+
+    def __init__(self, base_url, email, password, stats, rng, timeout=30):
+        self.connection = HTTPConnection(base_url, timeout)
+        self.email = email
+        self.password = password
+        self.stats = stats
+        self.rng = rng
+        self.token = None
+
+    async def call(self, step, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, data, headers = await self.connection.request(method, path, body, self.token)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HTTPError, ValueError) as exc:
+            self.stats.record(step, time.perf_counter() - started, type(exc).__name__)
+            return None, None, {}
+        self.stats.record(step, time.perf_counter() - started, status)
+        return status, data, headers
+
+    async def login(self):
+        for _ in range(LOGIN_RETRIES + 1):
+            status, data, headers = await self.call(
+                'login', 'POST', LOGIN_PATH, {'email': self.email, 'password': self.password}
+            )
+            if status == 200:
+                self.token = data['access']
+                return True
+            if status != 429:
+                return False
+            await asyncio.sleep(min(float(headers.get('retry-after', 1)), MAX_RETRY_WAIT))
+        return False
+
+    def future_window(self, horizon_days):
+        """A random 30-180 minute window in business hours of an upcoming weekday"""
+        day = timezone.localdate() + timedelta(days=self.rng.randint(1, horizon_days))
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(
+            minutes=30 * self.rng.randint(16, 32)
+        ))
+        return start, start + timedelta(minutes=30 * self.rng.randint(1, 6))
+
+    async def mixed_workflow(self, deadline, horizon_days, think_time):
+        if not await self.login():
+            return
+        while time.perf_counter() < deadline:
+            start, end = self.future_window(horizon_days)
+            query = urlencode({'start_time': start.isoformat(), 'end_time': end.isoformat()})
+            status, workspaces, _ = await self.call('available', 'GET', f'{AVAILABLE_PATH}?{query}')
+
+            booking_id = None
+            if status == 200 and workspaces:
+                workspace = self.rng.choice(workspaces)
+                status, booking, _ = await self.call('booking-create', 'POST', BOOKINGS_PATH, {
+                    'workspace': workspace['id'],
+                    'start_time': start.isoformat(),
+                    'end_time': end.isoformat(),
+                    'attendees': 1,
+                })
+                if status == 201:
+                    booking_id = booking['id']
+
+            await self.pause(think_time)
+            await self.call('dashboard', 'GET', DASHBOARD_PATH)
+
+            if booking_id is not None:
+                await self.pause(think_time)
+                await self.call('booking-cancel', 'POST', f'{BOOKINGS_PATH}{booking_id}/cancel/')
+            await self.pause(think_time)
+
+    async def pause(self, think_time):
+        if think_time:
+            await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+    async def close(self):
+        await self.connection.close()
+
+
+async def run_mixed(base_url, users, duration, horizon_days=14, think_time=0.0, timeout=30, seed=0):
+    """Run the mixed workflow with one virtual user per (email, password) pair"""
+    stats = LoadStats()
+    rng = random.Random(seed)
+    virtual_users = [
+        VirtualUser(base_url, email, password, stats, random.Random(rng.random()), timeout)
+        for email, password in users
+    ]
+    deadline = time.perf_counter() + duration
+    try:
+        await asyncio.gather(*(user.mixed_workflow(deadline, horizon_days, think_time) for user in virtual_users))
+    finally:
+        await asyncio.gather(*(user.close() for user in virtual_users))
+    stats.finish()
+    return stats
+
+
+async def run_contention(base_url, users, workspace_id=None, days_ahead=3, timeout=30):
+    """
+    Race every user for the same slot. Returns (stats, successful booking ids);
+    successful bookings are cancelled again before returning.
+    """
+    stats = LoadStats()
+    virtual_users = [VirtualUser(base_url, email, password, stats, random.Random(0), timeout)
+                     for email, password in users]
+    try:
+        logged_in = [user for user, ok in zip(
+            virtual_users, await asyncio.gather(*(user.login() for user in virtual_users))
+        ) if ok]
+        if not logged_in:
+            stats.finish()
+            return stats, []
+
+        day = timezone.localdate() + timedelta(days=days_ahead)
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=10))
+        end = start + timedelta(hours=1)
+        if workspace_id is None:
+            query = urlencode({'start_time': start.isoformat(), 'end_time': end.isoformat()})
+            status, workspaces, _ = await logged_in[0].call('available', 'GET', f'{AVAILABLE_PATH}?{query}')
+            if status != 200 or not workspaces:
+                stats.finish()
+                return stats, []
+            workspace_id = workspaces[0]['id']
+
+        body = {
+            'workspace': workspace_id,
+            'start_time': start.isoformat(),
+            'end_time': end.isoformat(),
+            'attendees': 1,
+        }
+        go = asyncio.Event()
+
+        async def attempt(user):
+            await go.wait()
+            status, booking, _ = await user.call('contention-create', 'POST', BOOKINGS_PATH, body)
+            return (user, booking['id']) if status == 201 else None
+
+        tasks = [asyncio.create_task(attempt(user)) for user in logged_in]
+        # Let every task reach the start signal before releasing them together
+        await asyncio.sleep(0)
+        go.set()
+        winners = [result for result in await asyncio.gather(*tasks) if result]
+
+        for user, booking_id in winners:
+            await user.call('booking-cancel', 'POST', f'{BOOKINGS_PATH}{booking_id}/cancel/')
+    finally:
+        await asyncio.gather(*(user.close() for user in virtual_users))
+    stats.finish()
+    return stats, [booking_id for _, booking_id in winners]
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from bookings.operating_hours import rebuild_availability
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Precompute daily available minutes from the operating-hours calendar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, help='First day (YYYY-MM-DD), default today or the earliest precomputed day')
+        parser.add_argument('--end-date', type=parse_date, help='Last day (YYYY-MM-DD), default the end of the planning horizon')
+
+    def handle(self, *args, **options):
+        rows = rebuild_availability(options['start_date'], options['end_date'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} daily availability rows'))
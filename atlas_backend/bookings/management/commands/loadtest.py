@@ -0,0 +1,93 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.loadtest import run_contention, run_mixed
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive mixed booking-workflow traffic and a same-slot contention race '
+        'against a running server, reporting per-step latency percentiles and error rates. '
+        'Virtual users are taken from generate_load_data; run the server with '
+        'AUTH_RATE_LIMIT_ENABLED=False and THROTTLING_ENABLED=False, or logins and '
+        'availability searches will be throttled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--scenario', choices=('mixed', 'contention', 'both'), default='both')
+        parser.add_argument('--concurrency', type=int, default=50, help='Virtual users in the mixed workflow')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run the mixed workflow')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between steps, in seconds')
+        parser.add_argument('--contenders', type=int, default=50, help='Virtual users racing for one slot')
+        parser.add_argument('--workspace', type=int, help='Workspace to race for, default the first available')
+        parser.add_argument('--horizon-days', type=int, default=14, help='How far ahead the mixed workflow books')
+        parser.add_argument('--email-template', default='load{}@load.example.com',
+                            help='Virtual user emails; {} is replaced with 0, 1, 2, ...')
+        parser.add_argument('--password', default='load-password')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--max-error-rate', type=float, default=0.01,
+                            help='Fail when the overall error rate is above this fraction')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        def users(count, offset=0):
+            return [(options['email_template'].format(offset + i), options['password']) for i in range(count)]
+
+        failures = []
+
+        if options['scenario'] in ('mixed', 'both'):
+            self.stdout.write(
+                f'Mixed workflow: {options["concurrency"]} virtual users for {options["duration"]:g}s '
+                f'against {options["base_url"]}'
+            )
+            stats = asyncio.run(run_mixed(
+                options['base_url'],
+                users(options['concurrency']),
+                options['duration'],
+                horizon_days=options['horizon_days'],
+                think_time=options['think_time'],
+                timeout=options['timeout'],
+                seed=options['seed'],
+            ))
+            self.report(stats)
+            error_rate = stats.total_errors / stats.total_requests if stats.total_requests else 1.0
+            if error_rate > options['max_error_rate']:
+                failures.append(f'error rate {error_rate:.2%} is above {options["max_error_rate"]:.2%}')
+
+        if options['scenario'] in ('contention', 'both'):
+            self.stdout.write(f'Contention: {options["contenders"]} virtual users racing for one slot')
+            # Different accounts than the mixed run, so they aren't holding the slot
+            stats, winners = asyncio.run(run_contention(
+                options['base_url'],
+                users(options['contenders'], offset=options['concurrency']),
+                workspace_id=options['workspace'],
+                timeout=options['timeout'],
+            ))
+            self.report(stats)
+            if not winners:
+                failures.append('no contender managed to book the slot')
+            elif len(winners) > 1:
+                failures.append(f'double booking: {len(winners)} bookings created for one slot ({winners})')
+            else:
+                self.stdout.write(f'Exactly one booking won the slot ({winners[0]})')
+
+        if failures:
+            raise CommandError('Load test failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Load test passed'))
+
+    def report(self, stats):
+        self.stdout.write(
+            f'{"step":<20}{"requests":>9}{"errors":>8}{"err %":>8}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"p99 ms":>10}{"max ms":>10}  statuses'
+        )
+        for row in stats.summary():
+            statuses = ' '.join(f'{status}:{count}' for status, count in sorted(row['statuses'].items(), key=str))
+            self.stdout.write(
+                f'{row["step"]:<20}{row["requests"]:>9}{row["errors"]:>8}{row["error_rate"] * 100:>8.2f}'
+                f'{row["p50_ms"]:>10.1f}{row["p95_ms"]:>10.1f}{row["p99_ms"]:>10.1f}{row["max_ms"]:>10.1f}'
+                f'  {statuses}'
+            )
+        self.stdout.write(f'{stats.total_requests} requests in {stats.elapsed:.1f}s '
+                          f'({stats.total_requests / stats.elapsed:.1f} req/s)')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from bookings import activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute workspace activity columns (next booking, active and lifetime counts) '
+        'that have drifted from bookings; run periodically'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted workspaces')
+
+    def handle(self, *args, **options):
+        drifted = activity.verify(fix=not options['dry_run'])
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Workspace activity columns match bookings'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} workspaces have drifted: {drifted[:20]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed the activity columns of {len(drifted)} workspaces'))
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.3 on 2026-10-19 14:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperatingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=100, null=True)),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('opens_at', models.TimeField()),
+                ('closes_at', models.TimeField()),
+                ('workspace', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='operating_hours', to='bookings.workspace')),
+            ],
+            options={
+                'ordering': ('weekday', 'opens_at'),
+            },
+        ),
+        migrations.CreateModel(
+            name='OperatingException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=100, null=True)),
+                ('date', models.DateField()),
+                ('opens_at', models.TimeField(blank=True, null=True)),
+                ('closes_at', models.TimeField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('workspace', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='operating_exceptions', to='bookings.workspace')),
+            ],
+            options={
+                'ordering': ('date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('available_minutes', models.PositiveSmallIntegerField(default=0)),
+                ('open_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('close_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availability', to='bookings.workspace')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='bookings_da_date_a42501_idx')],
+                'unique_together': {('workspace', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def fill_workspace_activity(apps, schema_editor):
+    Workspace = apps.get_model('bookings', 'Workspace')
+    Booking = apps.get_model('bookings', 'Booking')
+    bookings = Booking.objects.filter(workspace=OuterRef('pk')).order_by()
+    active = bookings.filter(status__in=('pending', 'confirmed'))
+    counted = bookings.exclude(status='cancelled')
+
+    def count(queryset):
+        return Coalesce(Subquery(queryset.values('workspace').annotate(count=Count('id')).values('count')), 0)
+
+    Workspace.objects.update(
+        next_booking_at=Subquery(
+            active.filter(start_time__gte=timezone.now()).order_by('start_time').values('start_time')[:1]
+        ),
+        active_booking_count=count(active),
+        last_booked_at=Subquery(counted.order_by('-created_at').values('created_at')[:1]),
+        lifetime_booking_count=count(counted),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_operating_hours_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='active_booking_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='last_booked_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='lifetime_booking_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='next_booking_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_workspace_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_intervals(apps, schema_editor):
+    # Only days with at most one interval can be recovered from the first
+    # opening and last closing minute; the others stay null and are
+    # resolved from the calendar until the next build_availability
+    DailyAvailability = apps.get_model('bookings', 'DailyAvailability')
+    DailyAvailability.objects.filter(open_minute=None).update(intervals=[])
+    single = DailyAvailability.objects.filter(
+        open_minute__isnull=False,
+        available_minutes=F('close_minute') - F('open_minute')
+    ).only('id', 'open_minute', 'close_minute')
+    batch = []
+    for row in single.iterator(chunk_size=2000):
+        row.intervals = [[row.open_minute, row.close_minute]]
+        batch.append(row)
+        if len(batch) == 2000:
+            DailyAvailability.objects.bulk_update(batch, ['intervals'])
+            batch = []
+    DailyAvailability.objects.bulk_update(batch, ['intervals'])
+
+
+def fill_opening_window(apps, schema_editor):
+    DailyAvailability = apps.get_model('bookings', 'DailyAvailability')
+    computed = DailyAvailability.objects.filter(intervals__isnull=False).only('id', 'intervals')
+    batch = []
+    for row in computed.iterator(chunk_size=2000):
+        row.open_minute = row.intervals[0][0] if row.intervals else None
+        row.close_minute = row.intervals[-1][1] if row.intervals else None
+        batch.append(row)
+        if len(batch) == 2000:
+            DailyAvailability.objects.bulk_update(batch, ['open_minute', 'close_minute'])
+            batch = []
+    DailyAvailability.objects.bulk_update(batch, ['open_minute', 'close_minute'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_workspace_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyavailability',
+            name='intervals',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_intervals, fill_opening_window),
+        migrations.RemoveField(
+            model_name='dailyavailability',
+            name='close_minute',
+        ),
+        migrations.RemoveField(
+            model_name='dailyavailability',
+            name='open_minute',
+        ),
+    ]
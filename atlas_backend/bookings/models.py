@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from accounts.models import User
 
 
@@ -29,8 +29,38 @@ class Workspace(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Booking activity, maintained from booking changes (see bookings.activity)
+    ACTIVITY_FIELDS = ('next_booking_at', 'active_booking_count', 'last_booked_at', 'lifetime_booking_count')
+    
+    next_booking_at = models.DateTimeField(null=True, blank=True, editable=False)
+    active_booking_count = models.PositiveIntegerField(default=0, editable=False)
+    last_booked_at = models.DateTimeField(null=True, blank=True, editable=False)
+    lifetime_booking_count = models.PositiveIntegerField(default=0, editable=False)
+    
     def __str__(self):
         return f"{self.name} ({self.location})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded location: moving changes which schedule applies
+        if 'location' not in instance.get_deferred_fields():
+            instance._loaded_location = instance.location
+        return instance
+    
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        # Leave the activity columns to bookings.activity: saving back the
+        # values this instance was loaded with would undo the bookings made
+        # since
+        if update_fields is None and not force_insert and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.ACTIVITY_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
 
 
 class Booking(models.Model):
@@ -44,6 +74,9 @@ class Booking(models.Model):
         ('completed', 'Completed'),
     )
     
+    # Fields that derived data (occupancy cube, metrics, workspace activity) depend on
+    TRACKED_FIELDS = ('workspace_id', 'user_id', 'start_time', 'end_time', 'attendees', 'status')
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='bookings')
     start_time = models.DateTimeField()
@@ -57,7 +90,132 @@ class Booking(models.Model):
     def __str__(self):
         return f"{self.workspace.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if force_insert or self._state.adding:
+            self._loaded_state = None
+            super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+            return
+        using = using or router.db_for_write(Booking, instance=self)
+        # No savepoint: an error leaves the whole save to roll back
+        with transaction.atomic(using=using, savepoint=False):
+            # Change handlers diff against the row being overwritten, not the
+            # one this instance was loaded from, which another request may
+            # have changed since. The lock holds until they have run.
+            self._loaded_state = self.stored_state(using)
+            if update_fields is not None and self._loaded_state is not None:
+                # Fields left out keep their stored values
+                for field in self.TRACKED_FIELDS:
+                    if field not in update_fields and field.removesuffix('_id') not in update_fields:
+                        setattr(self, field, self._loaded_state[field])
+            super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+    
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(Booking, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            self._loaded_state = self.stored_state(using)
+            return super().delete(using=using, keep_parents=keep_parents)
+    
+    def stored_state(self, using):
+        """
+        The tracked fields of this booking's row, locked for update until the
+        transaction ends, or None when the row is gone
+        """
+        return Booking.objects.using(using).select_for_update().filter(pk=self.pk).values(
+            *self.TRACKED_FIELDS
+        ).first()
+    
+    def tracked_state(self):
+        """Snapshot of the tracked fields as they are on this instance"""
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+    
     def duration_hours(self):
         """Calculate the booking duration in hours"""
         delta = self.end_time - self.start_time
-        return delta.total_seconds() / 3600
\ No newline at end of file
+        return delta.total_seconds() / 3600
+
+class OperatingHours(models.Model):
+    """
+    Weekly opening hours for a workspace or, when no workspace is set, for
+    every workspace at a location. A weekday may have several intervals.
+    Workspace schedules take precedence over location schedules.
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+    
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.CASCADE,
+        related_name='operating_hours',
+        null=True,
+        blank=True
+    )
+    location = models.CharField(max_length=100, null=True, blank=True)
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField()  # 00:00 means midnight at the end of the day
+    
+    class Meta:
+        ordering = ('weekday', 'opens_at')
+    
+    def __str__(self):
+        scope = self.workspace or self.location
+        return f"{scope} - {self.get_weekday_display()} {self.opens_at:%H:%M}-{self.closes_at:%H:%M}"
+
+
+class OperatingException(models.Model):
+    """
+    Exception date (holiday, special hours) replacing the weekly schedule of
+    a workspace or location. Empty hours mean closed all day.
+    """
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.CASCADE,
+        related_name='operating_exceptions',
+        null=True,
+        blank=True
+    )
+    location = models.CharField(max_length=100, null=True, blank=True)
+    date = models.DateField()
+    opens_at = models.TimeField(null=True, blank=True)
+    closes_at = models.TimeField(null=True, blank=True)
+    description = models.CharField(max_length=200, blank=True)
+    
+    class Meta:
+        ordering = ('date',)
+    
+    def __str__(self):
+        scope = self.workspace or self.location
+        return f"{scope} - {self.date}"
+    
+    @property
+    def is_closed(self):
+        return self.opens_at is None or self.closes_at is None
+
+
+class DailyAvailability(models.Model):
+    """
+    Precomputed opening intervals and available minutes per workspace per day,
+    derived from the operating-hours calendar (see bookings.operating_hours)
+    """
+    workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='daily_availability')
+    date = models.DateField()
+    available_minutes = models.PositiveSmallIntegerField(default=0)
+    # Merged opening intervals [[opens, closes], ...] in minutes (0-1440);
+    # null until computed, in which case readers resolve the calendar
+    intervals = models.JSONField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('workspace', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.workspace_id} - {self.date}: {self.available_minutes} min"
@@ -0,0 +1,243 @@
+"""
+Operating-hours calendar.
+
+Resolves the opening intervals of a workspace on a given day and
+precomputes them into `DailyAvailability`, so occupancy and availability
+queries join against a table instead of deriving hours per query.
+
+For each workspace-day the first match wins:
+
+1. an exception date for the workspace
+2. an exception date for the workspace's location
+3. the workspace's weekly schedule
+4. the location's weekly schedule
+5. settings.OPERATING_CALENDAR['DEFAULT_HOURS']
+
+A weekly schedule that has no interval on some weekday means closed on
+that weekday. Times are minutes since midnight, 0-1440.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Workspace, OperatingHours, OperatingException, DailyAvailability
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minute(value, closing=False):
+    minute = value.hour * 60 + value.minute
+    # A closing time of 00:00 is midnight at the end of the day
+    return MINUTES_PER_DAY if closing and minute == 0 else minute
+
+
+def merge_intervals(intervals):
+    merged = []
+    for opens, closes in sorted(intervals):
+        if closes <= opens:
+            continue
+        if merged and opens <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], closes)
+        else:
+            merged.append([opens, closes])
+    return [tuple(interval) for interval in merged]
+
+
+def default_intervals():
+    opens, closes = settings.OPERATING_CALENDAR['DEFAULT_HOURS']
+    return [(to_minute(time.fromisoformat(opens)), to_minute(time.fromisoformat(closes), closing=True))]
+
+
+class OperatingCalendar:
+    """Weekly schedules and exception dates, loaded once for a batch of lookups"""
+
+    def __init__(self, start_date, end_date):
+        self.weekly = defaultdict(list)
+        self.scheduled = set()
+        self.exceptions = defaultdict(list)
+        self.default = default_intervals()
+
+        for hours in OperatingHours.objects.all():
+            scope = self.scope(hours)
+            self.scheduled.add(scope)
+            self.weekly[scope + (hours.weekday,)].append(
+                (to_minute(hours.opens_at), to_minute(hours.closes_at, closing=True))
+            )
+
+        exceptions = OperatingException.objects.filter(date__gte=start_date, date__lte=end_date)
+        for exception in exceptions:
+            intervals = self.exceptions[self.scope(exception) + (exception.date,)]
+            if not exception.is_closed:
+                intervals.append(
+                    (to_minute(exception.opens_at), to_minute(exception.closes_at, closing=True))
+                )
+
+    @staticmethod
+    def scope(entry):
+        if entry.workspace_id:
+            return ('workspace', entry.workspace_id)
+        return ('location', entry.location)
+
+    def intervals(self, workspace, day):
+        """Merged opening intervals of a workspace on a day"""
+        scopes = (('workspace', workspace.id), ('location', workspace.location))
+        for scope in scopes:
+            if scope + (day,) in self.exceptions:
+                return merge_intervals(self.exceptions[scope + (day,)])
+        for scope in scopes:
+            if scope in self.scheduled:
+                return merge_intervals(self.weekly.get(scope + (day.weekday(),), []))
+        return self.default
+
+    def availability(self, workspace, day):
+        intervals = self.intervals(workspace, day)
+        return DailyAvailability(
+            workspace_id=workspace.id,
+            date=day,
+            available_minutes=sum(closes - opens for opens, closes in intervals),
+            intervals=intervals
+        )
+
+
+def date_range(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def default_rebuild_range():
+    """The dates already precomputed, extended through the planning horizon"""
+    today = timezone.localdate()
+    bounds = DailyAvailability.objects.aggregate(first=Min('date'), last=Max('date'))
+    horizon_end = today + timedelta(days=settings.OPERATING_CALENDAR['HORIZON_DAYS'])
+    start_date = min(bounds['first'] or today, today)
+    end_date = max(bounds['last'] or horizon_end, horizon_end)
+    return start_date, end_date
+
+
+def rebuild_availability(start_date=None, end_date=None, workspaces=None, batch_size=2000):
+    """
+    Recompute DailyAvailability for a date range and workspace queryset
+    (default: everything already precomputed plus the planning horizon).
+    Returns the number of rows written.
+    """
+    if start_date is None or end_date is None:
+        default_start, default_end = default_rebuild_range()
+        start_date = start_date or default_start
+        end_date = end_date or default_end
+    if workspaces is None:
+        workspaces = Workspace.objects.all()
+    workspaces = list(workspaces.only('id', 'location'))
+
+    calendar = OperatingCalendar(start_date, end_date)
+    rows = [
+        calendar.availability(workspace, day)
+        for workspace in workspaces
+        for day in date_range(start_date, end_date)
+    ]
+
+    with transaction.atomic():
+        DailyAvailability.objects.filter(
+            workspace__in=workspaces,
+            date__gte=start_date,
+            date__lte=end_date
+        ).delete()
+        DailyAvailability.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def calendar_gaps(found, start_date, end_date, workspace_ids):
+    """
+    (workspace_id, date), DailyAvailability pairs computed from the calendar
+    for the requested workspace-days missing from `found`
+    """
+    missing = [
+        (workspace_id, day)
+        for workspace_id in workspace_ids
+        for day in date_range(start_date, end_date)
+        if (workspace_id, day) not in found
+    ]
+    if not missing:
+        return
+    calendar = OperatingCalendar(start_date, end_date)
+    workspaces = Workspace.objects.only('id', 'location').in_bulk({workspace_id for workspace_id, _ in missing})
+    for workspace_id, day in missing:
+        if workspace_id in workspaces:
+            yield (workspace_id, day), calendar.availability(workspaces[workspace_id], day)
+
+
+def available_minutes_map(start_date, end_date, workspace_ids):
+    """
+    {(workspace_id, date): available minutes} for every requested pair,
+    reading the precomputed table and resolving any gaps from the calendar
+    """
+    minutes = {
+        (workspace_id, day): available
+        for workspace_id, day, available in DailyAvailability.objects.filter(
+            workspace_id__in=workspace_ids,
+            date__gte=start_date,
+            date__lte=end_date
+        ).values_list('workspace_id', 'date', 'available_minutes')
+    }
+    for key, availability in calendar_gaps(minutes, start_date, end_date, workspace_ids):
+        minutes[key] = availability.available_minutes
+    return minutes
+
+
+def available_minutes(workspace_id, day):
+    """Available minutes of one workspace-day"""
+    return available_minutes_map(day, day, [workspace_id]).get((workspace_id, day), 0)
+
+
+def intervals_map(start_date, end_date, workspace_ids):
+    """
+    {(workspace_id, date): opening intervals} for every requested pair,
+    like available_minutes_map()
+    """
+    intervals = {
+        (workspace_id, day): day_intervals
+        for workspace_id, day, day_intervals in DailyAvailability.objects.filter(
+            workspace_id__in=workspace_ids,
+            date__gte=start_date,
+            date__lte=end_date,
+            intervals__isnull=False
+        ).values_list('workspace_id', 'date', 'intervals')
+    }
+    for key, availability in calendar_gaps(intervals, start_date, end_date, workspace_ids):
+        intervals[key] = availability.intervals
+    return intervals
+
+
+def window_days(start, end):
+    """(date, first minute, end minute) of each local day a time window touches"""
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    # A window ending within a minute needs that whole minute open
+    end_minute = end.hour * 60 + end.minute + (1 if end.second or end.microsecond else 0)
+    for day in date_range(start.date(), end.date()):
+        first = start.hour * 60 + start.minute if day == start.date() else 0
+        last = end_minute if day == end.date() else MINUTES_PER_DAY
+        if first < last:
+            yield day, first, last
+
+
+def closed_workspace_ids(start, end, workspace_ids):
+    """Ids of the workspaces closed at any point between two datetimes"""
+    days = list(window_days(start, end))
+    if not days:
+        return set()
+    intervals = intervals_map(days[0][0], days[-1][0], workspace_ids)
+
+    def open_during(workspace_id, day, first, last):
+        # Merged intervals don't touch, so one of them must cover the span
+        return any(opens <= first and last <= closes for opens, closes in intervals.get((workspace_id, day), ()))
+
+    return {
+        workspace_id
+        for workspace_id in workspace_ids
+        if not all(open_during(workspace_id, day, first, last) for day, first, last in days)
+    }
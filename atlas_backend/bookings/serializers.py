@@ -1,25 +1,29 @@
 from rest_framework import serializers
-from .models import WorkspaceType, Workspace, Booking
+from atlas_config.serializers import FlexFieldsMixin
+from .models import WorkspaceType, Workspace, Booking, OperatingHours, OperatingException
 from django.utils import timezone
 from datetime import timedelta
 
 
-class WorkspaceTypeSerializer(serializers.ModelSerializer):
+class WorkspaceTypeSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WorkspaceType
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
-class WorkspaceListSerializer(serializers.ModelSerializer):
+class WorkspaceListSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     workspace_type = WorkspaceTypeSerializer(read_only=True)
     
     class Meta:
         model = Workspace
-        fields = ('id', 'name', 'location', 'floor', 'workspace_type', 'is_active')
+        fields = (
+            'id', 'name', 'location', 'floor', 'workspace_type', 'is_active',
+            'next_booking_at', 'active_booking_count', 'last_booked_at', 'lifetime_booking_count'
+        )
 
 
-class WorkspaceDetailSerializer(serializers.ModelSerializer):
+class WorkspaceDetailSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     workspace_type = WorkspaceTypeSerializer(read_only=True)
     
     class Meta:
@@ -34,7 +38,44 @@ class WorkspaceCreateUpdateSerializer(serializers.ModelSerializer):
         fields = ('name', 'location', 'floor', 'workspace_type', 'is_active')
 
 
-class BookingListSerializer(serializers.ModelSerializer):
+class OperatingScopeMixin:
+    """Schedules apply to exactly one of a workspace or a location"""
+    
+    def validate(self, data):
+        workspace = data.get('workspace', getattr(self.instance, 'workspace', None))
+        location = data.get('location', getattr(self.instance, 'location', None))
+        if bool(workspace) == bool(location):
+            raise serializers.ValidationError(
+                "Set either a workspace or a location"
+            )
+        return data
+
+
+class OperatingHoursSerializer(OperatingScopeMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OperatingHours
+        fields = ('id', 'workspace', 'location', 'weekday', 'opens_at', 'closes_at')
+        read_only_fields = ('id',)
+
+
+class OperatingExceptionSerializer(OperatingScopeMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OperatingException
+        fields = ('id', 'workspace', 'location', 'date', 'opens_at', 'closes_at', 'description')
+        read_only_fields = ('id',)
+    
+    def validate(self, data):
+        data = super().validate(data)
+        opens_at = data.get('opens_at', getattr(self.instance, 'opens_at', None))
+        closes_at = data.get('closes_at', getattr(self.instance, 'closes_at', None))
+        if (opens_at is None) != (closes_at is None):
+            raise serializers.ValidationError(
+                "Set both opening and closing time, or neither for a closed day"
+            )
+        return data
+
+
+class BookingListSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     workspace = WorkspaceListSerializer(read_only=True)
     
     class Meta:
@@ -43,7 +84,7 @@ class BookingListSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class BookingDetailSerializer(serializers.ModelSerializer):
+class BookingDetailSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     workspace = WorkspaceDetailSerializer(read_only=True)
     user = serializers.SerializerMethodField()
     duration = serializers.SerializerMethodField()
@@ -54,6 +95,11 @@ class BookingDetailSerializer(serializers.ModelSerializer):
                   'purpose', 'attendees', 'status', 'duration',
                   'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
+        expandable_fields = ('user',)
+        field_sources = {
+            'user': ('user__id', 'user__email', 'user__first_name', 'user__last_name'),
+            'duration': ('start_time', 'end_time'),
+        }
     
     def get_user(self, obj):
         return {
@@ -71,7 +117,8 @@ class BookingDetailSerializer(serializers.ModelSerializer):
 class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
-        fields = ('workspace', 'start_time', 'end_time', 'purpose', 'attendees')
+        fields = ('id', 'workspace', 'start_time', 'end_time', 'purpose', 'attendees')
+        read_only_fields = ('id',)
     
     def validate(self, data):
         """
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .activity import apply_booking_change
+from .models import Booking, Workspace, OperatingHours, OperatingException
+from .operating_hours import rebuild_availability
+
+
+def schedule_rebuild(workspaces):
+    transaction.on_commit(lambda: rebuild_availability(workspaces=workspaces))
+
+
+@receiver(post_save, sender=OperatingHours)
+@receiver(post_delete, sender=OperatingHours)
+@receiver(post_save, sender=OperatingException)
+@receiver(post_delete, sender=OperatingException)
+def operating_calendar_changed(sender, instance, **kwargs):
+    """Recompute the precomputed availability of the affected workspaces"""
+    if instance.workspace_id:
+        workspaces = Workspace.objects.filter(id=instance.workspace_id)
+    else:
+        workspaces = Workspace.objects.filter(location=instance.location)
+    schedule_rebuild(workspaces)
+
+
+@receiver(post_save, sender=Workspace)
+def workspace_saved(sender, instance, created=False, raw=False, **kwargs):
+    # New workspaces and location moves change which schedule applies;
+    # other edits leave the calendar alone
+    if raw:
+        return
+    if not created and 'location' in instance.get_deferred_fields():
+        # Neither loaded nor set, so it wasn't changed
+        return
+    if created or getattr(instance, '_loaded_location', None) != instance.location:
+        schedule_rebuild(Workspace.objects.filter(id=instance.id))
+    instance._loaded_location = instance.location
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, raw=False, **kwargs):
+    """Move the activity columns of the workspaces the booking left or joined"""
+    if raw:
+        return
+    old_state = getattr(instance, '_loaded_state', None)
+    apply_booking_change(old_state, instance.tracked_state(), instance.created_at)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    old_state = getattr(instance, '_loaded_state', instance.tracked_state())
+    apply_booking_change(old_state, None)
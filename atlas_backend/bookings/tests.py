@@ -0,0 +1,109 @@
+from datetime import datetime, time, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from . import activity
+from .models import Booking, OperatingHours, Workspace, WorkspaceType
+from .operating_hours import rebuild_availability
+
+
+class WorkspaceActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('member@example.com', 'pw12345!', role='employee')
+        workspace_type = WorkspaceType.objects.create(name='Desk')
+        self.workspace = Workspace.objects.create(name='D1', location='HQ', workspace_type=workspace_type)
+
+    def book(self, workspace, status='confirmed'):
+        start_time = timezone.now() + timedelta(days=1)
+        return Booking.objects.create(
+            user=self.user, workspace=workspace, status=status,
+            start_time=start_time, end_time=start_time + timedelta(hours=1)
+        )
+
+    def test_workspace_edit_keeps_bookings_made_since_loading(self):
+        # Loaded, say, by a request editing the workspace, while another
+        # request books it
+        stale = Workspace.objects.get(pk=self.workspace.pk)
+        booking = self.book(self.workspace)
+
+        stale.name = 'D1 (window)'
+        stale.save()
+
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        self.assertEqual(workspace.name, 'D1 (window)')
+        self.assertEqual(workspace.active_booking_count, 1)
+        self.assertEqual(workspace.lifetime_booking_count, 1)
+        self.assertEqual(workspace.next_booking_at, booking.start_time)
+        self.assertEqual(activity.find_drift(), [])
+
+    def test_cancelling_from_two_stale_instances_counts_once(self):
+        self.book(self.workspace)
+        booking = self.book(self.workspace)
+        # Loaded by two concurrent cancel requests
+        first = Booking.objects.get(pk=booking.pk)
+        second = Booking.objects.get(pk=booking.pk)
+
+        for instance in (first, second):
+            instance.status = 'cancelled'
+            instance.save()
+
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        self.assertEqual(workspace.active_booking_count, 1)
+        self.assertEqual(workspace.lifetime_booking_count, 1)
+        self.assertEqual(activity.find_drift(), [])
+
+    def test_deferred_fields_stay_unloaded_on_save(self):
+        self.book(self.workspace)
+        workspace = Workspace.objects.only('id', 'name').get(pk=self.workspace.pk)
+        workspace.name = 'D2'
+
+        with self.assertNumQueries(1):
+            workspace.save()
+
+        self.assertEqual(Workspace.objects.get(pk=self.workspace.pk).active_booking_count, 1)
+
+
+class AvailableWorkspacesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('member@example.com', 'pw12345!', role='employee'))
+        workspace_type = WorkspaceType.objects.create(name='Desk')
+        # Closed for lunch every day
+        self.office = Workspace.objects.create(name='O1', location='Office', workspace_type=workspace_type)
+        # Open around the clock every day
+        self.lab = Workspace.objects.create(name='L1', location='Lab', workspace_type=workspace_type)
+        for weekday in range(7):
+            OperatingHours.objects.create(location='Office', weekday=weekday, opens_at='09:00', closes_at='12:00')
+            OperatingHours.objects.create(location='Office', weekday=weekday, opens_at='13:00', closes_at='17:00')
+            OperatingHours.objects.create(location='Lab', weekday=weekday, opens_at='00:00', closes_at='00:00')
+        self.day = timezone.localdate() + timedelta(days=2)
+
+    def at(self, hour, minute=0, days=0):
+        return timezone.make_aware(datetime.combine(self.day + timedelta(days=days), time(hour, minute)))
+
+    def available(self, start, end):
+        response = self.client.get(
+            '/api/bookings/workspaces/available/', {'start_time': start.isoformat(), 'end_time': end.isoformat()}
+        )
+        self.assertEqual(response.status_code, 200)
+        return {workspace['id'] for workspace in response.data}
+
+    def test_window_over_a_closure_between_intervals(self):
+        rebuild_availability(self.day, self.day)
+
+        self.assertEqual(self.available(self.at(11, 30), self.at(13, 30)), {self.lab.id})
+        self.assertEqual(self.available(self.at(13), self.at(17)), {self.office.id, self.lab.id})
+
+    def test_days_without_precomputed_rows_follow_the_calendar(self):
+        self.assertEqual(self.available(self.at(12, 15), self.at(12, 45)), {self.lab.id})
+        self.assertEqual(self.available(self.at(9, days=200), self.at(10, days=200)), {self.office.id, self.lab.id})
+
+    def test_every_day_of_a_multi_day_window(self):
+        rebuild_availability(self.day, self.day + timedelta(days=1))
+
+        self.assertEqual(self.available(self.at(16), self.at(10, days=1)), {self.lab.id})
+        self.assertEqual(self.available(self.at(9), self.at(0, days=1)), {self.lab.id})
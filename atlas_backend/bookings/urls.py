@@ -1,10 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WorkspaceTypeViewSet, WorkspaceViewSet, BookingViewSet
+from .views import (
+    WorkspaceTypeViewSet,
+    WorkspaceViewSet,
+    OperatingHoursViewSet,
+    OperatingExceptionViewSet,
+    BookingViewSet
+)
 
 router = DefaultRouter()
 router.register('workspace-types', WorkspaceTypeViewSet, basename='workspace-type')
 router.register('workspaces', WorkspaceViewSet, basename='workspace')
+router.register('operating-hours', OperatingHoursViewSet, basename='operating-hours')
+router.register('operating-exceptions', OperatingExceptionViewSet, basename='operating-exception')
 router.register('bookings', BookingViewSet, basename='booking')
 
 urlpatterns = [
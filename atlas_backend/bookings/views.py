@@ -3,11 +3,15 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 
-from .models import WorkspaceType, Workspace, Booking
+from .models import WorkspaceType, Workspace, Booking, OperatingHours, OperatingException
+from .operating_hours import closed_workspace_ids
 from .serializers import (
+    OperatingHoursSerializer,
+    OperatingExceptionSerializer,
     WorkspaceTypeSerializer,
     WorkspaceListSerializer,
     WorkspaceDetailSerializer,
@@ -17,13 +21,17 @@ from .serializers import (
     BookingCreateSerializer,
     BookingUpdateSerializer
 )
-from accounts.permissions import IsAdmin, IsEmployee, IsLearner, IsGeneral
+from accounts.permissions import IsEmployee, IsLearner, IsGeneral, CanBookWorkspace, CanManageWorkspaces
+from atlas_config.serializers import FlexFieldsViewMixin
+from atlas_config.throttling import ThrottledViewMixin
+from idempotency.keys import idempotent
 
 
-class WorkspaceTypeViewSet(viewsets.ModelViewSet):
+class WorkspaceTypeViewSet(FlexFieldsViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing workspace types
     """
+    replica_reads = ('list',)
     queryset = WorkspaceType.objects.all()
     serializer_class = WorkspaceTypeSerializer
     permission_classes = [IsAuthenticated]
@@ -33,18 +41,42 @@ class WorkspaceTypeViewSet(viewsets.ModelViewSet):
         Only admins can create, update, or delete workspace types
         """
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            return [IsAuthenticated(), IsAdmin()]
+            return [IsAuthenticated(), CanManageWorkspaces()]
         return super().get_permissions()
 
 
-class WorkspaceViewSet(viewsets.ModelViewSet):
+class WorkspaceViewSet(FlexFieldsViewMixin, ThrottledViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing workspaces
+    
+    The list can be sorted by booking activity with `ordering`, e.g.
+    `?ordering=-active_booking_count`; those columns are kept on the
+    workspace (see bookings.activity), so sorting needs no aggregate.
+    `available` scans the bookings of every workspace, so it is throttled.
     """
+    replica_reads = ('list', 'available')
     queryset = Workspace.objects.all()
+    ordering_fields = (
+        'name', 'next_booking_at', 'active_booking_count', 'last_booked_at', 'lifetime_booking_count'
+    )
     
-    def get_serializer_class(self):
+    def get_queryset(self):
+        queryset = super().get_queryset()
         if self.action == 'list':
+            queryset = queryset.order_by(*self.get_ordering())
+        return queryset
+    
+    def get_ordering(self):
+        """`ordering` as order_by() terms, '-' for descending; empty values last"""
+        ordering = self.request.query_params.get('ordering', '')
+        name = ordering.lstrip('-')
+        if name not in self.ordering_fields:
+            return ('id',)
+        column = F(name)
+        return (column.desc(nulls_last=True) if ordering.startswith('-') else column.asc(nulls_last=True), 'id')
+    
+    def get_serializer_class(self):
+        if self.action in ['list', 'available']:
             return WorkspaceListSerializer
         elif self.action in ['create', 'update', 'partial_update']:
             return WorkspaceCreateUpdateSerializer
@@ -55,10 +87,10 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
         Only admins can create, update, or delete workspaces
         """
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            return [IsAuthenticated(), IsAdmin()]
+            return [IsAuthenticated(), CanManageWorkspaces()]
         return [IsAuthenticated()]
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], throttle_scope='workspaces.available')
     def available(self, request):
         """
         Get available workspaces for a specific time range
@@ -84,16 +116,67 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
             id__in=busy_workspaces
         )
         
-        serializer = WorkspaceListSerializer(available_workspaces, many=True)
+        workspaces = list(self.prune_queryset(available_workspaces))
+        
+        # Drop workspaces closed at any point of the window, according to
+        # the operating-hours calendar
+        start, end = parse_datetime(start_time), parse_datetime(end_time)
+        if start and end:
+            closed_workspaces = closed_workspace_ids(start, end, [workspace.id for workspace in workspaces])
+            workspaces = [workspace for workspace in workspaces if workspace.id not in closed_workspaces]
+        
+        serializer = self.get_serializer(workspaces, many=True)
         return Response(serializer.data)
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class OperatingHoursViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for managing weekly operating hours
+    """
+    queryset = OperatingHours.objects.all()
+    serializer_class = OperatingHoursSerializer
+    
+    def get_permissions(self):
+        """
+        Only admins can change the operating-hours calendar
+        """
+        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+            return [IsAuthenticated(), CanManageWorkspaces()]
+        return [IsAuthenticated()]
+
+
+class OperatingExceptionViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for managing operating-hours exception dates
+    """
+    queryset = OperatingException.objects.all()
+    serializer_class = OperatingExceptionSerializer
+    
+    def get_permissions(self):
+        """
+        Only admins can change the operating-hours calendar
+        """
+        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+            return [IsAuthenticated(), CanManageWorkspaces()]
+        return [IsAuthenticated()]
+
+
+class BookingViewSet(FlexFieldsViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing bookings
     """
+    replica_reads = ('list', 'upcoming', 'today')
+    
+    def get_permissions(self):
+        """
+        Creating bookings requires a role that can book workspaces
+        """
+        if self.action == 'create':
+            return [IsAuthenticated(), CanBookWorkspace()]
+        return [IsAuthenticated()]
+    
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'upcoming', 'today']:
             return BookingListSerializer
         elif self.action == 'create':
             return BookingCreateSerializer
@@ -102,11 +185,12 @@ class BookingViewSet(viewsets.ModelViewSet):
         return BookingDetailSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        # Check if this is a schema generation request
+        # Check if this is a schema generation request (which has no request
+        # when run by generate_schema)
         if getattr(self, 'swagger_fake_view', False):
             return Booking.objects.none()
-            
+        
+        user = self.request.user
         if not user.is_authenticated:
             return Booking.objects.none()
             
@@ -139,10 +223,15 @@ class BookingViewSet(viewsets.ModelViewSet):
         context = super().get_serializer_context()
         return context
     
+    @idempotent('bookings.create')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         serializer.save(user=self.request.user, status='confirmed')
     
     @action(detail=True, methods=['post'])
+    @idempotent('bookings.cancel')
     def cancel(self, request, pk=None):
         booking = self.get_object()
         
@@ -160,12 +249,12 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         now = timezone.now()
-        queryset = self.get_queryset().filter(
+        queryset = self.prune_queryset(self.get_queryset()).filter(
             start_time__gte=now,
             status='confirmed'
         ).order_by('start_time')[:5]
         
-        serializer = BookingListSerializer(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -173,11 +262,11 @@ class BookingViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
         tomorrow = today + timedelta(days=1)
         
-        queryset = self.get_queryset().filter(
+        queryset = self.prune_queryset(self.get_queryset()).filter(
             start_time__gte=today,
             start_time__lt=tomorrow,
             status__in=['confirmed', 'pending']
         ).order_by('start_time')
         
-        serializer = BookingListSerializer(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
\ No newline at end of file
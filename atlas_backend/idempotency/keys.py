@@ -0,0 +1,277 @@
+"""
+Idempotency keys for API mutations.
+
+A client that may retry a request sends an `Idempotency-Key` header (any
+unique string of up to 255 characters, typically a UUID). The first request
+with a key runs normally and its response is stored; a retry with the same
+key gets the stored response back, marked `Idempotent-Replayed: true`,
+without running the view again, so a retried booking can't be created twice.
+
+Keys are scoped to the authenticated user (anonymous requests share one
+scope) and to the endpoint. Reusing a key with a different method, path or
+body is rejected with 422. A retry that arrives while the first request is
+still running waits for it, up to WAIT_TIMEOUT seconds, then gets 409 with
+Retry-After. A key whose request never finished (its worker died) is taken
+over after LOCK_TIMEOUT seconds.
+
+Only responses the view returned are kept: when it raises (validation
+errors, throttling, server errors) or returns a 5xx, the key is released and
+a retry runs again. Stored responses expire after TTL seconds; expired rows
+are deleted by `manage.py prune_idempotency_records`.
+"""
+import functools
+import json
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from atlas_config.metrics import Counter
+from atlas_config.renderers import json_dumps
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Set by the renderer and the response handlers, not part of what the view returned
+UNSTORED_HEADERS = {'content-type', 'content-length', 'vary', 'allow'}
+
+IDEMPOTENCY_REQUESTS = Counter(
+    'atlas_idempotency_requests_total',
+    'Requests with an Idempotency-Key by outcome (executed, replayed, released, mismatch, in_progress)',
+    ('scope', 'outcome')
+)
+
+
+class KeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_mismatch'
+
+
+class KeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed; retry later.'
+    default_code = 'idempotency_key_in_progress'
+
+    def __init__(self, wait):
+        super().__init__()
+        # The exception handler turns this into Retry-After
+        self.wait = wait
+
+
+def idempotent(scope, ttl=None):
+    """
+    Make a DRF view method (post, create, an @action) honour the
+    Idempotency-Key header. `scope` names the endpoint, e.g. 'bookings.create';
+    `ttl` overrides how many seconds its responses are kept.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view_method(view, request, *args, **kwargs)
+            return IdempotentRequest(request, scope, key, ttl).run(
+                lambda: view_method(view, request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def request_fingerprint(request):
+    # Keyed, since bodies can hold passwords
+    try:
+        body = request._request.body
+    except RawPostDataException:
+        # Something already consumed the stream; the parsed data is the next best thing
+        body = json_dumps(request.data)
+    value = f'{request.method} {request.get_full_path()}\n'.encode() + body
+    return salted_hmac('idempotency.fingerprint', value, algorithm='sha256').hexdigest()
+
+
+class IdempotentRequest:
+
+    def __init__(self, request, scope, key, ttl=None):
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f'Send a unique key of 1 to {MAX_KEY_LENGTH} characters.'})
+        self.scope = scope
+        self.key = key
+        user = request.user
+        self.owner = f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+        self.fingerprint = request_fingerprint(request)
+        self.options = settings.IDEMPOTENCY
+        self.ttl = timedelta(seconds=ttl or self.options['TTL'])
+        self.record = None
+
+    def run(self, execute):
+        stored = self.claim()
+        if stored is not None:
+            IDEMPOTENCY_REQUESTS.inc((self.scope, 'replayed'))
+            return replay(stored)
+
+        try:
+            response = execute()
+        except BaseException:
+            self.release()
+            raise
+        if response.status_code >= 500:
+            self.release()
+            return response
+        IDEMPOTENCY_REQUESTS.inc((self.scope, 'executed'))
+        return self.store(response)
+
+    def claim(self):
+        """
+        Claim the key for this request and return None, or return the
+        completed record of an earlier request with the same key
+        """
+        identity = {'owner': self.owner, 'scope': self.scope, 'key': self.key}
+        records = IdempotencyRecord.objects.filter(**identity)
+        deadline = time.monotonic() + self.options['WAIT_TIMEOUT']
+        delay = 0.02
+
+        while True:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    self.record = IdempotencyRecord.objects.create(
+                        fingerprint=self.fingerprint, locked_at=now, expires_at=now + self.ttl, **identity
+                    )
+                return None
+            except IntegrityError:
+                pass
+
+            record = records.first()
+            if record is None:
+                # Released by a request that failed in the meantime
+                continue
+            if record.expires_at <= now:
+                records.filter(pk=record.pk, expires_at__lte=now).delete()
+                continue
+            if record.fingerprint != self.fingerprint:
+                IDEMPOTENCY_REQUESTS.inc((self.scope, 'mismatch'))
+                raise KeyMismatch()
+            if record.state == 'completed':
+                return record
+
+            if record.locked_at <= now - timedelta(seconds=self.options['LOCK_TIMEOUT']):
+                # Only one waiter wins the takeover
+                taken = records.filter(
+                    pk=record.pk, state='in_progress', locked_at=record.locked_at
+                ).update(locked_at=now)
+                if taken:
+                    record.locked_at = now
+                    self.record = record
+                    return None
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENCY_REQUESTS.inc((self.scope, 'in_progress'))
+                raise KeyInProgress(wait=1)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    def owned(self):
+        return IdempotencyRecord.objects.filter(pk=self.record.pk, locked_at=self.record.locked_at)
+
+    def release(self):
+        """Forget the key so that a retry runs the request again"""
+        IDEMPOTENCY_REQUESTS.inc((self.scope, 'released'))
+        self.owned().delete()
+
+    def complete(self, response, body, content_type):
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in UNSTORED_HEADERS
+        }
+        cookies = {
+            name: dict({attr: value for attr, value in morsel.items() if value}, value=morsel.value)
+            for name, morsel in response.cookies.items()
+        }
+        self.owned().update(
+            state='completed',
+            status_code=response.status_code,
+            body=zlib.compress(body) if body is not None else None,
+            content_type=content_type,
+            headers=headers,
+            cookies=cookies,
+            expires_at=timezone.now() + self.ttl,
+        )
+
+    def store(self, response):
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = self.capture(response, response.streaming_content)
+        elif isinstance(response, Response):
+            # Not rendered yet; keep the data and render it again on replay
+            self.complete(response, json_dumps(response.data), None)
+        else:
+            self.complete(response, response.content, response['Content-Type'])
+        return response
+
+    def capture(self, response, chunks):
+        """Pass a streamed body through, storing it once it has been sent completely"""
+        parts, size, finished = [], 0, False
+        heartbeat = time.monotonic()
+        try:
+            for chunk in chunks:
+                # Keep the claim fresh so that a long stream isn't taken over
+                if time.monotonic() - heartbeat > self.options['LOCK_TIMEOUT'] / 3:
+                    heartbeat = time.monotonic()
+                    locked_at = timezone.now()
+                    self.owned().update(locked_at=locked_at)
+                    self.record.locked_at = locked_at
+                if parts is not None:
+                    size += len(chunk)
+                    parts.append(chunk)
+                    if size > self.options['MAX_STORED_BYTES']:
+                        parts = None
+                yield chunk
+            finished = True
+        finally:
+            if not finished:
+                self.release()
+            else:
+                # A body too large to keep is recorded as processed without
+                # it, so a retry still doesn't run the request again
+                self.complete(response, b''.join(parts) if parts is not None else None, response['Content-Type'])
+
+
+def replay(record):
+    """The stored response of a completed record"""
+    if record.body is None:
+        response = Response(
+            {'detail': 'This request was already processed; its response is too large to replay.'},
+            status=status.HTTP_409_CONFLICT
+        )
+    else:
+        body = zlib.decompress(bytes(record.body))
+        if record.content_type is None:
+            response = Response(json.loads(body), status=record.status_code)
+        else:
+            response = HttpResponse(body, status=record.status_code, content_type=record.content_type)
+        for name, value in record.headers.items():
+            response[name] = value
+        for name, attrs in record.cookies.items():
+            attrs = dict(attrs)
+            response.cookies[name] = attrs.pop('value')
+            response.cookies[name].update(attrs)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def prune_expired():
+    """Delete expired records; returns the number removed"""
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyRecord(models.Model):
+    """
+    One Idempotency-Key of one client and endpoint: claimed while the first
+    request runs, then holding its response (zlib-compressed) until expiry
+    """
+    STATE_CHOICES = (
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+    )
+    
+    owner = models.CharField(max_length=64)
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    state = models.CharField(max_length=12, choices=STATE_CHOICES, default='in_progress')
+    locked_at = models.DateTimeField(default=timezone.now)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Rendered content, or for DRF responses the JSON of response.data
+    # (content_type NULL), re-rendered on replay
+    body = models.BinaryField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, null=True, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    cookies = models.JSONField(default=dict, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'scope', 'key'], name='idempotency_record_unique_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.state})"
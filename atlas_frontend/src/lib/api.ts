@@ -41,6 +41,19 @@ export interface ApiResponse<T> {
   message?: string;
 }
 
+// One entry of a batch response, in request order
+export interface BatchResponse<T = any> {
+  id?: string;
+  path: string;
+  status: number;
+  headers: Record<string, string>;
+  body: T;
+}
+
+// Absolute path of an endpoint, as the batch endpoint expects it
+const apiPath = (url: string): string =>
+  new URL(api.defaults.baseURL || '', 'http://localhost').pathname.replace(/\/$/, '') + url;
+
 // API wrapper functions with better typing
 export const apiService = {
   // GET request
@@ -72,6 +85,15 @@ export const apiService = {
     const response: AxiosResponse<T> = await api.delete(url, config);
     return response.data;
   },
+
+  // Several GET requests in one round trip; each entry carries its own status
+  batch: async (urls: string[], concurrent = false): Promise<BatchResponse[]> => {
+    const response: AxiosResponse<{ responses: BatchResponse[] }> = await api.post(endpoints.batch, {
+      requests: urls.map((url) => ({ path: apiPath(url) })),
+      concurrent,
+    });
+    return response.data.responses;
+  },
 };
 
 // API endpoints
@@ -113,6 +135,9 @@ export const endpoints = {
     cancel: (id: number) => `/bookings/bookings/${id}/cancel/`,
   },
   
+  // Batched GET requests
+  batch: '/batch/',
+
   // Analytics endpoints
   analytics: {
     dashboard: '/analytics/dashboard/',